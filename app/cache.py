@@ -0,0 +1,228 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable
+
+from app.config import CACHE_MAX_ENTRIES, CACHE_SHARED_URL, CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES
+from app.metrics import CallbackMetric, register
+
+# Marker for "not in cache" returned by the backends
+MISSING = object()
+
+class LocalBackend:
+    """
+    Thread-safe in-process LRU cache with a per-entry TTL.
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted
+        ttl_seconds: Lifetime of an entry
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any:
+        """Return the cached value or MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        """Store a value, evicting the least recently used entries when full."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys: Iterable[str]):
+        """Remove entries; unknown keys are ignored."""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RedisBackend:
+    """
+    Cache backend shared by all workers, storing JSON values in Redis.
+
+    Args:
+        url: Redis URL, e.g. redis://localhost:6379/0
+        ttl_seconds: Lifetime of an entry
+        prefix: Namespace for the keys of this application
+    """
+
+    def __init__(self, url: str, ttl_seconds: float = 30.0, prefix: str = "kmt:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for a redis:// CACHE_SHARED_URL") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self.prefix + key)
+        return MISSING if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any):
+        self.client.set(self.prefix + key, json.dumps(value), px=int(self.ttl_seconds * 1000))
+
+    def delete(self, keys: Iterable[str]):
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+def create_shared_backend(url: str, ttl_seconds: float):
+    """
+    Create the shared cache level from CACHE_SHARED_URL.
+
+    "memory://" gives an in-process stand-in with the same interface, for
+    tests and single-worker deployments; an empty URL disables the level.
+    """
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return LocalBackend(max_entries=CACHE_MAX_ENTRIES * 10, ttl_seconds=ttl_seconds)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url, ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unsupported CACHE_SHARED_URL '{url}'")
+
+class ReadThroughCache:
+    """
+    Two-level read-through cache: an in-process LRU in front of an optional shared backend.
+
+    Writers must call invalidate() after committing. Other workers' local
+    levels only see the change once their entries expire, so the local TTL
+    bounds cross-worker staleness.
+    """
+
+    def __init__(self, local: LocalBackend, shared=None):
+        self.local = local
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        """Return the cached value for key, or None on a miss."""
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not MISSING:
+                self.shared_hits += 1
+                self.local.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, calling loader and caching its result on a miss.
+
+        None results are not cached, so newly created rows show up immediately.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Store a value in both levels."""
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def invalidate(self, keys: Iterable[str]):
+        """Drop keys from both levels."""
+        keys = list(keys)
+        self.local.delete(keys)
+        if self.shared is not None:
+            self.shared.delete(keys)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+        self.hits = self.shared_hits = self.misses = 0
+        self.local.evictions = self.local.expirations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss, eviction and size counters."""
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "size": len(self.local),
+        }
+
+# Cache of container rows by ID and of container codes to IDs
+container_cache = ReadThroughCache(
+    LocalBackend(max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS),
+    create_shared_backend(CACHE_SHARED_URL, CACHE_TTL_SECONDS),
+)
+
+def container_id_key(container_id: int) -> str:
+    return f"container:id:{container_id}"
+
+def container_code_key(container_code: str) -> str:
+    return f"container:code:{container_code}"
+
+# Serialized list responses keyed by ETag; the table version in the tag makes
+# old entries unreachable, so the TTL only bounds memory held by idle pages
+response_cache = LocalBackend(max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=3600)
+
+register(CallbackMetric(
+    "container_cache_lookups_total", "Container lookup cache lookups by result",
+    lambda: {
+        ("hit",): container_cache.hits, ("shared_hit",): container_cache.shared_hits, ("miss",): container_cache.misses
+    },
+    metric_type="counter", label_names=("result",)
+))
+register(CallbackMetric(
+    "container_cache_removals_total", "Entries dropped from the local container cache by reason",
+    lambda: {("eviction",): container_cache.local.evictions, ("expiration",): container_cache.local.expirations},
+    metric_type="counter", label_names=("reason",)
+))
+register(CallbackMetric(
+    "container_cache_entries", "Entries in the local container cache", lambda: len(container_cache.local)
+))
+register(CallbackMetric("response_cache_entries", "Serialized list pages cached", lambda: len(response_cache)))
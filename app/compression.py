@@ -0,0 +1,184 @@
+import zlib
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses of these types are sent as they are: already compressed, or event
+# streams whose messages must reach the client as soon as they are written
+UNCOMPRESSED_MEDIA_TYPES = (
+    "text/event-stream", "application/vnd.apache.parquet", "application/gzip", "application/zip", "image/",
+)
+
+def available_encodings() -> List[str]:
+    """Content codings the server can produce, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+def choose_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """
+    Pick the content coding for an Accept-Encoding header.
+
+    The coding with the highest q-value wins; ties go to the first in
+    available. Codings with q=0 and unlisted ones (unless * is listed) are
+    never chosen.
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header, e.g. "gzip;q=0.8, br"
+        available: Codings the server can produce, most preferred first
+
+    Returns:
+        The coding to use, or None to send the response uncompressed
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip()] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+def _mark_negotiated(headers: MutableHeaders):
+    """Headers of a response whose bytes depend on Accept-Encoding."""
+    headers.add_vary_header("Accept-Encoding")
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+class _Compressor:
+    """Incremental gzip or brotli compressor."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 31: deflate with a gzip header and trailer
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        """Compress data; everything written so far is flushed so the client can decode it now."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if finish else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with gzip or brotli, as negotiated by Accept-Encoding.
+
+    Responses smaller than minimum_size are sent as they are. Streaming
+    responses are compressed chunk by chunk and flushed after each one, so
+    compression does not delay their first byte; small leading chunks are
+    held back until minimum_size bytes are available. Chunks of offload_size
+    bytes or more are compressed in the threadpool. Brotli is offered only
+    when the brotli package is installed.
+
+    Compressed responses get Vary: Accept-Encoding, and a strong ETag is
+    made weak because the compressed bytes differ from the original ones;
+    304 responses to such clients carry the same weak ETag.
+    """
+
+    def __init__(
+        self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+        offload_size: int = 256 * 1024
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.offload_size = offload_size
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+        pending = b""
+
+        async def compress(data: bytes, finish: bool) -> bytes:
+            if len(data) >= self.offload_size:
+                return await run_in_threadpool(compressor.compress, data, finish)
+            return compressor.compress(data, finish)
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough, pending
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    _mark_negotiated(MutableHeaders(raw=message["headers"]))
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = Headers(raw=start["headers"])
+                media_type = headers.get("content-type", "")
+                declared_length = headers.get("content-length")
+                if (
+                    "content-encoding" in headers
+                    or start["status"] < 200 or start["status"] == 204
+                    or any(media_type.startswith(skipped) for skipped in UNCOMPRESSED_MEDIA_TYPES)
+                    or (declared_length is not None and int(declared_length) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                pending += body
+                if more_body and len(pending) < self.minimum_size:
+                    return
+                if not more_body and len(pending) < self.minimum_size:
+                    await send(start)
+                    await send({"type": "http.response.body", "body": pending, "more_body": False})
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                body, pending = pending, b""
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                _mark_negotiated(headers)
+                compressed = await compress(body, not more_body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(compressed))
+                await send(start)
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+
+            await send({"type": "http.response.body", "body": await compress(body, not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from urllib.parse import quote_plus
 from dotenv import load_dotenv
 
@@ -12,4 +13,141 @@ DATABASE_URL = os.getenv("DB_URL", "fastapi")
 # API Settings
 API_PREFIX = "/api"
 PROJECT_NAME = "Sample FastAPI Project"
-DEBUG = os.getenv("DEBUG", "False").lower() == "true" 
\ No newline at end of file
+DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+
+# Use an AsyncSession (asyncpg / aiosqlite) for request handling
+DB_ASYNC = os.getenv("DB_ASYNC", "False").lower() == "true"
+
+# Database engine and connection pool settings
+# DB_POOL_PROFILE "serverless" disables client-side pooling (NullPool) for
+# short-lived deployments such as Vercel or when an external pooler is used
+DB_POOL_PROFILE = os.getenv("DB_POOL_PROFILE", "default").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+# Background refresh settings
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "True").lower() == "true"
+REFRESH_INTERVAL_SECONDS = float(os.getenv("REFRESH_INTERVAL_SECONDS", "300"))
+REFRESH_LOCK_KEY = int(os.getenv("REFRESH_LOCK_KEY", "7310431"))
+# Direct (not pooler) sync database URL the refresh leader holds its advisory lock on. A transaction-mode
+# pooler does not keep session-level locks, so under DB_POOL_PROFILE=serverless no worker takes the
+# PostgreSQL refresh lock unless this is set; otherwise it defaults to DB_URL
+REFRESH_LOCK_DB_URL = os.getenv("REFRESH_LOCK_DB_URL", "")
+
+# Record request metrics and serve them at /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+# Database queries a request may run unless its route sets a budget (0 for no default),
+# and what an overrun does: "off", "log" or "raise"
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "20"))
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log").lower()
+
+# List endpoint pagination: page size when only a cursor (after_id) is given, and the largest limit
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "1000"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "10000"))
+# Container pages of at least this many rows, full lists longer than that and all NDJSON pages
+# are streamed from a cursor; smaller ones are cached by table version
+LIST_STREAM_MIN_ROWS = int(os.getenv("LIST_STREAM_MIN_ROWS", "2000"))
+LIST_STREAM_CHUNK_SIZE = int(os.getenv("LIST_STREAM_CHUNK_SIZE", "500"))
+
+# Response compression (gzip, and brotli when the brotli package is installed)
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Occupancy at or above which a container counts as full
+FULL_THRESHOLD = float(os.getenv("FULL_THRESHOLD", "0.7"))
+
+# Fill-rate forecasting: readings lose half their weight after FORECAST_HALF_LIFE_HOURS,
+# a drop of FORECAST_RESET_DROP means the container was emptied, and the estimates
+# are bootstrapped from the last FORECAST_WINDOW_HOURS of hourly rollups. Every worker
+# folds in new readings each FORECAST_SYNC_INTERVAL_SECONDS (0 syncs on every request)
+FORECAST_HALF_LIFE_HOURS = float(os.getenv("FORECAST_HALF_LIFE_HOURS", "24"))
+FORECAST_RESET_DROP = float(os.getenv("FORECAST_RESET_DROP", "0.2"))
+FORECAST_WINDOW_HOURS = float(os.getenv("FORECAST_WINDOW_HOURS", "72"))
+FORECAST_SYNC_INTERVAL_SECONDS = float(os.getenv("FORECAST_SYNC_INTERVAL_SECONDS", "60"))
+
+# Read-through cache for single-container lookups; CACHE_SHARED_URL adds a level
+# shared by all workers ("redis://..." or "memory://" for an in-process stand-in)
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_SHARED_URL = os.getenv("CACHE_SHARED_URL", "")
+# Serialized list responses kept per table version (each can hold a full page)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "32"))
+
+# Rows the containers change counter is spread over, so concurrent writes do not
+# all queue on one row lock
+TABLE_VERSION_SHARDS = max(1, int(os.getenv("TABLE_VERSION_SHARDS", "8")))
+
+# Largest number of readings accepted by POST /containers/readings:batch, the largest body
+# (checked before parsing) and how far a reading's ts may lie in the future (sensor clock skew)
+READINGS_BATCH_MAX = int(os.getenv("READINGS_BATCH_MAX", "100000"))
+READINGS_BATCH_MAX_BYTES = int(os.getenv("READINGS_BATCH_MAX_BYTES", str(READINGS_BATCH_MAX * 200)))
+READINGS_MAX_FUTURE_SECONDS = float(os.getenv("READINGS_MAX_FUTURE_SECONDS", "300"))
+
+# Bulk import/export: rows per upsert statement or export fetch, and the size above
+# which an uploaded import file is spooled to a temporary file instead of memory
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_SPOOL_MAX_BYTES = int(os.getenv("IMPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+
+# Occupancy history retention: raw readings, then hourly and daily rollups
+HISTORY_RAW_RETENTION_DAYS = int(os.getenv("HISTORY_RAW_RETENTION_DAYS", "14"))
+HISTORY_HOURLY_RETENTION_DAYS = int(os.getenv("HISTORY_HOURLY_RETENTION_DAYS", "180"))
+HISTORY_DAILY_RETENTION_DAYS = int(os.getenv("HISTORY_DAILY_RETENTION_DAYS", "1825"))
+HISTORY_COMPACT_INTERVAL_SECONDS = float(os.getenv("HISTORY_COMPACT_INTERVAL_SECONDS", "3600"))
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "5000"))
+
+# /containers/stream: changes are batched for STREAM_COALESCE_SECONDS and each
+# client may fall STREAM_QUEUE_SIZE batches behind before it is told to resync
+STREAM_COALESCE_SECONDS = float(os.getenv("STREAM_COALESCE_SECONDS", "0.5"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "32"))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "10000"))
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+STREAM_VERSION_POLL_SECONDS = float(os.getenv("STREAM_VERSION_POLL_SECONDS", "2"))
+
+# Spatial lookups: "grid" answers nearby/bbox queries from an in-process grid,
+# "geohash" from the indexed geohash column; "auto" uses the grid on SQLite
+SPATIAL_INDEX = os.getenv("SPATIAL_INDEX", "auto").lower()
+SPATIAL_GRID_TTL_SECONDS = float(os.getenv("SPATIAL_GRID_TTL_SECONDS", "60"))
+
+# Route planning
+GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
+OSRM_URL = os.getenv("OSRM_URL", "")
+# "google" (needs GOOGLE_MAPS_API_KEY), "osrm" (needs OSRM_URL) or "haversine" for offline estimates
+ROUTING_PROVIDER = os.getenv("ROUTING_PROVIDER", "google" if GOOGLE_MAPS_API_KEY else "haversine").lower()
+# Persistent distance/duration cache; set to an empty string to disable it
+ROUTING_MATRIX_CACHE_DIR = os.getenv(
+    "ROUTING_MATRIX_CACHE_DIR", os.path.join(tempfile.gettempdir(), "kmt-matrix-cache")
+)
+ROUTING_MATRIX_TTL_SECONDS = float(os.getenv("ROUTING_MATRIX_TTL_SECONDS", "86400"))
+ROUTING_MATRIX_BUCKET_MINUTES = int(os.getenv("ROUTING_MATRIX_BUCKET_MINUTES", "60"))
+# Locations kept per store before the least recently used ones are evicted
+ROUTING_MATRIX_MAX_LOCATIONS = int(os.getenv("ROUTING_MATRIX_MAX_LOCATIONS", "2048"))
+ROUTING_WORKERS = int(os.getenv("ROUTING_WORKERS", "2"))
+ROUTING_TIME_LIMIT_SECONDS = float(os.getenv("ROUTING_TIME_LIMIT_SECONDS", "2"))
+ROUTING_MAX_TIME_LIMIT_SECONDS = float(os.getenv("ROUTING_MAX_TIME_LIMIT_SECONDS", "30"))
+# Last solved tour kept per depot, vehicle and parameters; changes of up to
+# ROUTING_REPAIR_MAX_CHANGE_RATIO of its stops are patched instead of re-solved
+ROUTING_PLAN_MAX_ENTRIES = int(os.getenv("ROUTING_PLAN_MAX_ENTRIES", "16"))
+ROUTING_REPAIR_MAX_CHANGE_RATIO = float(os.getenv("ROUTING_REPAIR_MAX_CHANGE_RATIO", "0.25"))
+ROUTING_REPAIR_TIME_LIMIT_SECONDS = float(os.getenv("ROUTING_REPAIR_TIME_LIMIT_SECONDS", "0.05"))
+# Fleet plans of at least ROUTING_PARTITION_MIN_STOPS stops are split into districts ("kmeans"
+# or "sweep") solved in parallel; ROUTING_PARTITION_CLUSTERS of 0 uses one per solver worker
+ROUTING_PARTITION_MIN_STOPS = int(os.getenv("ROUTING_PARTITION_MIN_STOPS", "1000"))
+ROUTING_PARTITION_METHOD = os.getenv("ROUTING_PARTITION_METHOD", "kmeans").lower()
+ROUTING_PARTITION_CLUSTERS = int(os.getenv("ROUTING_PARTITION_CLUSTERS", "0"))
+# Budget of the whole-fleet solve tried when districts drop stops that the spare capacity could
+# take; 0 disables it
+ROUTING_PARTITION_FALLBACK_SECONDS = float(os.getenv("ROUTING_PARTITION_FALLBACK_SECONDS", "1"))
+# Seconds between full re-solves of patched tours; 0 disables them
+ROUTING_REOPTIMIZE_INTERVAL_SECONDS = float(os.getenv("ROUTING_REOPTIMIZE_INTERVAL_SECONDS", "300"))
+# Rendered route maps (GeoJSON / polylines) kept per plan version and rendering options
+ROUTE_MAP_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_MAP_CACHE_MAX_ENTRIES", "256"))
+DEPOT_LAT = float(os.getenv("DEPOT_LAT", "40.9765"))
+DEPOT_LON = float(os.getenv("DEPOT_LON", "28.8706"))
@@ -0,0 +1,232 @@
+import csv
+import io
+import json
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pydantic import ValidationError
+
+from app.schemas.container import ContainerImportRow
+
+# Columns of an export, in file order; imports read the same columns and ignore id
+EXPORT_FIELDS = ("id", "container_code", "name", "lang", "long", "occupancy_ratio", "is_full")
+
+# Media type of each file format
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Format names, file extensions and media types accepted for each format
+_FORMAT_ALIASES = {
+    "csv": "csv", "text/csv": "csv", "application/csv": "csv",
+    "ndjson": "ndjson", "jsonl": "ndjson",
+    "application/x-ndjson": "ndjson", "application/ndjson": "ndjson", "application/jsonl": "ndjson",
+    "parquet": "parquet", "application/vnd.apache.parquet": "parquet", "application/x-parquet": "parquet",
+}
+
+# Rows read from a file: (line or row number, parsed row or a raw NDJSON line)
+RawRow = Tuple[int, Union[Dict[str, Any], bytes]]
+
+def resolve_format(value: Optional[str]) -> Optional[str]:
+    """Format for a format name, file extension or Content-Type header, or None if unknown."""
+    if not value:
+        return None
+    value = value.split(";")[0].strip().lower()
+    return _FORMAT_ALIASES.get(value) or _FORMAT_ALIASES.get(value.rsplit(".", 1)[-1])
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("The pyarrow package is required for Parquet import and export") from e
+    return pyarrow, pyarrow.parquet
+
+def parquet_available() -> bool:
+    try:
+        _pyarrow()
+    except RuntimeError:
+        return False
+    return True
+
+def read_rows(file: BinaryIO, fmt: str, batch_size: int = 10000) -> Iterator[RawRow]:
+    """
+    Lazily read container rows from a binary file.
+
+    CSV rows are dicts of strings (empty cells left out), NDJSON rows are the
+    raw lines and Parquet is read one record batch at a time, so memory use
+    does not depend on the file size.
+
+    Raises:
+        ValueError or csv.Error: The file cannot be decoded
+    """
+    if fmt == "csv":
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, {key: value for key, value in row.items() if key and value not in (None, "")}
+        finally:
+            text.detach()
+    elif fmt == "ndjson":
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                yield number, line
+    elif fmt == "parquet":
+        _, parquet = _pyarrow()
+        parquet_file = parquet.ParquetFile(file)
+        columns = [field for field in EXPORT_FIELDS if field != "id" and field in parquet_file.schema_arrow.names]
+        number = 0
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            for row in batch.to_pylist():
+                number += 1
+                yield number, {key: value for key, value in row.items() if value is not None}
+    else:
+        raise ValueError(f"Unknown format {fmt!r}")
+
+class ImportSummary:
+    """Running totals of an import, reported after every chunk."""
+
+    def __init__(self, max_errors: int = 100):
+        self.received = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.max_errors = max_errors
+        self.error: Optional[str] = None
+        # Line of each container_code in the last batch, to report rows upsert_containers rejects
+        self.batch_lines: Dict[str, int] = {}
+
+    def reject(self, line: int, error: ValidationError):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}" for detail in error.errors()
+            )
+            self.errors.append({"line": line, "error": message})
+
+    def add(self, counts: Dict[str, Any]):
+        """Add the counts returned by upsert_containers, with the rows it rejected."""
+        self.inserted += counts["inserted"]
+        self.updated += counts["updated"]
+        self.skipped += counts["skipped"]
+        for code, error in counts["rejected"]:
+            self.reject(self.batch_lines.get(code, 0), error)
+
+    def progress(self) -> str:
+        return (
+            f"{self.received} rows read: {self.inserted} inserted, {self.updated} updated, "
+            f"{self.skipped} skipped, {self.rejected} rejected"
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received, "inserted": self.inserted, "updated": self.updated,
+            "skipped": self.skipped, "rejected": self.rejected, "errors": self.errors, "error": self.error,
+        }
+
+def validated_batches(
+    rows: Iterable[RawRow], batch_size: int, summary: ImportSummary
+) -> Iterator[List[ContainerImportRow]]:
+    """
+    Validate rows into ContainerImportRow batches of up to batch_size; invalid rows are counted in summary.
+
+    Only container_code is required here, since a row may update a few
+    columns of an existing container; upsert_containers rejects incomplete
+    rows for new codes, and summary.add reports them with their line.
+    """
+    batch = []
+    lines = {}
+    for line, row in rows:
+        summary.received += 1
+        try:
+            if isinstance(row, bytes):
+                container = ContainerImportRow.model_validate_json(row)
+            else:
+                container = ContainerImportRow.model_validate(row)
+        except ValidationError as e:
+            summary.reject(line, e)
+            continue
+        batch.append(container)
+        lines[container.container_code] = line
+        if len(batch) >= batch_size:
+            summary.batch_lines = lines
+            yield batch
+            batch = []
+            lines = {}
+    if batch:
+        summary.batch_lines = lines
+        yield batch
+
+class _ByteSink:
+    """Write-only file object that hands out what was written since the last take()."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def write_rows(batches: Iterable[Sequence[Tuple[Any, ...]]], fmt: str) -> Iterator[bytes]:
+    """
+    Encode batches of EXPORT_FIELDS tuples, yielding the file one batch at a time.
+
+    Each Parquet batch becomes one row group, so nothing larger than a batch
+    is held in memory for any format.
+    """
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        for batch in batches:
+            writer.writerows(batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    elif fmt == "ndjson":
+        for batch in batches:
+            yield "".join(
+                json.dumps(dict(zip(EXPORT_FIELDS, row)), separators=(",", ":")) + "\n" for row in batch
+            ).encode()
+    elif fmt == "parquet":
+        pyarrow, parquet = _pyarrow()
+        schema = pyarrow.schema([
+            ("id", pyarrow.int64()), ("container_code", pyarrow.string()), ("name", pyarrow.string()),
+            ("lang", pyarrow.float64()), ("long", pyarrow.float64()),
+            ("occupancy_ratio", pyarrow.float64()), ("is_full", pyarrow.bool_()),
+        ])
+        sink = _ByteSink()
+        with parquet.ParquetWriter(sink, schema) as writer:
+            for batch in batches:
+                columns = list(zip(*batch)) if batch else [()] * len(EXPORT_FIELDS)
+                writer.write_table(pyarrow.table(
+                    [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+                ))
+                yield sink.take()
+        yield sink.take()
+    else:
+        raise ValueError(f"Unknown format {fmt!r}")
@@ -1,11 +1,105 @@
-from sqlalchemy import create_engine
+import time
+from typing import Any, Dict, Tuple, Union
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 
-from app.config import DATABASE_URL
+from app.config import (
+    DATABASE_URL, DB_ASYNC, DB_POOL_PROFILE, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS
+)
+from app.metrics import CallbackMetric, instrument_engine, pool_checkout_seconds, register
+
+class _TimedCheckoutMixin:
+    """Pool mixin that records how long each connection checkout waits."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - start)
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+class TimedNullPool(_TimedCheckoutMixin, NullPool):
+    pass
+
+def engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Build create_engine keyword arguments from the pool settings in app.config.
+
+    Args:
+        url: Database URL the engine is created for
+        is_async: Whether the options are for the async engine
+
+    Returns:
+        Keyword arguments for create_engine / create_async_engine
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+
+    # In-memory SQLite keeps a single shared connection, leave its pool alone
+    if backend == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+
+    options: Dict[str, Any] = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if DB_POOL_PROFILE == "serverless":
+        options["poolclass"] = TimedNullPool
+    else:
+        options.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    if backend == "postgresql":
+        if DB_POOL_PROFILE == "serverless":
+            # Transaction-mode poolers reject startup parameters and cannot keep
+            # prepared statements; the timeout is set per transaction instead
+            # (apply_statement_timeout)
+            if is_async:
+                options["connect_args"] = {"statement_cache_size": 0}
+        elif is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+
+    return options
+
+def apply_statement_timeout(engine):
+    """
+    Set statement_timeout with SET LOCAL at the start of every transaction.
+
+    Used under the serverless profile, where the timeout cannot be sent as a
+    startup parameter. The statement goes through a raw cursor, so it is not
+    counted against request query budgets.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "postgresql" or DB_POOL_PROFILE != "serverless" or DB_STATEMENT_TIMEOUT_MS <= 0:
+        return
+
+    @event.listens_for(sync_engine, "begin")
+    def set_local_statement_timeout(connection):
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(f"SET LOCAL statement_timeout = {int(DB_STATEMENT_TIMEOUT_MS)}")
+        finally:
+            cursor.close()
 
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_engine(engine)
+apply_statement_timeout(engine)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -13,6 +107,56 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for models
 Base = declarative_base()
 
+# Async drivers used when DB_ASYNC is enabled
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    """
+    Convert a sync database URL to the matching async driver URL.
+
+    Args:
+        url: Database URL, e.g. postgresql://... or sqlite:///...
+
+    Returns:
+        The URL using asyncpg for PostgreSQL or aiosqlite for SQLite
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+# Async engine and session factory, only created when enabled
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+    instrument_engine(async_engine)
+    apply_statement_timeout(async_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+def _pool_connections() -> Dict[Tuple[str, str], int]:
+    """Checked-out and idle connections per engine, for /metrics."""
+    values = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool if async_engine is not None else None)):
+        if isinstance(pool, QueuePool):
+            values[(name, "checked_out")] = pool.checkedout()
+            values[(name, "idle")] = pool.checkedin()
+    return values
+
+register(CallbackMetric(
+    "db_pool_connections", "Pooled database connections by state", _pool_connections,
+    label_names=("engine", "state")
+))
+
 # Dependency to get database session
 def get_db():
     """
@@ -25,4 +169,21 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    """
+    Dependency function to get an async database session.
+
+    Yields:
+        SQLAlchemy AsyncSession object
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Session dependency used by the routers, selected by DB_ASYNC
+get_session = get_async_db if DB_ASYNC else get_db
+
+# Type of the session yielded by get_session
+DBSession = Union[Session, AsyncSession]
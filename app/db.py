@@ -1,56 +1,195 @@
-from typing import List, Optional
+import math
+import random
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import Select, bindparam, case, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models.item import Item
 from app.schemas.item import ItemCreate, ItemUpdate
 from app.models.container import Container
-from app.schemas.container import ContainerCreate, ContainerUpdate
+from app.models.table_version import TableVersion
+from app.models.reading import OccupancyReading, OccupancyRollup
+from app.schemas.container import ContainerCreate, ContainerImportRow, ContainerReading, ContainerUpdate
+from app.config import (
+    FORECAST_SYNC_INTERVAL_SECONDS, FORECAST_WINDOW_HOURS, FULL_THRESHOLD, HISTORY_DAILY_RETENTION_DAYS, HISTORY_HOURLY_RETENTION_DAYS,
+    HISTORY_RAW_RETENTION_DAYS, SPATIAL_INDEX, TABLE_VERSION_SHARDS
+)
+from app.cache import container_cache, container_code_key, container_id_key
+from app.events import CHANGE_FIELDS, change_bus
+from app.forecast import FillForecaster, fill_forecaster, to_hours
+from app.spatial import (
+    EARTH_RADIUS_M, geohash_cover, geohash_encode, geohash_range, haversine_m, radius_cover, spatial_grid_cache
+)
 
-def get_items(db: Session) -> List[Item]:
-    """Get all items from the database."""
-    return db.query(Item).all()
+# Name of the containers table in table_versions
+CONTAINERS_TABLE = Container.__tablename__
+
+def table_version_rows(name: str) -> List[str]:
+    """Names of the table_versions rows whose sum is the change counter of a table."""
+    return [name] + [f"{name}:{shard}" for shard in range(1, TABLE_VERSION_SHARDS)]
+
+def _version_bump_statement(row: str):
+    return update(TableVersion).where(TableVersion.name == row).values(version=TableVersion.version + 1)
+
+def _version_statement(name: str):
+    return select(func.coalesce(func.sum(TableVersion.version), 0)).where(
+        TableVersion.name.in_(table_version_rows(name))
+    )
+
+def bump_table_version(db: Session, name: str):
+    """
+    Increment the change counter of a table; call inside the writing transaction.
+
+    A random one of its TABLE_VERSION_SHARDS rows is incremented, so concurrent
+    writers seldom wait on the same row lock; readers add the rows up.
+    """
+    row = random.choice(table_version_rows(name))
+    if db.execute(_version_bump_statement(row)).rowcount == 0:
+        db.add(TableVersion(name=row, version=1))
+
+def get_table_version(db: Session, name: str) -> int:
+    """Get the change counter of a table (0 before its first write)."""
+    return db.scalar(_version_statement(name)) or 0
+
+def _list_statement(
+    model, fields: Optional[Sequence[str]], limit: Optional[int], after_id: Optional[int], criteria: List
+) -> Select:
+    """
+    Build a keyset-paginated SELECT for a list endpoint.
+
+    Args:
+        model: Mapped class to select from
+        fields: Column names to select; the whole entity when None
+        limit: Maximum number of rows, or None for all
+        after_id: Only return rows with an ID greater than this cursor
+        criteria: Extra WHERE clauses
+
+    Returns:
+        A SELECT ordered by the primary key
+    """
+    if fields is None:
+        statement = select(model)
+    else:
+        statement = select(*(getattr(model, field) for field in fields))
+    if after_id is not None:
+        criteria = criteria + [model.id > after_id]
+    if criteria:
+        statement = statement.where(*criteria)
+    statement = statement.order_by(model.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+def item_list_statement(
+    fields: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    is_available: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    name_prefix: Optional[str] = None,
+) -> Select:
+    """Build the SELECT behind GET /items with its filters pushed into SQL."""
+    criteria = []
+    if is_available is not None:
+        criteria.append(Item.is_available == is_available)
+    if min_price is not None:
+        criteria.append(Item.price >= min_price)
+    if max_price is not None:
+        criteria.append(Item.price <= max_price)
+    if name_prefix:
+        criteria.append(Item.name.startswith(name_prefix, autoescape=True))
+    return _list_statement(Item, fields, limit, after_id, criteria)
+
+def get_items(db: Session, **filters) -> List[Item]:
+    """Get items from the database, optionally filtered and paginated by item_list_statement arguments."""
+    return list(db.scalars(item_list_statement(**filters)))
+
+def get_item_rows(db: Session, fields: Sequence[str], **filters) -> List[Dict[str, Any]]:
+    """Get only the given columns of the matching items as dictionaries, without loading ORM objects."""
+    return [dict(zip(fields, row)) for row in db.execute(item_list_statement(fields=fields, **filters))]
 
 def get_item(db: Session, item_id: int) -> Optional[Item]:
     """Get a specific item by ID."""
     return db.query(Item).filter(Item.id == item_id).first()
 
-def create_item(db: Session, item: ItemCreate) -> Item:
-    """Create a new item and return it."""
-    db_item = Item(
-        name=item.name,
-        description=item.description,
-        price=item.price,
-        is_available=item.is_available
-    )
-    db.add(db_item)
+# Writes read the row back with RETURNING instead of a refresh after the commit
+_ITEM_COLUMNS = tuple(Item.__table__.c)
+
+def _item_insert(item: ItemCreate):
+    return insert(Item.__table__).values(**item.model_dump()).returning(*_ITEM_COLUMNS)
+
+def _item_update(item_id: int, changes: Dict[str, Any]):
+    if not changes:
+        return select(*_ITEM_COLUMNS).where(Item.id == item_id)
+    return update(Item.__table__).where(Item.id == item_id).values(**changes).returning(*_ITEM_COLUMNS)
+
+def _item_delete(item_id: int):
+    return delete(Item.__table__).where(Item.id == item_id).returning(Item.id)
+
+def create_item(db: Session, item: ItemCreate) -> Dict[str, Any]:
+    """Create a new item and return its fields."""
+    values = dict(db.execute(_item_insert(item)).one()._mapping)
     db.commit()
-    db.refresh(db_item)
-    return db_item
-
-def update_item(db: Session, item_id: int, item: ItemUpdate) -> Optional[Item]:
-    """Update an existing item."""
-    db_item = get_item(db, item_id)
-    if db_item:
-        update_data = item.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_item, key, value)
-        db.commit()
-        db.refresh(db_item)
-        return db_item
-    return None
+    return values
+
+def update_item(db: Session, item_id: int, item: ItemUpdate) -> Optional[Dict[str, Any]]:
+    """Update an existing item and return its new fields, or None if it does not exist."""
+    row = db.execute(_item_update(item_id, item.model_dump(exclude_unset=True))).one_or_none()
+    db.commit()
+    return None if row is None else dict(row._mapping)
 
 def delete_item(db: Session, item_id: int) -> bool:
     """Delete an item by ID."""
-    db_item = get_item(db, item_id)
-    if db_item:
-        db.delete(db_item)
-        db.commit()
-        return True
-    return False
+    deleted = db.execute(_item_delete(item_id)).one_or_none() is not None
+    db.commit()
+    return deleted
 
-def get_containers(db: Session) -> List[Container]:
-    """Get all containers from the database."""
-    return db.query(Container).all()
+def container_list_statement(
+    fields: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    is_full: Optional[bool] = None,
+    min_occupancy: Optional[float] = None,
+    name_prefix: Optional[str] = None,
+    through_id: Optional[int] = None,
+) -> Select:
+    """Build the SELECT behind GET /containers with its filters pushed into SQL."""
+    criteria = []
+    if through_id is not None:
+        criteria.append(Container.id <= through_id)
+    if is_full is not None:
+        criteria.append(Container.is_full == is_full)
+    if min_occupancy is not None:
+        criteria.append(Container.occupancy_ratio >= min_occupancy)
+    if name_prefix:
+        criteria.append(Container.name.startswith(name_prefix, autoescape=True))
+    return _list_statement(Container, fields, limit, after_id, criteria)
+
+def get_containers(db: Session, **filters) -> List[Container]:
+    """Get containers from the database, optionally filtered and paginated by container_list_statement arguments."""
+    return list(db.scalars(container_list_statement(**filters)))
+
+def get_container_rows(db: Session, fields: Sequence[str], **filters) -> List[Dict[str, Any]]:
+    """Get only the given columns of the matching containers as dictionaries, without loading ORM objects."""
+    return [dict(zip(fields, row)) for row in db.execute(container_list_statement(fields=fields, **filters))]
+
+def get_container_next_cursor(db: Session, limit: int, **filters) -> Optional[int]:
+    """
+    The after_id of the page following a page of limit containers, or None if that page is the last.
+
+    Lets a page be streamed with its X-Next-Cursor header sent up front;
+    streaming with through_id set to the cursor keeps the page and the
+    cursor consistent even if containers are written in between.
+    """
+    ids = list(db.scalars(container_list_statement(fields=["id"], limit=2, **filters).offset(limit - 1)))
+    return ids[0] if len(ids) == 2 else None
 
 def get_container(db: Session, container_id: int) -> Optional[Container]:
     """Get a specific container by ID."""
@@ -60,38 +199,1248 @@ def get_container_by_code(db: Session, container_code: str) -> Optional[Containe
     """Get a specific container by container_code."""
     return db.query(Container).filter(Container.container_code == container_code).first()
 
-def create_container(db: Session, container: ContainerCreate) -> Container:
-    """Create a new container and return it."""
-    db_container = Container(
-        container_code=container.container_code,
-        name=container.name,
-        lang=container.lang,
-        long=container.long,
-        occupancy_ratio=container.occupancy_ratio,
-        is_full=container.is_full
+# Columns kept in the container lookup cache, matching ContainerResponse
+CACHED_CONTAINER_FIELDS = ("id", "container_code", "name", "lang", "long", "occupancy_ratio", "is_full")
+
+# Columns read back by container writes with RETURNING: the response plus change events
+_WRITTEN_CONTAINER_COLUMNS = tuple(
+    Container.__table__.c[field] for field in dict.fromkeys(CACHED_CONTAINER_FIELDS + CHANGE_FIELDS)
+)
+
+class DuplicateContainerCodeError(ValueError):
+    """A write would give a container the code of another container."""
+
+    def __init__(self, container_code: str):
+        super().__init__(f"Container with code {container_code} already exists")
+        self.container_code = container_code
+
+# Name of the unique index on containers.container_code
+_CONTAINER_CODE_INDEX = next(
+    index.name for index in Container.__table__.indexes
+    if index.unique and list(index.columns) == [Container.__table__.c.container_code]
+)
+
+def _is_duplicate_code(error: IntegrityError) -> bool:
+    """Whether error is a violation of the unique container_code index, not of another constraint."""
+    # psycopg2 reports the constraint in diag, asyncpg on the exception the adapter wraps
+    for source in (getattr(error.orig, "diag", None), getattr(error.orig, "__cause__", None)):
+        constraint = getattr(source, "constraint_name", None)
+        if constraint is not None:
+            return constraint == _CONTAINER_CODE_INDEX
+    # SQLite names the column: "UNIQUE constraint failed: containers.container_code"
+    message = str(error.orig)
+    return "UNIQUE" in message.upper() and "container_code" in message
+
+def _container_values(container: Optional[Container]) -> Optional[Dict[str, Any]]:
+    if container is None:
+        return None
+    return {field: getattr(container, field) for field in CACHED_CONTAINER_FIELDS}
+
+def _cache_container(values: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Store a loaded container under both of its lookup keys."""
+    if values is not None:
+        container_cache.set(container_id_key(values["id"]), values)
+        container_cache.set(container_code_key(values["container_code"]), values["id"])
+    return values
+
+def invalidate_containers(container_ids: Iterable[int] = (), container_codes: Iterable[str] = ()):
+    """Drop containers from the lookup cache; call after the change is committed."""
+    keys = [container_id_key(container_id) for container_id in container_ids]
+    keys += [container_code_key(code) for code in container_codes if code]
+    if keys:
+        container_cache.invalidate(keys)
+
+def publish_container_changes(db: Session, container_ids: Iterable[int], chunk_size: int = 5000):
+    """Send the committed state of containers to /containers/stream subscribers, if there are any."""
+    if not change_bus.has_subscribers:
+        return
+    container_ids = list(container_ids)
+    columns = [getattr(Container, field) for field in CHANGE_FIELDS]
+    changes = []
+    for start in range(0, len(container_ids), chunk_size):
+        chunk = container_ids[start:start + chunk_size]
+        changes.extend(dict(row._mapping) for row in db.execute(select(*columns).where(Container.id.in_(chunk))))
+    change_bus.publish(changes)
+
+def _publish_container(values: Dict[str, Any], deleted: bool = False):
+    """Send one written (or deleted) container to /containers/stream subscribers, if there are any."""
+    if change_bus.has_subscribers:
+        change = {field: values[field] for field in CHANGE_FIELDS}
+        if deleted:
+            change["deleted"] = True
+        change_bus.publish([change])
+
+def get_cached_container(db: Session, container_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Get a container by ID through the read-through cache.
+
+    Returns a detached dictionary of the ContainerResponse fields rather than
+    an ORM object, so it must not be used for updates.
+    """
+    return container_cache.get_or_load(
+        container_id_key(container_id), lambda: _container_values(get_container(db, container_id))
     )
-    db.add(db_container)
-    db.commit()
-    db.refresh(db_container)
-    return db_container
-
-def update_container(db: Session, container_id: int, container: ContainerUpdate) -> Optional[Container]:
-    """Update an existing container."""
-    db_container = get_container(db, container_id)
-    if db_container:
-        update_data = container.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_container, key, value)
+
+def get_cached_container_by_code(db: Session, container_code: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a container by container_code through the read-through cache.
+
+    The code is cached as an alias of the ID, so occupancy changes only
+    invalidate the ID entry.
+    """
+    container_id = container_cache.get(container_code_key(container_code))
+    if container_id is not None:
+        values = get_cached_container(db, container_id)
+        if values is not None and values["container_code"] == container_code:
+            return values
+    return _cache_container(_container_values(get_container_by_code(db, container_code)))
+
+# Rollup resolutions and the width of their buckets
+ROLLUP_WIDTHS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _bucket_start(moment: datetime, width: timedelta) -> datetime:
+    """Start of the width-aligned bucket (counted from the UNIX epoch) containing moment."""
+    width_seconds = int(width.total_seconds())
+    seconds = int((moment - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=seconds - seconds % width_seconds)
+
+def _dialect_insert(db: Session) -> Optional[Callable]:
+    """The insert() of the session's dialect if it supports ON CONFLICT clauses, else None."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+def _rollup_upsert(db: Session, dialect_insert: Callable):
+    """INSERT ... ON CONFLICT statement that folds pre-aggregated rows into the rollups."""
+    if db.get_bind().dialect.name == "postgresql":
+        smaller, larger = func.least, func.greatest
+    else:
+        smaller, larger = func.min, func.max
+    table = OccupancyRollup.__table__
+    statement = dialect_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.container_id, table.c.resolution, table.c.bucket_start],
+        set_={
+            "reading_count": table.c.reading_count + statement.excluded.reading_count,
+            "ratio_sum": table.c.ratio_sum + statement.excluded.ratio_sum,
+            "ratio_min": smaller(table.c.ratio_min, statement.excluded.ratio_min),
+            "ratio_max": larger(table.c.ratio_max, statement.excluded.ratio_max),
+            # Rollups written before the column existed have no last reading yet
+            "last_recorded_at": larger(
+                func.coalesce(table.c.last_recorded_at, statement.excluded.last_recorded_at),
+                statement.excluded.last_recorded_at,
+            ),
+        },
+    )
+
+def _merge_rollups(db: Session, rows: List[Dict[str, Any]], chunk_size: int = 5000):
+    """
+    Fold pre-aggregated rows into the rollups without ON CONFLICT.
+
+    The fallback for dialects without it: the existing buckets are selected,
+    new ones inserted and the others incremented in place.
+    """
+    table = OccupancyRollup.__table__
+    existing = set()
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        existing.update(db.execute(
+            select(table.c.container_id, table.c.resolution, table.c.bucket_start).where(
+                table.c.container_id.in_({row["container_id"] for row in chunk}),
+                table.c.bucket_start.between(
+                    min(row["bucket_start"] for row in chunk), max(row["bucket_start"] for row in chunk)
+                ),
+            )
+        ).tuples())
+    key = lambda row: (row["container_id"], row["resolution"], row["bucket_start"])
+    inserts = [row for row in rows if key(row) not in existing]
+    updates = [{f"b_{name}": value for name, value in row.items()} for row in rows if key(row) in existing]
+    if inserts:
+        db.execute(insert(table), inserts)
+    if updates:
+        low, high = bindparam("b_ratio_min"), bindparam("b_ratio_max")
+        last = bindparam("b_last_recorded_at")
+        db.execute(
+            update(table)
+            .where(
+                table.c.container_id == bindparam("b_container_id"),
+                table.c.resolution == bindparam("b_resolution"),
+                table.c.bucket_start == bindparam("b_bucket_start"),
+            )
+            .values(
+                reading_count=table.c.reading_count + bindparam("b_reading_count"),
+                ratio_sum=table.c.ratio_sum + bindparam("b_ratio_sum"),
+                ratio_min=case((table.c.ratio_min < low, table.c.ratio_min), else_=low),
+                ratio_max=case((table.c.ratio_max > high, table.c.ratio_max), else_=high),
+                last_recorded_at=case((table.c.last_recorded_at > last, table.c.last_recorded_at), else_=last),
+            ),
+            updates,
+        )
+
+def _recorded_readings(
+    db: Session, readings: Sequence[Tuple[int, datetime, float]], chunk_size: int = 5000
+) -> set:
+    """(container_id, recorded_at) pairs of readings already in the history."""
+    recorded = set()
+    for start in range(0, len(readings), chunk_size):
+        chunk = readings[start:start + chunk_size]
+        recorded.update(db.execute(
+            select(OccupancyReading.container_id, OccupancyReading.recorded_at).where(
+                OccupancyReading.container_id.in_({container_id for container_id, _, _ in chunk}),
+                OccupancyReading.recorded_at.between(
+                    min(recorded_at for _, recorded_at, _ in chunk), max(recorded_at for _, recorded_at, _ in chunk)
+                ),
+            )
+        ).tuples())
+    return recorded
+
+def record_occupancy(
+    db: Session, readings: Sequence[Tuple[int, datetime, float]], skip_recorded: bool = False
+):
+    """
+    Append occupancy readings to the history and fold them into the rollups.
+
+    Runs inside the caller's transaction, so the history commits together
+    with the write it describes. Readings are inserted with one executemany
+    INSERT, and the rollups are aggregated per bucket first, then upserted
+    with one executemany INSERT ... ON CONFLICT (or merged with a SELECT,
+    INSERT and UPDATE on dialects without it).
+
+    Args:
+        db: Database session
+        readings: (container_id, recorded_at in UTC, occupancy_ratio) tuples; a
+            (container_id, recorded_at) pair repeated in the batch is recorded once, the last one wins
+        skip_recorded: Leave out readings whose (container_id, recorded_at) is already in
+            the history, e.g. sensor readings sent again, so they are not counted twice
+    """
+    readings = [
+        (container_id, recorded_at, ratio)
+        for (container_id, recorded_at), ratio in {
+            (container_id, recorded_at): ratio for container_id, recorded_at, ratio in readings
+        }.items()
+    ]
+    if readings and skip_recorded:
+        recorded = _recorded_readings(db, readings)
+        readings = [reading for reading in readings if reading[:2] not in recorded]
+    if not readings:
+        return
+    db.execute(insert(OccupancyReading.__table__), [
+        {"container_id": container_id, "recorded_at": recorded_at, "occupancy_ratio": ratio}
+        for container_id, recorded_at, ratio in readings
+    ])
+
+    aggregates: Dict[Tuple[int, str, datetime], List[Any]] = {}
+    for container_id, recorded_at, ratio in readings:
+        for resolution, width in ROLLUP_WIDTHS.items():
+            key = (container_id, resolution, _bucket_start(recorded_at, width))
+            aggregate = aggregates.get(key)
+            if aggregate is None:
+                aggregates[key] = [1, ratio, ratio, ratio, recorded_at]
+            else:
+                aggregate[0] += 1
+                aggregate[1] += ratio
+                aggregate[2] = min(aggregate[2], ratio)
+                aggregate[3] = max(aggregate[3], ratio)
+                aggregate[4] = max(aggregate[4], recorded_at)
+    rows = [
+        {
+            "container_id": container_id, "resolution": resolution, "bucket_start": bucket_start,
+            "reading_count": count, "ratio_sum": total, "ratio_min": low, "ratio_max": high,
+            "last_recorded_at": last,
+        }
+        for (container_id, resolution, bucket_start), (count, total, low, high, last) in aggregates.items()
+    ]
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is None:
+        _merge_rollups(db, rows)
+    else:
+        db.execute(_rollup_upsert(db, dialect_insert), rows)
+
+# History sources from cheapest to most detailed: (name, bucket width, retention)
+HISTORY_SOURCES = (
+    ("day", ROLLUP_WIDTHS["day"], timedelta(days=HISTORY_DAILY_RETENTION_DAYS)),
+    ("hour", ROLLUP_WIDTHS["hour"], timedelta(days=HISTORY_HOURLY_RETENTION_DAYS)),
+    ("raw", None, timedelta(days=HISTORY_RAW_RETENTION_DAYS)),
+)
+
+def choose_history_source(start: datetime, step: timedelta, now: Optional[datetime] = None) -> str:
+    """
+    Pick the cheapest history source that can answer a query.
+
+    That is the coarsest rollup whose bucket width divides step. If the
+    range starts before that source's retention, the next coarser source
+    that still covers the range is used.
+    """
+    now = now or _utc_now()
+    candidates = [
+        index for index, (_, width, _) in enumerate(HISTORY_SOURCES)
+        if width is None or step % width == timedelta(0)
+    ]
+    index = candidates[0]
+    while index > 0 and start < now - HISTORY_SOURCES[index][2]:
+        index -= 1
+    return HISTORY_SOURCES[index][0]
+
+def get_container_history(
+    db: Session, container_id: int, start: datetime, end: datetime, step: timedelta
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Get a container's occupancy between start and end, aggregated into step-wide buckets.
+
+    Args:
+        db: Database session
+        container_id: Container ID
+        start: Range start (UTC)
+        end: Range end (UTC), exclusive
+        step: Bucket width of the result
+
+    Returns:
+        (source used, points with ts, avg, min, max and count), oldest first
+    """
+    start, end = _as_utc(start), _as_utc(end)
+    source = choose_history_source(start, step)
+    if source == "raw":
+        rows = db.execute(
+            select(OccupancyReading.recorded_at, OccupancyReading.occupancy_ratio)
+            .where(
+                OccupancyReading.container_id == container_id,
+                OccupancyReading.recorded_at >= start,
+                OccupancyReading.recorded_at < end,
+            )
+        )
+        rows = [(recorded_at, 1, ratio, ratio, ratio) for recorded_at, ratio in rows]
+    else:
+        rows = db.execute(
+            select(
+                OccupancyRollup.bucket_start, OccupancyRollup.reading_count, OccupancyRollup.ratio_sum,
+                OccupancyRollup.ratio_min, OccupancyRollup.ratio_max,
+            )
+            .where(
+                OccupancyRollup.container_id == container_id,
+                OccupancyRollup.resolution == source,
+                OccupancyRollup.bucket_start >= _bucket_start(start, ROLLUP_WIDTHS[source]),
+                OccupancyRollup.bucket_start < end,
+            )
+        ).all()
+
+    buckets: Dict[datetime, List[float]] = {}
+    for moment, count, total, low, high in rows:
+        key = _bucket_start(moment, step)
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [count, total, low, high]
+        else:
+            bucket[0] += count
+            bucket[1] += total
+            bucket[2] = min(bucket[2], low)
+            bucket[3] = max(bucket[3], high)
+    points = [
+        {"ts": key, "avg": total / count, "min": low, "max": high, "count": count}
+        for key, (count, total, low, high) in sorted(buckets.items())
+    ]
+    return source, points
+
+def compact_history(db: Session, now: Optional[datetime] = None, batch_size: int = 10000) -> Dict[str, int]:
+    """
+    Apply the history retention policy.
+
+    Raw readings are kept for HISTORY_RAW_RETENTION_DAYS, hourly rollups for
+    HISTORY_HOURLY_RETENTION_DAYS and daily rollups for
+    HISTORY_DAILY_RETENTION_DAYS. The rollups are maintained as readings
+    arrive, so dropping old raw rows loses no aggregate. Raw rows are
+    deleted in batches with a commit after each, keeping transactions short.
+
+    Returns:
+        Number of rows deleted per source
+    """
+    now = now or _utc_now()
+    deleted = {"raw": 0, "hour": 0, "day": 0}
+    raw_cutoff = now - timedelta(days=HISTORY_RAW_RETENTION_DAYS)
+    while True:
+        ids = list(db.scalars(
+            select(OccupancyReading.id).where(OccupancyReading.recorded_at < raw_cutoff).limit(batch_size)
+        ))
+        if not ids:
+            break
+        db.execute(delete(OccupancyReading).where(OccupancyReading.id.in_(ids)))
         db.commit()
-        db.refresh(db_container)
-        return db_container
-    return None
+        deleted["raw"] += len(ids)
+
+    for resolution, days in (("hour", HISTORY_HOURLY_RETENTION_DAYS), ("day", HISTORY_DAILY_RETENTION_DAYS)):
+        result = db.execute(delete(OccupancyRollup).where(
+            OccupancyRollup.resolution == resolution,
+            OccupancyRollup.bucket_start < now - timedelta(days=days),
+        ))
+        deleted[resolution] = result.rowcount
+    db.commit()
+    return deleted
+
+def _is_full(container: Union[ContainerCreate, ContainerUpdate]) -> Optional[bool]:
+    """The is_full flag to store: as sent, or derived from occupancy_ratio when the client left it out."""
+    if "is_full" in container.model_fields_set or container.occupancy_ratio is None:
+        return container.is_full
+    return container.occupancy_ratio >= FULL_THRESHOLD
+
+def _container_insert(container: ContainerCreate):
+    values = {
+        **container.model_dump(), "is_full": _is_full(container),
+        "geohash": geohash_encode(container.lang, container.long),
+    }
+    return insert(Container.__table__).values(**values).returning(*_WRITTEN_CONTAINER_COLUMNS)
+
+def _container_changes(container: ContainerUpdate) -> Dict[str, Any]:
+    """Columns set by a partial update, with is_full and (when both coordinates are sent) geohash derived."""
+    changes = container.model_dump(exclude_unset=True)
+    if changes.get("occupancy_ratio") is not None:
+        changes["is_full"] = _is_full(container)
+    if changes.get("lang") is not None and changes.get("long") is not None:
+        changes["geohash"] = geohash_encode(changes["lang"], changes["long"])
+    return changes
+
+def _container_update(container_id: int, changes: Dict[str, Any]):
+    """UPDATE ... RETURNING of a container, or a plain SELECT of it when nothing changes."""
+    if not changes:
+        return select(*_WRITTEN_CONTAINER_COLUMNS).where(Container.id == container_id)
+    return (
+        update(Container.__table__).where(Container.id == container_id).values(**changes)
+        .returning(*_WRITTEN_CONTAINER_COLUMNS)
+    )
+
+def _moved_geohash(values: Dict[str, Any], changes: Dict[str, Any]) -> Optional[str]:
+    """The new geohash when an update moved only one coordinate of the container, else None."""
+    if "geohash" in changes or ("lang" not in changes and "long" not in changes):
+        return None
+    if values["lang"] is None or values["long"] is None:
+        return None
+    geohash = geohash_encode(values["lang"], values["long"])
+    return geohash if geohash != values["geohash"] else None
+
+def _geohash_update(container_id: int, geohash: str):
+    return update(Container.__table__).where(Container.id == container_id).values(geohash=geohash)
+
+def _container_delete(container_id: int):
+    return (
+        delete(Container.__table__).where(Container.id == container_id)
+        .returning(*(Container.__table__.c[field] for field in CHANGE_FIELDS))
+    )
+
+def _history_deletes(container_id: int):
+    """DELETEs of a container's occupancy readings and rollups, which have no foreign key to cascade from."""
+    return (
+        delete(OccupancyReading.__table__).where(OccupancyReading.container_id == container_id),
+        delete(OccupancyRollup.__table__).where(OccupancyRollup.container_id == container_id),
+    )
+
+def _container_code_statement(container_id: int):
+    return select(Container.container_code).where(Container.id == container_id)
+
+def _after_container_write(values: Dict[str, Any], changes: Dict[str, Any], old_code: Optional[str]):
+    """Update caches and subscribers once an updated container is committed."""
+    invalidate_containers([values["id"]], [old_code, changes.get("container_code")])
+    if "lang" in changes or "long" in changes:
+        spatial_grid_cache.invalidate()
+    _publish_container(values)
+
+def create_container(db: Session, container: ContainerCreate) -> Dict[str, Any]:
+    """
+    Create a new container and return its fields.
+
+    The row is inserted and read back with one INSERT ... RETURNING; a
+    duplicate code is detected by the unique constraint, not a prior SELECT.
+
+    Raises:
+        DuplicateContainerCodeError: Another container already has the code
+    """
+    try:
+        values = dict(db.execute(_container_insert(container)).one()._mapping)
+    except IntegrityError as e:
+        db.rollback()
+        if not _is_duplicate_code(e):
+            raise
+        raise DuplicateContainerCodeError(container.container_code) from e
+    record_occupancy(db, [(values["id"], _utc_now(), values["occupancy_ratio"])])
+    bump_table_version(db, CONTAINERS_TABLE)
+    db.commit()
+    spatial_grid_cache.invalidate()
+    _publish_container(values)
+    return values
+
+def update_container(
+    db: Session, container_id: int, container: ContainerUpdate
+) -> Optional[Dict[str, Any]]:
+    """
+    Update an existing container and return its new fields, or None if it does not exist.
+
+    The row is updated and read back with one UPDATE ... RETURNING, so no
+    SELECT before or refresh after the write is needed (except the old code
+    when the code changes).
+
+    Raises:
+        DuplicateContainerCodeError: The new code belongs to another container
+    """
+    changes = _container_changes(container)
+    # Renames are rare; only they need the old code, to drop its cache entry
+    old_code = db.scalar(_container_code_statement(container_id)) if "container_code" in changes else None
+    try:
+        row = db.execute(_container_update(container_id, changes)).one_or_none()
+    except IntegrityError as e:
+        db.rollback()
+        if not _is_duplicate_code(e):
+            raise
+        raise DuplicateContainerCodeError(changes["container_code"]) from e
+    if row is None or not changes:
+        db.rollback()
+        return None if row is None else dict(row._mapping)
+    values = dict(row._mapping)
+    geohash = _moved_geohash(values, changes)
+    if geohash is not None:
+        db.execute(_geohash_update(container_id, geohash))
+        values["geohash"] = geohash
+    if changes.get("occupancy_ratio") is not None:
+        record_occupancy(db, [(container_id, _utc_now(), changes["occupancy_ratio"])])
+    bump_table_version(db, CONTAINERS_TABLE)
+    db.commit()
+    _after_container_write(values, changes, old_code)
+    return values
 
 def delete_container(db: Session, container_id: int) -> bool:
-    """Delete a container by ID."""
-    db_container = get_container(db, container_id)
-    if db_container:
-        db.delete(db_container)
-        db.commit()
-        return True
-    return False 
\ No newline at end of file
+    """Delete a container by ID, together with its occupancy history."""
+    row = db.execute(_container_delete(container_id)).one_or_none()
+    if row is None:
+        db.rollback()
+        return False
+    for statement in _history_deletes(container_id):
+        db.execute(statement)
+    bump_table_version(db, CONTAINERS_TABLE)
+    db.commit()
+    invalidate_containers([container_id], [row.container_code])
+    spatial_grid_cache.invalidate()
+    _publish_container(row._mapping, deleted=True)
+    return True
+
+def get_container_ids(db: Session, exclude_codes: Iterable[str] = ()) -> List[int]:
+    """Get the IDs of all containers, optionally skipping some container codes."""
+    query = db.query(Container.id)
+    exclude_codes = list(exclude_codes)
+    if exclude_codes:
+        # NOT IN is NULL for containers without a code, which must not be excluded
+        query = query.filter(or_(Container.container_code.is_(None), Container.container_code.notin_(exclude_codes)))
+    return [row.id for row in query]
+
+def bulk_update_container_occupancy(
+    db: Session, occupancy: Dict[int, float], full_threshold: float = FULL_THRESHOLD
+) -> int:
+    """
+    Set the occupancy ratio of many containers in a single transaction.
+
+    The rows are written with one executemany UPDATE keyed on the primary
+    key, and is_full is derived from each ratio using full_threshold.
+
+    Args:
+        db: Database session
+        occupancy: Mapping of container ID to its new occupancy ratio
+        full_threshold: Ratio at or above which a container counts as full
+
+    Returns:
+        Number of containers updated
+    """
+    if not occupancy:
+        return 0
+    rows = [
+        {"id": container_id, "occupancy_ratio": ratio, "is_full": ratio >= full_threshold}
+        for container_id, ratio in occupancy.items()
+    ]
+    db.execute(update(Container), rows)
+    now = _utc_now()
+    record_occupancy(db, [(container_id, now, ratio) for container_id, ratio in occupancy.items()])
+    bump_table_version(db, CONTAINERS_TABLE)
+    db.commit()
+    invalidate_containers(occupancy.keys())
+    publish_container_changes(db, occupancy.keys())
+    return len(rows)
+
+def _as_utc(moment: datetime) -> datetime:
+    """Naive UTC datetime for storage; naive inputs are taken to be UTC already."""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def apply_container_readings(
+    db: Session, readings: Sequence[ContainerReading], full_threshold: float = FULL_THRESHOLD, chunk_size: int = 5000
+) -> Dict[str, Any]:
+    """
+    Apply a batch of sensor readings in one transaction.
+
+    Only the newest reading per container is kept, and it is written only if
+    it is newer than the reading already stored, so readings arriving out of
+    order never roll a container back. is_full is derived from the ratio.
+    All writes go out as a single executemany UPDATE keyed on the ID.
+
+    Args:
+        db: Database session
+        readings: Readings in any order, possibly several per container
+        full_threshold: Ratio at or above which a container counts as full
+        chunk_size: Container codes resolved per SELECT
+
+    Returns:
+        Counts matching ReadingBatchResponse
+    """
+    latest: Dict[str, Tuple[float, datetime]] = {}
+    for reading in readings:
+        ts = _as_utc(reading.ts)
+        current = latest.get(reading.container_code)
+        if current is None or ts > current[1]:
+            latest[reading.container_code] = (reading.occupancy_ratio, ts)
+
+    codes = list(latest)
+    found = []
+    for start in range(0, len(codes), chunk_size):
+        found.extend(db.execute(
+            select(Container.id, Container.container_code, Container.reading_at)
+            .where(Container.container_code.in_(codes[start:start + chunk_size]))
+        ))
+
+    rows = []
+    for row in found:
+        ratio, ts = latest[row.container_code]
+        if row.reading_at is not None and row.reading_at >= ts:
+            continue
+        rows.append({"b_id": row.id, "b_ratio": ratio, "b_full": ratio >= full_threshold, "b_ts": ts})
+
+    if rows:
+        # The reading_at guard also protects against a concurrent batch that committed a newer reading
+        table = Container.__table__
+        statement = (
+            update(table)
+            .where(
+                table.c.id == bindparam("b_id"),
+                or_(table.c.reading_at.is_(None), table.c.reading_at < bindparam("b_ts")),
+            )
+            .values(occupancy_ratio=bindparam("b_ratio"), is_full=bindparam("b_full"), reading_at=bindparam("b_ts"))
+        )
+        result = db.execute(statement, rows)
+        if not (db.get_bind().dialect.supports_sane_multi_rowcount and result.rowcount == len(rows)):
+            # Some rows lost to a concurrent newer reading, or the driver cannot tell: look which ones stuck
+            applied_at = {}
+            for start in range(0, len(rows), chunk_size):
+                applied_at.update(db.execute(
+                    select(Container.id, Container.reading_at)
+                    .where(Container.id.in_([row["b_id"] for row in rows[start:start + chunk_size]]))
+                ).all())
+            rows = [row for row in rows if applied_at.get(row["b_id"]) == row["b_ts"]]
+    if rows:
+        bump_table_version(db, CONTAINERS_TABLE)
+
+    # The history keeps every distinct reading of a known container, including the superseded ones
+    ids_by_code = {row.container_code: row.id for row in found}
+    history = {}
+    for reading in readings:
+        container_id = ids_by_code.get(reading.container_code)
+        if container_id is not None:
+            history[(container_id, _as_utc(reading.ts))] = reading.occupancy_ratio
+    record_occupancy(
+        db, [(container_id, ts, ratio) for (container_id, ts), ratio in history.items()], skip_recorded=True
+    )
+    db.commit()
+
+    updated_ids = [row["b_id"] for row in rows]
+    if updated_ids:
+        # Published only along with a version bump, so the stream's version watcher counts it as local
+        invalidate_containers(updated_ids)
+        publish_container_changes(db, updated_ids)
+    known_codes = {row.container_code for row in found}
+    return {
+        "received": len(readings),
+        "applied": len(rows),
+        "duplicates": len(readings) - len({(reading.container_code, _as_utc(reading.ts)) for reading in readings}),
+        # Distinct readings of known containers that were not written: older than the stored one or
+        # superseded by a newer reading in the same batch
+        "stale": len(history) - len(rows),
+        "unknown_codes": [code for code in codes if code not in known_codes],
+    }
+
+# Columns written by upsert_containers besides container_code
+UPSERT_FIELDS = ("name", "lang", "long", "occupancy_ratio", "is_full", "geohash")
+
+def _upsert_fields(container: Union[ContainerCreate, ContainerImportRow]) -> Tuple[str, ...]:
+    """Columns an import row overwrites on an existing container: only those the row has, plus derived ones."""
+    fields = set(container.model_fields_set)
+    if "occupancy_ratio" in fields:
+        fields.add("is_full")
+    if "lang" in fields or "long" in fields:
+        fields.add("geohash")
+    return tuple(field for field in UPSERT_FIELDS if field in fields)
+
+def _merge_containers(
+    db: Session, groups: Dict[Tuple[str, ...], List[Dict[str, Any]]], existing: set, update_existing: bool
+) -> Dict[str, int]:
+    """
+    Write upsert_containers rows without ON CONFLICT, returning the ID of each written code.
+
+    The fallback for dialects without it: new codes are inserted and existing
+    ones updated with one executemany per column group. Unlike the upsert, a
+    code created concurrently since the caller's SELECT fails the batch.
+    """
+    table = Container.__table__
+    inserts = [row for rows in groups.values() for row in rows if row["container_code"] not in existing]
+    if inserts:
+        db.execute(insert(table), inserts)
+    if update_existing:
+        for fields, rows in groups.items():
+            updates = [
+                {"b_container_code": row["container_code"], **{f"b_{field}": row[field] for field in fields}}
+                for row in rows if row["container_code"] in existing
+            ]
+            if updates and fields:
+                db.execute(
+                    update(table).where(table.c.container_code == bindparam("b_container_code"))
+                    .values({field: bindparam(f"b_{field}") for field in fields}),
+                    updates,
+                )
+    written = [row["container_code"] for row in inserts]
+    if update_existing:
+        written += [row["container_code"] for rows in groups.values() for row in rows if row["container_code"] in existing]
+    ids: Dict[str, int] = {}
+    for start in range(0, len(written), 5000):
+        ids.update(db.execute(
+            select(table.c.container_code, table.c.id).where(table.c.container_code.in_(written[start:start + 5000]))
+        ).all())
+    return ids
+
+def upsert_containers(
+    db: Session, containers: Sequence[Union[ContainerCreate, ContainerImportRow]], update_existing: bool = True
+) -> Dict[str, Any]:
+    """
+    Insert containers, or update the ones whose container_code already exists, in one transaction.
+
+    The batch goes out as one executemany INSERT ... ON CONFLICT (container_code)
+    with RETURNING (a SELECT, INSERT and UPDATE on dialects without it); when a
+    code repeats in the batch the last row wins. Existing containers only get
+    the columns a row has, so they keep their occupancy when the row has no
+    occupancy_ratio; is_full is derived from occupancy_ratio when the row
+    leaves it out, and occupancy changes are recorded in the history. A
+    ContainerImportRow for a new code must still validate as a
+    ContainerCreate, otherwise it is rejected.
+
+    Args:
+        db: Database session
+        containers: Containers to write; keep batches to a few thousand rows
+        update_existing: Leave existing containers untouched instead of updating them
+
+    Returns:
+        Counts of inserted, updated and skipped containers, and the
+        (container_code, ValidationError) of each rejected row
+    """
+    latest = {container.container_code: container for container in containers}
+    if not latest:
+        return {"inserted": 0, "updated": 0, "skipped": 0, "rejected": []}
+    previous = {
+        code: (ratio, lang, long)
+        for code, ratio, lang, long in db.execute(
+            select(Container.container_code, Container.occupancy_ratio, Container.lang, Container.long)
+            .where(Container.container_code.in_(list(latest)))
+        ).all()
+    }
+    rejected = []
+    for code, container in list(latest.items()):
+        if code not in previous and not isinstance(container, ContainerCreate):
+            # Existing containers take partial rows, a new one needs a full row
+            try:
+                latest[code] = ContainerCreate.model_validate(container.model_dump(exclude_unset=True))
+            except ValidationError as e:
+                rejected.append((code, e))
+                del latest[code]
+    unique = len(latest)
+    if not update_existing:
+        latest = {code: container for code, container in latest.items() if code not in previous}
+    if not latest:
+        return {"inserted": 0, "updated": 0, "skipped": unique, "rejected": rejected}
+
+    # Rows are grouped by the columns they overwrite, one executemany per group
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for code, container in latest.items():
+        row = {**container.model_dump(), "is_full": _is_full(container)}
+        if code in previous:
+            # A coordinate the row leaves out keeps its stored value for the geohash
+            _, lang, long = previous[code]
+            if "lang" not in container.model_fields_set:
+                row["lang"] = lang
+            if "long" not in container.model_fields_set:
+                row["long"] = long
+        row["geohash"] = geohash_encode(row["lang"], row["long"])
+        groups.setdefault(_upsert_fields(container), []).append(row)
+
+    table = Container.__table__
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is None:
+        ids = _merge_containers(db, groups, set(previous), update_existing)
+    else:
+        ids = {}
+        for fields, rows in groups.items():
+            statement = dialect_insert(table)
+            if update_existing and fields:
+                statement = statement.on_conflict_do_update(
+                    index_elements=[table.c.container_code],
+                    set_={field: statement.excluded[field] for field in fields},
+                )
+            else:
+                # A concurrent writer may have created some of the codes since the SELECT above
+                statement = statement.on_conflict_do_nothing(index_elements=[table.c.container_code])
+            ids.update(db.execute(statement.returning(table.c.container_code, table.c.id), rows).all())
+    bump_table_version(db, CONTAINERS_TABLE)
+
+    now = _utc_now()
+    record_occupancy(db, [
+        (ids[code], now, container.occupancy_ratio)
+        for code, container in latest.items()
+        if code in ids and (code not in previous or (
+            "occupancy_ratio" in container.model_fields_set and previous[code][0] != container.occupancy_ratio
+        ))
+    ])
+    db.commit()
+
+    invalidate_containers(ids.values(), ids)
+    spatial_grid_cache.invalidate()
+    publish_container_changes(db, ids.values())
+    inserted = sum(code not in previous for code in ids)
+    return {"inserted": inserted, "updated": len(ids) - inserted, "skipped": unique - len(ids), "rejected": rejected}
+
+def iter_container_batches(
+    db: Session, fields: Sequence[str], chunk_size: int = 5000, **filters
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Stream containers as tuples of the given fields, ordered by ID.
+
+    Rows are fetched chunk_size at a time from a single query (a server-side
+    cursor on PostgreSQL), so memory use does not grow with the table.
+    Every container is returned unless container_list_statement filters are given.
+    """
+    statement = container_list_statement(fields=fields, **filters)
+    for partition in db.execute(statement.execution_options(yield_per=chunk_size)).partitions():
+        yield [tuple(row) for row in partition]
+
+def sync_forecaster(db: Session, forecaster: FillForecaster = fill_forecaster, chunk_size: int = 100000):
+    """
+    Bring the fill-rate forecaster up to date with the occupancy history.
+
+    The first call fits every container from the hourly rollups of the last
+    FORECAST_WINDOW_HOURS; later calls only fold in the raw readings written
+    since the previous call, whichever worker wrote them. The queries run
+    outside the forecaster's lock, which is only held to apply their rows,
+    so predictions are not held up by the database.
+    """
+    if forecaster.last_reading_id is None:
+        last_id = db.scalar(select(func.max(OccupancyReading.id))) or 0
+        since = _bucket_start(_utc_now() - timedelta(hours=FORECAST_WINDOW_HOURS), ROLLUP_WIDTHS["hour"])
+        rows = db.execute(
+            select(
+                OccupancyRollup.container_id,
+                # An hourly average stands for the bucket's newest reading, so readings later in
+                # the same hour still count as new; rollups older than that column use the bucket start
+                func.coalesce(OccupancyRollup.last_recorded_at, OccupancyRollup.bucket_start),
+                OccupancyRollup.ratio_sum / OccupancyRollup.reading_count,
+            )
+            .where(OccupancyRollup.resolution == "hour", OccupancyRollup.bucket_start >= since)
+        ).all()
+        with forecaster.lock:
+            if forecaster.last_reading_id is None:
+                if rows:
+                    container_ids, recorded_at, averages = zip(*rows)
+                    forecaster.fit(container_ids, to_hours(recorded_at), averages)
+                forecaster.last_reading_id = last_id
+
+    while True:
+        last_id = forecaster.last_reading_id
+        rows = db.execute(
+            select(
+                OccupancyReading.id, OccupancyReading.container_id,
+                OccupancyReading.recorded_at, OccupancyReading.occupancy_ratio,
+            )
+            .where(OccupancyReading.id > last_id)
+            .order_by(OccupancyReading.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        with forecaster.lock:
+            # Another sync already applied these readings
+            if forecaster.last_reading_id != last_id:
+                continue
+            _, container_ids, recorded_at, ratios = zip(*rows)
+            forecaster.update(container_ids, to_hours(recorded_at), ratios)
+            forecaster.last_reading_id = rows[-1][0]
+
+def get_due_containers(
+    db: Session, within_hours: float, threshold: Optional[float] = None, located_only: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Get the containers predicted to reach threshold within the given number of hours.
+
+    Containers already at or above the threshold are always due, even
+    without any recorded history.
+
+    Args:
+        db: Database session
+        within_hours: Forecast horizon
+        threshold: Occupancy considered full; FULL_THRESHOLD when None
+        located_only: Skip containers without coordinates
+
+    Returns:
+        ContainerResponse fields plus fill_rate_per_hour, hours_until_full and
+        predicted_full_at, soonest first
+    """
+    threshold = FULL_THRESHOLD if threshold is None else threshold
+    now = _utc_now()
+    # The background sync (app.tasks.sync_forecaster_periodically) keeps the fit current;
+    # a worker that has not synced yet, or runs without it, syncs here
+    if fill_forecaster.last_reading_id is None or FORECAST_SYNC_INTERVAL_SECONDS <= 0:
+        sync_forecaster(db)
+    with fill_forecaster.lock:
+        ids, rates, _, hours_left = fill_forecaster.predict(threshold, float(to_hours([now])[0]))
+    due = hours_left <= within_hours
+    forecasts = {
+        int(container_id): (float(rate), float(hours))
+        for container_id, rate, hours in zip(ids[due], rates[due], hours_left[due])
+    }
+
+    containers = _containers_by_ids(db, list(forecasts))
+    full = db.scalars(select(Container).where(Container.occupancy_ratio >= threshold))
+    containers.update((container.id, container) for container in full)
+
+    result = []
+    for container_id, container in containers.items():
+        if located_only and (container.lang is None or container.long is None):
+            continue
+        rate, hours = forecasts.get(container_id, (float("nan"), 0.0))
+        if container.occupancy_ratio is not None and container.occupancy_ratio >= threshold:
+            hours = 0.0
+        values = _container_values(container)
+        values.update(
+            fill_rate_per_hour=None if math.isnan(rate) else rate,
+            hours_until_full=hours,
+            predicted_full_at=now + timedelta(hours=hours),
+        )
+        result.append(values)
+    result.sort(key=lambda values: (values["hours_until_full"], values["id"]))
+    return result
+
+def get_containers_to_collect(
+    db: Session, occupancy_threshold: Optional[float] = None, due_within_hours: Optional[float] = None
+) -> List[Container]:
+    """
+    Get the containers a collection route should visit, ordered by ID.
+
+    Args:
+        db: Database session
+        occupancy_threshold: Minimum occupancy ratio; the is_full flag is used when None
+        due_within_hours: Instead visit the containers forecast to reach the
+            threshold (FULL_THRESHOLD when None) within this many hours
+
+    Returns:
+        Located containers that need collecting
+    """
+    if due_within_hours is not None:
+        due = get_due_containers(db, due_within_hours, occupancy_threshold, located_only=True)
+        containers = _containers_by_ids(db, [values["id"] for values in due])
+        return [containers[container_id] for container_id in sorted(containers)]
+
+    criteria = [Container.lang.isnot(None), Container.long.isnot(None)]
+    if occupancy_threshold is None:
+        criteria.append(Container.is_full.is_(True))
+    else:
+        criteria.append(Container.occupancy_ratio >= occupancy_threshold)
+    return list(db.scalars(select(Container).where(*criteria).order_by(Container.id)))
+
+def _use_spatial_grid(db: Session) -> bool:
+    """Whether spatial queries use the in-process grid instead of the geohash column."""
+    if SPATIAL_INDEX == "auto":
+        return db.get_bind().dialect.name == "sqlite"
+    return SPATIAL_INDEX == "grid"
+
+def _load_container_points(db: Session) -> Tuple[List[int], List[float], List[float]]:
+    """Load the ID and coordinates of every located container for the spatial grid."""
+    rows = db.execute(
+        select(Container.id, Container.lang, Container.long)
+        .where(Container.lang.isnot(None), Container.long.isnot(None))
+    ).all()
+    return [row.id for row in rows], [row.lang for row in rows], [row.long for row in rows]
+
+def _containers_by_ids(db: Session, ids: Sequence[int]) -> Dict[int, Container]:
+    """Load containers by ID in one query."""
+    if not len(ids):
+        return {}
+    containers = db.scalars(select(Container).where(Container.id.in_([int(i) for i in ids])))
+    return {container.id: container for container in containers}
+
+def _geohash_criteria(prefixes: Sequence[str]):
+    """WHERE clause matching containers whose geohash starts with any of the prefixes."""
+    return or_(*(Container.geohash.between(*geohash_range(prefix)) for prefix in prefixes))
+
+def find_nearby_containers(
+    db: Session, lat: float, lon: float, k: int = 10, radius_m: Optional[float] = None
+) -> List[Tuple[Container, float]]:
+    """
+    Find the k containers nearest to a point, optionally within radius_m.
+
+    Args:
+        db: Database session
+        lat, lon: Search point in degrees
+        k: Maximum number of containers
+        radius_m: Search radius in meters; unlimited when None
+
+    Returns:
+        List of (container, distance in meters), nearest first
+    """
+    if _use_spatial_grid(db):
+        grid = spatial_grid_cache.get(lambda: _load_container_points(db))
+        matches = grid.nearest(lat, lon, k, radius_m)
+        by_id = _containers_by_ids(db, [container_id for container_id, _ in matches])
+        return [(by_id[container_id], distance) for container_id, distance in matches if container_id in by_id]
+
+    # Widen the geohash cover until k containers are found inside the searched circle
+    search_m = radius_m if radius_m is not None else 500.0
+    while True:
+        candidates = list(db.scalars(select(Container).where(_geohash_criteria(radius_cover(lat, lon, search_m)))))
+        distances = haversine_m(
+            lat, lon,
+            np.array([c.lang for c in candidates], dtype=np.float64),
+            np.array([c.long for c in candidates], dtype=np.float64),
+        )
+        found = sorted(
+            ((candidate, float(distance)) for candidate, distance in zip(candidates, distances) if distance <= search_m),
+            key=lambda match: match[1]
+        )[:k]
+        if radius_m is not None or len(found) >= k or search_m >= math.pi * EARTH_RADIUS_M:
+            return found
+        search_m *= 4
+
+def find_containers_in_bbox(
+    db: Session, min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: Optional[int] = None
+) -> List[Container]:
+    """
+    Find containers inside a bounding box, ordered by ID.
+
+    Args:
+        db: Database session
+        min_lat, min_lon, max_lat, max_lon: Box corners in degrees
+        limit: Maximum number of containers
+
+    Returns:
+        Containers whose coordinates fall inside the box
+    """
+    if _use_spatial_grid(db):
+        grid = spatial_grid_cache.get(lambda: _load_container_points(db))
+        ids = grid.in_bbox(min_lat, min_lon, max_lat, max_lon)[:limit]
+        by_id = _containers_by_ids(db, ids)
+        return [by_id[int(container_id)] for container_id in ids if int(container_id) in by_id]
+
+    statement = (
+        select(Container)
+        .where(
+            _geohash_criteria(geohash_cover(min_lat, min_lon, max_lat, max_lon)),
+            Container.lang.between(min_lat, max_lat),
+            Container.long.between(min_lon, max_lon),
+        )
+        .order_by(Container.id)
+    )
+    if limit is not None:
+        statement = statement.limit(limit)
+    return list(db.scalars(statement))
+
+# Async variants of the CRUD functions, used when DB_ASYNC is enabled
+
+async def bump_table_version_async(db: AsyncSession, name: str):
+    """Increment the change counter of a table; call inside the writing transaction."""
+    row = random.choice(table_version_rows(name))
+    if (await db.execute(_version_bump_statement(row))).rowcount == 0:
+        db.add(TableVersion(name=row, version=1))
+
+async def get_table_version_async(db: AsyncSession, name: str) -> int:
+    """Get the change counter of a table (0 before its first write)."""
+    return await db.scalar(_version_statement(name)) or 0
+
+async def get_items_async(db: AsyncSession, **filters) -> List[Item]:
+    """Get items from the database, optionally filtered and paginated."""
+    return list(await db.scalars(item_list_statement(**filters)))
+
+async def get_item_rows_async(db: AsyncSession, fields: Sequence[str], **filters) -> List[Dict[str, Any]]:
+    """Get only the given columns of the matching items as dictionaries."""
+    result = await db.execute(item_list_statement(fields=fields, **filters))
+    return [dict(zip(fields, row)) for row in result]
+
+async def get_item_async(db: AsyncSession, item_id: int) -> Optional[Item]:
+    """Get a specific item by ID."""
+    return await db.get(Item, item_id)
+
+async def create_item_async(db: AsyncSession, item: ItemCreate) -> Dict[str, Any]:
+    """Create a new item and return its fields."""
+    values = dict((await db.execute(_item_insert(item))).one()._mapping)
+    await db.commit()
+    return values
+
+async def update_item_async(db: AsyncSession, item_id: int, item: ItemUpdate) -> Optional[Dict[str, Any]]:
+    """Update an existing item and return its new fields, or None if it does not exist."""
+    row = (await db.execute(_item_update(item_id, item.model_dump(exclude_unset=True)))).one_or_none()
+    await db.commit()
+    return None if row is None else dict(row._mapping)
+
+async def delete_item_async(db: AsyncSession, item_id: int) -> bool:
+    """Delete an item by ID."""
+    deleted = (await db.execute(_item_delete(item_id))).one_or_none() is not None
+    await db.commit()
+    return deleted
+
+async def get_containers_async(db: AsyncSession, **filters) -> List[Container]:
+    """Get containers from the database, optionally filtered and paginated."""
+    return list(await db.scalars(container_list_statement(**filters)))
+
+async def get_container_rows_async(db: AsyncSession, fields: Sequence[str], **filters) -> List[Dict[str, Any]]:
+    """Get only the given columns of the matching containers as dictionaries."""
+    result = await db.execute(container_list_statement(fields=fields, **filters))
+    return [dict(zip(fields, row)) for row in result]
+
+async def get_container_async(db: AsyncSession, container_id: int) -> Optional[Container]:
+    """Get a specific container by ID."""
+    return await db.get(Container, container_id)
+
+async def get_container_by_code_async(db: AsyncSession, container_code: str) -> Optional[Container]:
+    """Get a specific container by container_code."""
+    result = await db.execute(select(Container).where(Container.container_code == container_code))
+    return result.scalars().first()
+
+async def get_cached_container_async(db: AsyncSession, container_id: int) -> Optional[Dict[str, Any]]:
+    """Get a container by ID through the read-through cache."""
+    values = container_cache.get(container_id_key(container_id))
+    if values is None:
+        values = _cache_container(_container_values(await get_container_async(db, container_id)))
+    return values
+
+async def get_cached_container_by_code_async(db: AsyncSession, container_code: str) -> Optional[Dict[str, Any]]:
+    """Get a container by container_code through the read-through cache."""
+    container_id = container_cache.get(container_code_key(container_code))
+    if container_id is not None:
+        values = await get_cached_container_async(db, container_id)
+        if values is not None and values["container_code"] == container_code:
+            return values
+    return _cache_container(_container_values(await get_container_by_code_async(db, container_code)))
+
+async def create_container_async(db: AsyncSession, container: ContainerCreate) -> Dict[str, Any]:
+    """
+    Create a new container and return its fields.
+
+    Raises:
+        DuplicateContainerCodeError: Another container already has the code
+    """
+    try:
+        values = dict((await db.execute(_container_insert(container))).one()._mapping)
+    except IntegrityError as e:
+        await db.rollback()
+        if not _is_duplicate_code(e):
+            raise
+        raise DuplicateContainerCodeError(container.container_code) from e
+    await db.run_sync(record_occupancy, [(values["id"], _utc_now(), values["occupancy_ratio"])])
+    await bump_table_version_async(db, CONTAINERS_TABLE)
+    await db.commit()
+    spatial_grid_cache.invalidate()
+    _publish_container(values)
+    return values
+
+async def update_container_async(
+    db: AsyncSession, container_id: int, container: ContainerUpdate
+) -> Optional[Dict[str, Any]]:
+    """
+    Update an existing container and return its new fields, or None if it does not exist.
+
+    Raises:
+        DuplicateContainerCodeError: The new code belongs to another container
+    """
+    changes = _container_changes(container)
+    old_code = await db.scalar(_container_code_statement(container_id)) if "container_code" in changes else None
+    try:
+        row = (await db.execute(_container_update(container_id, changes))).one_or_none()
+    except IntegrityError as e:
+        await db.rollback()
+        if not _is_duplicate_code(e):
+            raise
+        raise DuplicateContainerCodeError(changes["container_code"]) from e
+    if row is None or not changes:
+        await db.rollback()
+        return None if row is None else dict(row._mapping)
+    values = dict(row._mapping)
+    geohash = _moved_geohash(values, changes)
+    if geohash is not None:
+        await db.execute(_geohash_update(container_id, geohash))
+        values["geohash"] = geohash
+    if changes.get("occupancy_ratio") is not None:
+        await db.run_sync(record_occupancy, [(container_id, _utc_now(), changes["occupancy_ratio"])])
+    await bump_table_version_async(db, CONTAINERS_TABLE)
+    await db.commit()
+    _after_container_write(values, changes, old_code)
+    return values
+
+async def delete_container_async(db: AsyncSession, container_id: int) -> bool:
+    """Delete a container by ID, together with its occupancy history."""
+    row = (await db.execute(_container_delete(container_id))).one_or_none()
+    if row is None:
+        await db.rollback()
+        return False
+    for statement in _history_deletes(container_id):
+        await db.execute(statement)
+    await bump_table_version_async(db, CONTAINERS_TABLE)
+    await db.commit()
+    invalidate_containers([container_id], [row.container_code])
+    spatial_grid_cache.invalidate()
+    _publish_container(row._mapping, deleted=True)
+    return True
+
+ASYNC_VARIANTS: Dict[Callable, Callable] = {
+    get_table_version: get_table_version_async,
+    get_items: get_items_async,
+    get_item_rows: get_item_rows_async,
+    get_item: get_item_async,
+    create_item: create_item_async,
+    update_item: update_item_async,
+    delete_item: delete_item_async,
+    get_containers: get_containers_async,
+    get_container_rows: get_container_rows_async,
+    get_container: get_container_async,
+    get_container_by_code: get_container_by_code_async,
+    get_cached_container: get_cached_container_async,
+    get_cached_container_by_code: get_cached_container_by_code_async,
+    create_container: create_container_async,
+    update_container: update_container_async,
+    delete_container: delete_container_async,
+}
+
+async def run_db(db: Union[Session, AsyncSession], func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a CRUD function without blocking the event loop.
+
+    With an AsyncSession the async variant of func is awaited (or func is run
+    through AsyncSession.run_sync if it has none). With a sync Session func
+    runs in the threadpool.
+
+    Args:
+        db: Session from app.database.get_session
+        func: Sync CRUD function from this module
+        *args, **kwargs: Arguments passed after the session
+
+    Returns:
+        Whatever func returns
+    """
+    if isinstance(db, AsyncSession):
+        async_func = ASYNC_VARIANTS.get(func)
+        if async_func is not None:
+            return await async_func(db, *args, **kwargs)
+        return await db.run_sync(func, *args, **kwargs)
+    return await run_in_threadpool(func, db, *args, **kwargs)
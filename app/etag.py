@@ -0,0 +1,53 @@
+import hashlib
+from typing import Any, Dict, Iterable
+
+from fastapi import Request, Response, status
+
+def make_etag(version: int, request: Request, *extra: str) -> str:
+    """
+    Build a strong ETag from a table version and the request.
+
+    The path and the sorted query parameters are hashed in, so every
+    distinct page, filter and projection of the same version gets its own tag.
+
+    Args:
+        version: Table version from get_table_version
+        request: Incoming request
+        *extra: Further values the response depends on
+
+    Returns:
+        Quoted ETag value
+    """
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.blake2b(repr((request.url.path, query, extra)).encode(), digest_size=8).hexdigest()
+    return f'"v{version}-{digest}"'
+
+def content_etag(values: Dict[str, Any]) -> str:
+    """
+    Build a strong ETag from the fields of a single resource as they are sent.
+
+    Unlike make_etag it does not depend on a table version, so the tag always
+    describes the body it is sent with, wherever that body was read from.
+    """
+    digest = hashlib.blake2b(repr(sorted(values.items())).encode(), digest_size=8).hexdigest()
+    return f'"r-{digest}"'
+
+def _tags(header: str) -> Iterable[str]:
+    for tag in header.split(","):
+        tag = tag.strip()
+        yield tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the If-None-Match header of request matches etag (weak comparison, as RFC 9110 requires)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return any(tag == "*" or tag == etag for tag in _tags(header))
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response carrying the current ETag."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=conditional_headers(etag))
+
+def conditional_headers(etag: str) -> dict:
+    """Headers that make clients revalidate with If-None-Match on every request."""
+    return {"ETag": etag, "Cache-Control": "no-cache"}
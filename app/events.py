@@ -0,0 +1,255 @@
+import asyncio
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import (
+    STREAM_COALESCE_SECONDS, STREAM_MAX_SUBSCRIBERS, STREAM_QUEUE_SIZE, STREAM_VERSION_POLL_SECONDS
+)
+from app.metrics import CallbackMetric, register
+
+# Fields of a container change message
+CHANGE_FIELDS = ("id", "container_code", "geohash", "occupancy_ratio", "is_full")
+
+# Sent instead of deltas when a subscriber may have missed changes; clients should refetch
+RESYNC_MESSAGE = b"event: resync\ndata: {}\n\n"
+
+# Subscriber filter: (geohash prefix or None, is_full or None)
+FilterKey = Tuple[Optional[str], Optional[bool]]
+
+class Subscription:
+    """
+    One stream client: a bounded queue of encoded SSE messages.
+
+    When the queue is full the client is too slow; its pending messages are
+    replaced by a single resync message instead of blocking the publisher.
+    """
+
+    def __init__(self, filter_key: FilterKey, queue_size: int):
+        self.filter_key = filter_key
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=queue_size)
+        self.overflows = 0
+
+    def offer(self, message: bytes):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_MESSAGE)
+
+class ChangeBus:
+    """
+    In-process pub/sub of container occupancy changes.
+
+    Writers call publish() from any thread after committing. Changes are
+    coalesced per container for coalesce_seconds, then each distinct
+    subscriber filter is evaluated and encoded once per batch and the same
+    message is queued for every subscriber sharing that filter.
+
+    Writes made by other processes (other workers or a standalone refresh
+    worker) do not reach this bus; a watcher polls the containers table
+    version and sends a resync event when it moved further than the local
+    writes explain.
+    """
+
+    def __init__(
+        self,
+        coalesce_seconds: float = 0.5,
+        queue_size: int = 32,
+        max_subscribers: int = 10000,
+        version_poll_seconds: float = 2.0,
+    ):
+        self.coalesce_seconds = coalesce_seconds
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.version_poll_seconds = version_poll_seconds
+        self._groups: Dict[FilterKey, Set[Subscription]] = {}
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flushing = False
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._full_state: Dict[int, bool] = {}
+        self._local_writes = 0
+        self._lock = threading.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+        self.batches = 0
+
+    @property
+    def has_subscribers(self) -> bool:
+        return self._count > 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._count
+
+    def subscribe(self, region: Optional[str] = None, is_full: Optional[bool] = None) -> Optional[Subscription]:
+        """
+        Register a subscriber on the running event loop.
+
+        Args:
+            region: Geohash prefix the containers must lie in
+            is_full: Only send containers with this is_full value (or that just changed it)
+
+        Returns:
+            The subscription, or None when max_subscribers is reached
+        """
+        if self._count >= self.max_subscribers:
+            return None
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription((region, is_full), self.queue_size)
+        self._groups.setdefault(subscription.filter_key, set()).add(subscription)
+        self._count += 1
+        if self._watcher is None or self._watcher.done():
+            self._watcher = self._loop.create_task(self._watch_version())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        group = self._groups.get(subscription.filter_key)
+        if group is None or subscription not in group:
+            return
+        group.discard(subscription)
+        if not group:
+            del self._groups[subscription.filter_key]
+        self._count -= 1
+
+    def publish(self, changes: Iterable[Dict[str, Any]]):
+        """
+        Queue container changes for the next batch; safe to call from any thread.
+
+        Each change holds the CHANGE_FIELDS of one container after the write,
+        plus "deleted": true when the container was deleted.
+        """
+        with self._lock:
+            self._local_writes += 1
+        loop = self._loop
+        if not self._count or loop is None or loop.is_closed():
+            return
+        changes = list(changes)
+        if changes:
+            loop.call_soon_threadsafe(self._enqueue, changes)
+
+    def _enqueue(self, changes: List[Dict[str, Any]]):
+        for change in changes:
+            pending = self._pending.get(change["id"])
+            if pending is None:
+                self._pending[change["id"]] = dict(change)
+            else:
+                pending.update(change)
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.coalesce_seconds, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        if self._flushing:
+            # The running flush sends these changes once its batch is out
+            return
+        self._flushing = True
+        task = self._loop.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """
+        Send the coalesced changes to every matching subscriber.
+
+        Filtering and encoding run in the threadpool so a large batch does not
+        stall the event loop; the messages are queued back on the loop. Only
+        one flush runs at a time, so batches arrive in order.
+        """
+        self._flushing = True
+        try:
+            while self._pending:
+                batch = list(self._pending.values())
+                self._pending = {}
+                self.batches += 1
+                messages = await run_in_threadpool(self._encode_batch, batch, list(self._groups))
+                for filter_key, message in messages:
+                    for subscription in list(self._groups.get(filter_key, ())):
+                        subscription.offer(message)
+        finally:
+            self._flushing = False
+
+    def _encode_batch(self, batch: List[Dict[str, Any]], filter_keys: List[FilterKey]) -> List[Tuple[FilterKey, bytes]]:
+        """Build the SSE message of each subscriber filter that matches part of the batch."""
+        # Containers whose is_full flipped are sent to is_full subscribers of both values
+        flipped = set()
+        for change in batch:
+            if change.get("deleted"):
+                # Every subscriber of the region may be showing a deleted container
+                flipped.add(change["id"])
+                self._full_state.pop(change["id"], None)
+                continue
+            previous = self._full_state.get(change["id"])
+            if previous is None or previous != change["is_full"]:
+                flipped.add(change["id"])
+            self._full_state[change["id"]] = change["is_full"]
+
+        # Encode each change once and index the batch by the geohash prefix lengths in use,
+        # so each filter only looks at the changes in its region
+        encoded = [json.dumps(change, separators=(",", ":")) for change in batch]
+        everything = range(len(batch))
+        by_prefix: Dict[Tuple[int, str], List[int]] = {}
+        for length in {len(region) for region, _ in filter_keys if region}:
+            for i, change in enumerate(batch):
+                by_prefix.setdefault((length, (change.get("geohash") or "")[:length]), []).append(i)
+
+        messages = []
+        for region, is_full in filter_keys:
+            candidates = everything if region is None else by_prefix.get((len(region), region), ())
+            matching = [
+                encoded[i] for i in candidates
+                if is_full is None or batch[i]["is_full"] == is_full or batch[i]["id"] in flipped
+            ]
+            if matching:
+                messages.append(((region, is_full), f"event: changes\ndata: [{','.join(matching)}]\n\n".encode()))
+        return messages
+
+    def resync_all(self):
+        """Tell every subscriber to refetch, e.g. after writes this process did not see."""
+        for group in self._groups.values():
+            for subscription in group:
+                subscription.offer(RESYNC_MESSAGE)
+
+    async def _watch_version(self):
+        """Poll the containers table version while there are subscribers."""
+        from app.database import SessionLocal
+        from app.db import CONTAINERS_TABLE, get_table_version
+
+        def read_version() -> int:
+            with SessionLocal() as db:
+                return get_table_version(db, CONTAINERS_TABLE)
+
+        seen = await run_in_threadpool(read_version)
+        with self._lock:
+            self._local_writes = 0
+        while self._count:
+            await asyncio.sleep(self.version_poll_seconds)
+            try:
+                version = await run_in_threadpool(read_version)
+            except Exception as e:
+                print(f"Error polling containers version: {str(e)}")
+                continue
+            with self._lock:
+                local_writes, self._local_writes = self._local_writes, 0
+            if version - seen > local_writes:
+                self.resync_all()
+            seen = version
+
+change_bus = ChangeBus(
+    coalesce_seconds=STREAM_COALESCE_SECONDS,
+    queue_size=STREAM_QUEUE_SIZE,
+    max_subscribers=STREAM_MAX_SUBSCRIBERS,
+    version_poll_seconds=STREAM_VERSION_POLL_SECONDS,
+)
+
+register(CallbackMetric("stream_subscribers", "Connected /containers/stream clients", lambda: change_bus.subscriber_count))
+register(CallbackMetric(
+    "stream_batches_total", "Coalesced change batches sent to stream clients", lambda: change_bus.batches,
+    metric_type="counter"
+))
@@ -0,0 +1,178 @@
+import math
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config import FORECAST_HALF_LIFE_HOURS, FORECAST_RESET_DROP
+
+# Time axis of the forecaster: hours since the UNIX epoch
+_EPOCH = np.datetime64("1970-01-01T00:00:00", "us")
+
+def to_hours(moments) -> np.ndarray:
+    """Convert naive UTC datetimes to hours since the UNIX epoch."""
+    return (np.asarray(moments, dtype="datetime64[us]") - _EPOCH) / np.timedelta64(1, "h")
+
+def _groups(container_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For ids sorted by container, return the index where each run starts and each element's rank in its run."""
+    starts = np.flatnonzero(np.r_[True, container_ids[1:] != container_ids[:-1]])
+    counts = np.diff(np.r_[starts, len(container_ids)])
+    ranks = np.arange(len(container_ids)) - np.repeat(starts, counts)
+    return starts, ranks
+
+class FillForecaster:
+    """
+    Per-container fill-rate estimates with exponentially decaying weights.
+
+    Each container keeps the weighted sums of a linear regression of its
+    occupancy over time since it was last emptied (a drop of more than
+    reset_drop starts a new cycle). Older readings lose weight with the
+    given half-life. All state lives in NumPy arrays indexed by slot, so a
+    batch of readings for thousands of containers is applied with a handful
+    of array operations, and every new reading only updates the sums.
+
+    Args:
+        half_life_hours: Age at which a reading counts half as much
+        reset_drop: Occupancy drop treated as the container being emptied
+    """
+
+    _fields = ("origin", "last_t", "last_y", "sw", "st", "sy", "stt", "sty")
+
+    def __init__(self, half_life_hours: float = 24.0, reset_drop: float = 0.2):
+        self.decay = math.log(2) / half_life_hours
+        self.reset_drop = reset_drop
+        self.slots: Dict[int, int] = {}
+        self.ids = np.empty(0, dtype=np.int64)
+        for field in self._fields:
+            setattr(self, field, np.empty(0, dtype=np.float64))
+        self.last_reading_id: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def _slots_for(self, container_ids: np.ndarray) -> np.ndarray:
+        """Slots of the given containers, allocating (and growing the arrays) for new ones."""
+        new_ids = [int(container_id) for container_id in np.unique(container_ids) if int(container_id) not in self.slots]
+        if new_ids:
+            size = len(self.ids)
+            for offset, container_id in enumerate(new_ids):
+                self.slots[container_id] = size + offset
+            self.ids = np.r_[self.ids, np.array(new_ids, dtype=np.int64)]
+            for field in self._fields:
+                fill = np.nan if field in ("origin", "last_t", "last_y") else 0.0
+                setattr(self, field, np.r_[getattr(self, field), np.full(len(new_ids), fill)])
+        return np.array([self.slots[int(container_id)] for container_id in container_ids], dtype=np.int64)
+
+    def fit(self, container_ids, hours, ratios):
+        """
+        Replace the state of the given containers with a batch fit of their readings.
+
+        Only the readings after each container's last emptying are used; the
+        weighted sums are computed for all containers at once with bincount.
+
+        Args:
+            container_ids: Container of each reading
+            hours: Reading times from to_hours
+            ratios: Occupancy ratios
+        """
+        container_ids = np.asarray(container_ids, dtype=np.int64)
+        if not len(container_ids):
+            return
+        hours = np.asarray(hours, dtype=np.float64)
+        ratios = np.asarray(ratios, dtype=np.float64)
+        order = np.lexsort((hours, container_ids))
+        container_ids, hours, ratios = container_ids[order], hours[order], ratios[order]
+
+        starts, ranks = _groups(container_ids)
+        group = np.cumsum(ranks == 0) - 1
+        cycle_start = (ranks == 0) | (np.r_[0.0, np.diff(ratios)] < -self.reset_drop)
+        cycle = np.cumsum(cycle_start)
+        ends = np.r_[starts[1:], len(container_ids)] - 1
+        keep = cycle == cycle[ends][group]
+        container_ids, hours, ratios, group = container_ids[keep], hours[keep], ratios[keep], group[keep]
+
+        count = len(starts)
+        origin = np.full(count, np.inf)
+        np.minimum.at(origin, group, hours)
+        last_t = np.full(count, -np.inf)
+        np.maximum.at(last_t, group, hours)
+        weights = np.exp(-self.decay * (last_t[group] - hours))
+        relative = hours - origin[group]
+
+        slots = self._slots_for(container_ids[np.r_[True, group[1:] != group[:-1]]])
+        self.origin[slots] = origin
+        self.last_t[slots] = last_t
+        self.last_y[slots] = ratios[np.r_[group[1:] != group[:-1], True]]
+        self.sw[slots] = np.bincount(group, weights, count)
+        self.st[slots] = np.bincount(group, weights * relative, count)
+        self.sy[slots] = np.bincount(group, weights * ratios, count)
+        self.stt[slots] = np.bincount(group, weights * relative * relative, count)
+        self.sty[slots] = np.bincount(group, weights * relative * ratios, count)
+
+    def update(self, container_ids, hours, ratios):
+        """
+        Fold new readings into the estimates.
+
+        Readings are applied in time order per container, one vectorized
+        round per reading rank; readings older than a container's latest
+        one are ignored.
+        """
+        container_ids = np.asarray(container_ids, dtype=np.int64)
+        if not len(container_ids):
+            return
+        hours = np.asarray(hours, dtype=np.float64)
+        ratios = np.asarray(ratios, dtype=np.float64)
+        order = np.lexsort((hours, container_ids))
+        container_ids, hours, ratios = container_ids[order], hours[order], ratios[order]
+        slots = self._slots_for(container_ids)
+        _, ranks = _groups(container_ids)
+        for rank in range(int(ranks.max()) + 1):
+            selected = ranks == rank
+            self._update_round(slots[selected], hours[selected], ratios[selected])
+
+    def _update_round(self, slots: np.ndarray, hours: np.ndarray, ratios: np.ndarray):
+        """Apply at most one reading per slot."""
+        last_t = self.last_t[slots]
+        fresh = np.isnan(last_t) | (hours > last_t)
+        slots, hours, ratios, last_t = slots[fresh], hours[fresh], ratios[fresh], last_t[fresh]
+        reset = np.isnan(last_t) | (ratios < self.last_y[slots] - self.reset_drop)
+
+        origin = np.where(reset, hours, self.origin[slots])
+        factor = np.where(reset, 0.0, np.exp(-self.decay * (hours - np.nan_to_num(last_t))))
+        relative = hours - origin
+        self.origin[slots] = origin
+        self.last_t[slots] = hours
+        self.last_y[slots] = ratios
+        self.sw[slots] = self.sw[slots] * factor + 1.0
+        self.st[slots] = self.st[slots] * factor + relative
+        self.sy[slots] = self.sy[slots] * factor + ratios
+        self.stt[slots] = self.stt[slots] * factor + relative * relative
+        self.sty[slots] = self.sty[slots] * factor + relative * ratios
+
+    def rates(self) -> np.ndarray:
+        """Fill rate per slot in occupancy per hour (NaN without enough readings)."""
+        denominator = self.sw * self.stt - self.st * self.st
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = (self.sw * self.sty - self.st * self.sy) / denominator
+        return np.where((self.sw > 1.5) & (denominator > 1e-9 * np.maximum(self.sw, 1.0) ** 2), slope, np.nan)
+
+    def predict(self, threshold: float, now_hours: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Predict when each container reaches threshold.
+
+        Containers without a usable estimate get the fleet's median positive
+        rate, so new containers are still scheduled.
+
+        Returns:
+            (container ids, fill rates per hour, projected current occupancy, hours until threshold)
+        """
+        rates = self.rates()
+        positive = rates[rates > 0]
+        fallback = float(np.median(positive)) if len(positive) else np.nan
+        rates = np.where(np.isnan(rates), fallback, rates)
+        growth = np.where(rates > 0, rates, 0.0)
+        current = np.minimum(self.last_y + growth * np.maximum(now_hours - self.last_t, 0.0), 1.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hours_left = np.where(rates > 0, (threshold - current) / rates, np.inf)
+        hours_left = np.where(current >= threshold, 0.0, hours_left)
+        return self.ids.copy(), rates, current, hours_left
+
+fill_forecaster = FillForecaster(half_life_hours=FORECAST_HALF_LIFE_HOURS, reset_drop=FORECAST_RESET_DROP)
@@ -1,11 +1,66 @@
+from sqlalchemy import bindparam, insert, inspect, select, text, update
+
 from app.database import Base, engine
 from app.models.item import Item
 from app.models.container import Container
+from app.models.table_version import TableVersion
+from app.models.reading import OccupancyReading, OccupancyRollup
+from app.db import table_version_rows
+from app.spatial import geohash_encode
+
+def add_missing_columns():
+    """
+    Add columns introduced after a table was first created.
+
+    create_all only creates missing tables, so new nullable columns (and
+    their indexes) are added to existing tables here.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                for index in table.indexes:
+                    if any(indexed.name == column.name for indexed in index.columns):
+                        index.create(connection, checkfirst=True)
+
+def backfill_geohashes(batch_size: int = 5000):
+    """Compute the geohash of containers stored before the column existed."""
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(Container.id, Container.lang, Container.long).where(
+                Container.geohash.is_(None), Container.lang.isnot(None), Container.long.isnot(None)
+            )
+        ).all()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            connection.execute(
+                update(Container.__table__).where(Container.__table__.c.id == bindparam("row_id")),
+                [{"row_id": row.id, "geohash": geohash_encode(row.lang, row.long)} for row in batch]
+            )
+
+def ensure_table_versions():
+    """Create the change counter rows up front so concurrent writers only ever update them."""
+    with engine.begin() as connection:
+        existing = set(connection.scalars(select(TableVersion.name)))
+        for table in (Container.__tablename__,):
+            for name in table_version_rows(table):
+                if name not in existing:
+                    connection.execute(insert(TableVersion).values(name=name, version=0))
 
 def init_db():
     """Create database tables."""
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    backfill_geohashes()
+    ensure_table_versions()
 
 if __name__ == "__main__":
     init_db()
-    print("Database tables created successfully.") 
\ No newline at end of file
+    print("Database tables created successfully.")
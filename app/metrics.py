@@ -0,0 +1,383 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets for work measured in seconds to minutes (refresh cycles, route solves)
+SLOW_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Buckets for the number of queries a request runs
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Label values of one sample, in the order of the metric's label names
+LabelValues = Tuple[str, ...]
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, in the Prometheus style.
+
+    Observations are counted into the first bucket whose upper bound is
+    greater than or equal to the value; values above the last bound only
+    count towards the +Inf bucket.
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record one observation."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self) -> Dict:
+        """Return count, sum, max and cumulative bucket counts."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            maximum = self._max
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative[bound] = running
+        return {"count": running, "sum": total, "max": maximum, "buckets": cumulative}
+
+    def _sample_lines(self, label_names: Sequence[str] = (), label_values: Sequence[str] = ()) -> List[str]:
+        snapshot = self.snapshot()
+        lines = []
+        for bound, count in snapshot["buckets"].items():
+            labels = _format_labels((*label_names, "le"), (*label_values, _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _format_labels(label_names, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(snapshot['sum'])}")
+        lines.append(f"{self.name}_count{labels} {snapshot['count']}")
+        return lines
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram", *self._sample_lines()]
+
+class LabeledHistogram:
+    """A family of histograms sharing a name and buckets, one per combination of label values."""
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[LabelValues, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        """The histogram for the given label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.name, self.documentation, self.buckets))
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child._sample_lines(self.label_names, values))
+        return lines
+
+class Gauge:
+    """A value that is set directly, e.g. the size of the last refresh."""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.value)}",
+        ]
+
+class CallbackMetric:
+    """
+    Gauge or counter whose value is read from another component when scraped.
+
+    The callback returns a number, or a {label values: number} dict when
+    label_names are given.
+    """
+
+    def __init__(
+        self, name: str, documentation: str, callback: Callable, metric_type: str = "gauge",
+        label_names: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.metric_type = metric_type
+        self.label_names = tuple(label_names)
+
+    def render(self) -> List[str]:
+        value = self.callback()
+        if value is None:
+            return []
+        samples = value.items() if self.label_names else [((), value)]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for values, number in samples:
+            lines.append(f"{self.name}{_format_labels(self.label_names, values)} {_format_value(number)}")
+        return lines
+
+# Every metric exposed by /metrics, in registration order
+REGISTRY: List = []
+
+def register(metric):
+    """Add a metric to /metrics and return it."""
+    REGISTRY.append(metric)
+    return metric
+
+def render_metrics(metrics: Optional[Iterable] = None) -> str:
+    """Render metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY if metrics is None else metrics:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            print(f"Error collecting metric {metric.name}: {str(e)}")
+    return "\n".join(lines) + "\n"
+
+# Time spent waiting for a connection from the pool
+pool_checkout_seconds = register(Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a database connection from the pool"
+))
+
+# Every database round trip, wherever it comes from
+db_query_seconds = register(Histogram("db_query_seconds", "Duration of database queries"))
+
+http_request_seconds = register(LabeledHistogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+))
+http_request_db_queries = register(LabeledHistogram(
+    "http_request_db_queries", "Database queries per HTTP request by route", ("method", "route"), QUERY_COUNT_BUCKETS
+))
+http_request_db_seconds = register(LabeledHistogram(
+    "http_request_db_seconds", "Database time per HTTP request by route", ("method", "route")
+))
+
+# Background refresh (replaces the old refresh_stats dict in app.tasks)
+refresh_cycle_seconds = register(Histogram(
+    "refresh_cycle_seconds", "Duration of background occupancy refresh cycles", SLOW_BUCKETS
+))
+refresh_lag_seconds = register(Histogram(
+    "refresh_lag_seconds", "Delay between the scheduled and actual start of refresh cycles", SLOW_BUCKETS
+))
+refresh_updated_containers = register(Gauge(
+    "refresh_updated_containers", "Containers updated by the last refresh cycle"
+))
+refresh_last_run_seconds = register(Gauge(
+    "refresh_last_run_timestamp_seconds", "UNIX time the last refresh cycle finished"
+))
+
+# Route planning: solver time as reported by OR-Tools, and the whole request including matrices
+route_solve_seconds = register(LabeledHistogram(
+    "route_solve_seconds", "OR-Tools solve time by planner", ("planner",), SLOW_BUCKETS
+))
+route_plan_seconds = register(LabeledHistogram(
+    "route_plan_seconds", "Route planning time in the solver pool including matrices", ("planner",), SLOW_BUCKETS
+))
+
+class RequestStats:
+    """Database work done on behalf of the current request."""
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def most_repeated(self) -> Tuple[int, str]:
+        """(count, SQL) of the statement run most often, the usual sign of an N+1 query."""
+        if not self.statements:
+            return 0, ""
+        statement = max(self.statements, key=self.statements.get)
+        return self.statements[statement], statement
+
+# Set by MetricsMiddleware; copied into threadpool calls, so sync sessions report here too
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def _record_query(statement: str, elapsed: float):
+    db_query_seconds.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+def _timed(execute: Callable) -> Callable:
+    # All three dialect methods take (cursor, statement, ...)
+    def timed_execute(cursor, statement, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return execute(cursor, statement, *args, **kwargs)
+        finally:
+            _record_query(statement, time.perf_counter() - started)
+    return timed_execute
+
+def instrument_engine(engine):
+    """
+    Time every query of a sync or async engine into db_query_seconds and the current request.
+
+    The engine's dialect execute methods are wrapped rather than listening to
+    before/after_cursor_execute: any cursor event listener moves SQLAlchemy
+    onto its event-dispatch path, which costs several times more per query
+    than the timing itself.
+    """
+    dialect = getattr(engine, "sync_engine", engine).dialect
+    if getattr(dialect, "_metrics_instrumented", False):
+        return
+    for name in ("do_execute", "do_executemany", "do_execute_no_params"):
+        setattr(dialect, name, _timed(getattr(dialect, name)))
+    dialect._metrics_instrumented = True
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request or block of code ran more database queries than its budget allows."""
+
+def _budget_message(where: str, stats: RequestStats, budget: int) -> str:
+    count, statement = stats.most_repeated()
+    message = f"{where} ran {stats.queries} queries, budget {budget}"
+    if count > 1:
+        message += f"; most repeated ({count}x): {' '.join(statement.split())[:200]}"
+    return message
+
+def query_budget(max_queries: Optional[int]) -> Callable:
+    """
+    Declare how many queries an endpoint may run per request.
+
+    Overrides the middleware's default budget for the route; None removes
+    the limit, e.g. for endpoints whose work grows with the request body.
+    Apply it below the router decorator:
+
+        @router.get("/{container_id}")
+        @query_budget(2)
+        async def get_single_container(...): ...
+    """
+    def decorate(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+@contextmanager
+def count_queries(max_queries: Optional[int] = None) -> Iterator[RequestStats]:
+    """
+    Count the queries run inside the block, including threadpool calls it makes.
+
+    Raises:
+        QueryBudgetExceeded: The block finished after running more than max_queries queries
+    """
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        yield stats
+    finally:
+        current_request.reset(token)
+    if max_queries is not None and stats.queries > max_queries:
+        raise QueryBudgetExceeded(_budget_message("Block", stats, max_queries))
+
+# Histograms of each (method, route, status), looked up once per request
+_route_series: Dict[Tuple[str, str, int], Tuple[Histogram, Histogram, Histogram]] = {}
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and database work per route.
+
+    Requests are labelled with the route template (e.g. /containers/{container_id}),
+    never the raw path, so the number of series stays bounded. Streaming
+    responses are timed until their last chunk is sent.
+
+    Each request is also checked against its query budget: the endpoint's
+    @query_budget, else default_budget (0 for none). With budget_mode "log"
+    an overrun is printed; with "raise" QueryBudgetExceeded is raised after
+    the response, which fails the request in TestClient-based tests.
+    """
+
+    def __init__(self, app, default_budget: int = 0, budget_mode: str = "log"):
+        self.app = app
+        self.default_budget = default_budget or None
+        self.budget_mode = budget_mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = scope.get("route")
+            key = (scope["method"], getattr(route, "path", None) or "unmatched", status_code)
+            series = _route_series.get(key)
+            if series is None:
+                series = _route_series[key] = (
+                    http_request_seconds.labels(key[0], key[1], str(status_code)),
+                    http_request_db_queries.labels(key[0], key[1]),
+                    http_request_db_seconds.labels(key[0], key[1]),
+                )
+            series[0].observe(elapsed)
+            series[1].observe(stats.queries)
+            series[2].observe(stats.db_seconds)
+        self._check_budget(key, route, stats)
+
+    def _check_budget(self, key: Tuple[str, str, int], route, stats: RequestStats):
+        if self.budget_mode == "off":
+            return
+        budget = getattr(getattr(route, "endpoint", None), "query_budget", self.default_budget)
+        if budget is None or stats.queries <= budget:
+            return
+        message = _budget_message(f"{key[0]} {key[1]}", stats, budget)
+        if self.budget_mode == "raise":
+            raise QueryBudgetExceeded(message)
+        print(f"Query budget exceeded: {message}")
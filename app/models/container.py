@@ -1,6 +1,7 @@
-from sqlalchemy import Boolean, Column, Float, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String, event
 
 from app.database import Base
+from app.spatial import geohash_encode, spatial_grid_cache
 
 class Container(Base):
     """
@@ -14,4 +15,21 @@ class Container(Base):
     lang = Column(Float)  # Latitude
     long = Column(Float)  # Longitude
     occupancy_ratio = Column(Float, default=0.0)
-    is_full = Column(Boolean, default=False) 
\ No newline at end of file
+    is_full = Column(Boolean, default=False)
+    geohash = Column(String, index=True, nullable=True)  # Derived from lang/long
+    reading_at = Column(DateTime, nullable=True)  # Sensor time (UTC) of the applied occupancy reading
+
+@event.listens_for(Container, "before_insert")
+@event.listens_for(Container, "before_update")
+def _set_geohash(mapper, connection, target):
+    """Keep the geohash column in sync with the coordinates on ORM writes."""
+    if target.lang is not None and target.long is not None:
+        geohash = geohash_encode(target.lang, target.long)
+        if geohash != target.geohash:
+            target.geohash = geohash
+            spatial_grid_cache.invalidate()
+
+@event.listens_for(Container, "after_delete")
+def _drop_from_spatial_grid(mapper, connection, target):
+    """Deleted containers must disappear from the in-process spatial grid."""
+    spatial_grid_cache.invalidate()
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String
+
+from app.database import Base
+
+class OccupancyReading(Base):
+    """
+    SQLAlchemy model for the append-only occupancy history.
+
+    One row is written for every occupancy change of a container; old rows
+    are removed by the retention policy once the rollups cover them.
+    """
+    __tablename__ = "occupancy_readings"
+    __table_args__ = (Index("ix_occupancy_readings_container_time", "container_id", "recorded_at"),)
+
+    id = Column(Integer, primary_key=True)
+    container_id = Column(Integer, nullable=False)
+    recorded_at = Column(DateTime, nullable=False, index=True)  # UTC
+    occupancy_ratio = Column(Float, nullable=False)
+
+class OccupancyRollup(Base):
+    """
+    SQLAlchemy model for hourly and daily occupancy aggregates.
+
+    Rows are updated incrementally as readings are written, so the average
+    of a bucket is ratio_sum / reading_count.
+    """
+    __tablename__ = "occupancy_rollups"
+
+    container_id = Column(Integer, primary_key=True)
+    resolution = Column(String, primary_key=True)  # "hour" or "day"
+    bucket_start = Column(DateTime, primary_key=True, index=True)  # UTC
+    reading_count = Column(Integer, nullable=False, default=0)
+    ratio_sum = Column(Float, nullable=False, default=0.0)
+    ratio_min = Column(Float, nullable=False)
+    ratio_max = Column(Float, nullable=False)
+    last_recorded_at = Column(DateTime, nullable=True)  # UTC, newest reading in the bucket
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String
+
+from app.database import Base
+
+class TableVersion(Base):
+    """
+    SQLAlchemy model for per-table change counters.
+
+    Each table has TABLE_VERSION_SHARDS rows ("containers", "containers:1",
+    ...); one of them is incremented in the same transaction as every write
+    to the table, and their sum is the table's version, so all workers agree
+    on it and it can drive ETags.
+    """
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,60 @@
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+
+from app.serialization import FastJSONResponse
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """
+    Parse a comma-separated fields= projection.
+
+    The id column is always selected because it is the pagination cursor.
+
+    Args:
+        fields: Raw query parameter, e.g. "id,lang,long"
+        allowed: Field names of the response schema
+
+    Returns:
+        Column names to select, or None when no projection was requested
+    """
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    if "id" not in requested:
+        requested.insert(0, "id")
+    return requested
+
+def paginate(rows: List[Any], limit: int, response: Response) -> List[Any]:
+    """
+    Trim a page fetched with limit + 1 rows and set the next cursor header.
+
+    Args:
+        rows: Rows ordered by ID, fetched with one extra row
+        limit: Requested page size
+        response: Response to set the X-Next-Cursor header on
+
+    Returns:
+        At most limit rows
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        last_id = last["id"] if isinstance(last, dict) else last.id
+        response.headers[NEXT_CURSOR_HEADER] = str(last_id)
+    return rows
+
+def projected_response(rows: List[dict], response: Response) -> FastJSONResponse:
+    """Return rows as-is, bypassing the response model, keeping the cursor header."""
+    headers = {}
+    if NEXT_CURSOR_HEADER in response.headers:
+        headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    return FastJSONResponse(content=rows, headers=headers)
@@ -1,12 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from sqlalchemy.orm import Session
+import asyncio
+import csv
+import re
+import tempfile
+from datetime import datetime, timedelta, timezone
 
-from app.schemas.container import ContainerCreate, ContainerResponse, ContainerUpdate
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from typing import List, Optional
+
+from app.schemas.container import (
+    ContainerCreate, ContainerHistoryResponse, ContainerImportResponse, ContainerReading, ContainerResponse, ContainerUpdate,
+    DueContainerResponse, NearbyContainerResponse, ReadingBatchResponse
+)
+from app.config import (
+    EXPORT_CHUNK_SIZE, HISTORY_MAX_POINTS, IMPORT_CHUNK_SIZE, IMPORT_SPOOL_MAX_BYTES, LIST_STREAM_CHUNK_SIZE,
+    LIST_STREAM_MIN_ROWS, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, READINGS_BATCH_MAX, READINGS_BATCH_MAX_BYTES,
+    READINGS_MAX_FUTURE_SECONDS, STREAM_KEEPALIVE_SECONDS
+)
+from app.container_io import (
+    EXPORT_FIELDS, MEDIA_TYPES, ImportSummary, parquet_available, read_rows, resolve_format,
+    validated_batches, write_rows
+)
+from app.database import DBSession, SessionLocal, get_session
+from app.pagination import NEXT_CURSOR_HEADER, paginate, parse_fields
+from app.serialization import dumps, json_array_chunks, ndjson_chunks
+from app.cache import MISSING, response_cache
+from app.etag import conditional_headers, content_etag, etag_matches, make_etag, not_modified
+from app.events import RESYNC_MESSAGE, change_bus
+from app.spatial import GEOHASH_ALPHABET, GEOHASH_PRECISION
+from app.metrics import query_budget
 from app.db import (
-    get_containers, get_container, get_container_by_code,
-    create_container, update_container, delete_container
+    CONTAINERS_TABLE, DuplicateContainerCodeError, run_db, get_table_version, get_container_rows,
+    get_container_next_cursor,
+    get_cached_container, get_cached_container_by_code,
+    create_container, update_container, delete_container, apply_container_readings, get_container_history,
+    find_nearby_containers, find_containers_in_bbox, get_due_containers, upsert_containers,
+    iter_container_batches
 )
 
 router = APIRouter(
@@ -15,65 +47,411 @@ router = APIRouter(
     responses={404: {"description": "Container not found"}},
 )
 
-@router.get("/", response_model=List[ContainerResponse])
-async def get_all_containers(db_session: Session = Depends(get_db)):
-    """Get all containers."""
-    containers = get_containers(db_session)
-    return containers
+# Columns of a full container page, in ContainerResponse order; pages are encoded from
+# these column values directly, without ORM objects or per-row validation
+CONTAINER_FIELDS = list(ContainerResponse.model_fields)
+
+# Parses reading batches straight from the request bytes
+_reading_list_adapter = TypeAdapter(List[ContainerReading])
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# History step: a number of minutes, hours or days, e.g. 15m, 1h, 1d
+STEP_PATTERN = re.compile(r"^(\d+)([mhd])$")
+STEP_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+@router.get(
+    "/",
+    response_model=List[ContainerResponse],
+    responses={200: {"content": {"application/x-ndjson": {"schema": {"type": "string", "description": "One container per line"}}}}},
+)
+@query_budget(3)
+async def get_all_containers(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(
+        None, ge=1, le=PAGE_SIZE_MAX,
+        description=f"Page size; without limit and after_id every container is returned, else {PAGE_SIZE_DEFAULT}"
+    ),
+    after_id: Optional[int] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    is_full: Optional[bool] = None,
+    min_occupancy: Optional[float] = Query(None, ge=0.0, le=1.0),
+    name_prefix: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,lang,long,occupancy_ratio"),
+    db_session: DBSession = Depends(get_session)
+):
+    """
+    Get containers ordered by ID, one page at a time.
+
+    When more containers match, the X-Next-Cursor response header holds the
+    after_id to pass for the next page. Without limit and after_id all
+    matching containers are returned, as before pagination existed.
+    Responses carry an ETag derived from the containers table version: polls
+    sending it back in If-None-Match get 304 until a write happens, and
+    other repeated polls are served from the serialized response cache
+    without querying the table.
+
+    Pages of LIST_STREAM_MIN_ROWS or more, and full lists longer than that,
+    are streamed from a database cursor as a chunked JSON array instead and
+    not cached; with Accept: application/x-ndjson the page is always
+    streamed, one container per line.
+    """
+    columns = parse_fields(fields, CONTAINER_FIELDS) or CONTAINER_FIELDS
+    ndjson = any(media_type in request.headers.get("accept", "") for media_type in NDJSON_MEDIA_TYPES)
+    version = await run_db(db_session, get_table_version, CONTAINERS_TABLE)
+    etag = make_etag(version, request, *(("ndjson",) if ndjson else ()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    filters = dict(after_id=after_id, is_full=is_full, min_occupancy=min_occupancy, name_prefix=name_prefix)
+    if limit is None and after_id is not None:
+        limit = PAGE_SIZE_DEFAULT
+    if not ndjson and (limit is None or limit < LIST_STREAM_MIN_ROWS):
+        cached = response_cache.get(etag)
+        if cached is not MISSING:
+            body, headers = cached
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        # A full list is read like a page of LIST_STREAM_MIN_ROWS and only streamed if it is longer
+        page_size = LIST_STREAM_MIN_ROWS if limit is None else limit
+        rows = await run_db(db_session, get_container_rows, columns, limit=page_size + 1, **filters)
+        if limit is not None or len(rows) <= page_size:
+            body = dumps(rows if limit is None else paginate(rows, limit, response))
+            headers = conditional_headers(etag)
+            if NEXT_CURSOR_HEADER in response.headers:
+                headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+            response_cache.set(etag, (body, headers))
+            return Response(content=body, media_type="application/json", headers=headers)
+
+    headers = conditional_headers(etag)
+    next_cursor = None
+    if limit is not None:
+        next_cursor = await run_db(db_session, get_container_next_cursor, limit, **filters)
+    if next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+    encode = ndjson_chunks if ndjson else json_array_chunks
+
+    def body():
+        # A session of its own: the response is streamed after the request's session is gone
+        with SessionLocal() as db:
+            batches = iter_container_batches(
+                db, columns, LIST_STREAM_CHUNK_SIZE, limit=limit, through_id=next_cursor, **filters
+            )
+            yield from encode(batches, columns)
+
+    media_type = "application/x-ndjson" if ndjson else "application/json"
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+@router.get("/stream")
+async def stream_container_changes(
+    region: Optional[str] = Query(
+        None, min_length=1, max_length=GEOHASH_PRECISION, description="Geohash prefix of the area to follow"
+    ),
+    is_full: Optional[bool] = Query(None, description="Only containers with this is_full value (or that just changed it)"),
+):
+    """
+    Stream occupancy changes as Server-Sent Events.
+
+    "changes" events carry a JSON array of {id, container_code, geohash,
+    occupancy_ratio, is_full} for the containers that changed in the last
+    batch. A "resync" event means changes may have been missed (the client
+    fell behind or another process wrote), and the client should refetch
+    /containers/.
+    """
+    if region is not None:
+        region = region.lower()
+        if any(char not in GEOHASH_ALPHABET for char in region):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="region must be a geohash prefix")
+    if change_bus.subscriber_count >= change_bus.max_subscribers:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many stream subscribers")
+
+    async def events():
+        # Subscribe inside the generator so a client that never starts reading does not leak
+        subscription = change_bus.subscribe(region=region, is_full=is_full)
+        if subscription is None:
+            yield RESYNC_MESSAGE
+            return
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            change_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post(
+    "/readings:batch",
+    response_model=ReadingBatchResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array", "items": ContainerReading.model_json_schema()}},
+        "application/x-ndjson": {"schema": {"type": "string", "description": "One reading object per line"}},
+    }}},
+)
+@query_budget(None)
+async def ingest_container_readings(request: Request, db_session: DBSession = Depends(get_session)):
+    """
+    Apply many sensor readings at once.
+
+    The body is a JSON array of {container_code, occupancy_ratio, ts} objects,
+    or the same objects one per line with Content-Type application/x-ndjson.
+    Readings older than the stored one are ignored, is_full is derived from
+    the ratio and everything is written in one transaction. Bodies over
+    READINGS_BATCH_MAX_BYTES are refused before parsing, and readings dated
+    more than READINGS_MAX_FUTURE_SECONDS ahead fail validation.
+    """
+    body = await _read_limited_body(request, READINGS_BATCH_MAX_BYTES)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_MEDIA_TYPES:
+        body = b"[" + b",".join(line for line in body.splitlines() if line.strip()) + b"]"
+    try:
+        readings = _reading_list_adapter.validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+    if len(readings) > READINGS_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {READINGS_BATCH_MAX} readings per batch"
+        )
+    latest_allowed = datetime.now(timezone.utc) + timedelta(seconds=READINGS_MAX_FUTURE_SECONDS)
+    future = [
+        {
+            "type": "value_error", "loc": ("body", index, "ts"), "input": str(reading.ts),
+            "msg": f"Value error, ts is more than {READINGS_MAX_FUTURE_SECONDS:g} seconds in the future",
+        }
+        for index, reading in enumerate(readings)
+        if _aware_utc(reading.ts) > latest_allowed
+    ]
+    if future:
+        raise RequestValidationError(future[:100])
+    return await run_db(db_session, apply_container_readings, readings)
+
+def _aware_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Timezone-aware copy of moment; naive datetimes are taken to be UTC, as everywhere in the API."""
+    if moment is None or moment.tzinfo is not None:
+        return moment
+    return moment.replace(tzinfo=timezone.utc)
+
+async def _read_limited_body(request: Request, max_bytes: int) -> bytes:
+    """Read the request body, answering 413 as soon as it is known to exceed max_bytes."""
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Request body larger than {max_bytes} bytes"
+    )
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def _check_format(fmt: Optional[str]) -> str:
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Use one of the formats {', '.join(MEDIA_TYPES)} (format parameter or Content-Type)"
+        )
+    if fmt == "parquet" and not parquet_available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet support requires pyarrow")
+    return fmt
+
+@router.post(
+    "/import",
+    response_model=ContainerImportResponse,
+    responses={400: {"model": ContainerImportResponse, "description": "Unreadable file; the rows before it were written"}},
+    openapi_extra={"requestBody": {"required": True, "content": {
+        media_type: {"schema": {"type": "string", "format": "binary"}} for media_type in MEDIA_TYPES.values()
+    }}},
+)
+@query_budget(None)
+async def import_containers(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv, ndjson or parquet; taken from Content-Type when omitted"),
+    skip_existing: bool = Query(False, description="Leave containers whose code already exists untouched"),
+    db_session: DBSession = Depends(get_session)
+):
+    """
+    Create or update containers from a CSV, NDJSON or Parquet file.
+
+    Rows are matched on container_code and written IMPORT_CHUNK_SIZE at a
+    time, each chunk in its own transaction. Invalid rows are skipped and
+    reported; the upload is spooled to disk above IMPORT_SPOOL_MAX_BYTES.
+    A file that cannot be decoded stops the import with a 400 whose body is
+    the summary of the chunks written before, plus the error.
+    """
+    fmt = _check_format(resolve_format(format or request.headers.get("content-type")))
+    summary = ImportSummary()
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MAX_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        batches = validated_batches(read_rows(spool, fmt), IMPORT_CHUNK_SIZE, summary)
+        while True:
+            # Parsing runs in the threadpool one chunk at a time, the upsert wherever the session runs
+            try:
+                batch = await run_in_threadpool(next, batches, None)
+            except (ValueError, csv.Error) as e:
+                # The chunks before the error are committed, so report them along with it
+                summary.error = f"Unreadable {fmt} data after {summary.received} rows: {str(e)}"
+                return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=summary.as_dict())
+            if batch is None:
+                break
+            summary.add(await run_db(db_session, upsert_containers, batch, not skip_existing))
+    return summary.as_dict()
+
+@router.get("/export", responses={200: {"content": {media_type: {} for media_type in MEDIA_TYPES.values()}}})
+async def export_containers(format: str = Query("csv", pattern="^(csv|ndjson|parquet)$")):
+    """Download every container as CSV, NDJSON or Parquet, streamed EXPORT_CHUNK_SIZE rows at a time."""
+    fmt = _check_format(format)
+
+    def body():
+        # A session of its own: the response is streamed after the request's session is gone
+        with SessionLocal() as db:
+            yield from write_rows(iter_container_batches(db, EXPORT_FIELDS, EXPORT_CHUNK_SIZE), fmt)
+
+    return StreamingResponse(
+        body(), media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="containers.{fmt}"'}
+    )
+
+@router.get("/nearby", response_model=List[NearbyContainerResponse])
+async def get_nearby_containers(
+    lat: float = Query(..., ge=-90.0, le=90.0),
+    lon: float = Query(..., ge=-180.0, le=180.0),
+    radius_m: Optional[float] = Query(None, gt=0.0, description="Search radius in meters; unlimited when omitted"),
+    k: int = Query(10, ge=1, le=1000),
+    db_session: DBSession = Depends(get_session)
+):
+    """Get the k containers nearest to a point, nearest first."""
+    matches = await run_db(db_session, find_nearby_containers, lat, lon, k=k, radius_m=radius_m)
+    return [
+        NearbyContainerResponse(**ContainerResponse.model_validate(container).model_dump(), distance_m=distance)
+        for container, distance in matches
+    ]
+
+@router.get("/bbox", response_model=List[ContainerResponse])
+async def get_containers_in_bbox(
+    min_lat: float = Query(..., ge=-90.0, le=90.0),
+    min_lon: float = Query(..., ge=-180.0, le=180.0),
+    max_lat: float = Query(..., ge=-90.0, le=90.0),
+    max_lon: float = Query(..., ge=-180.0, le=180.0),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    db_session: DBSession = Depends(get_session)
+):
+    """Get the containers inside a bounding box, ordered by ID."""
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_lat/min_lon must not be greater than max_lat/max_lon"
+        )
+    return await run_db(db_session, find_containers_in_bbox, min_lat, min_lon, max_lat, max_lon, limit=limit)
+
+@router.get("/due", response_model=List[DueContainerResponse])
+async def get_containers_due(
+    within_hours: float = Query(..., gt=0.0, le=8760.0, description="Forecast horizon in hours"),
+    threshold: Optional[float] = Query(None, ge=0.0, le=1.0, description="Occupancy considered full"),
+    db_session: DBSession = Depends(get_session)
+):
+    """Get the containers forecast to become full within the given hours, soonest first."""
+    return await run_db(db_session, get_due_containers, within_hours, threshold)
 
 @router.get("/{container_id}", response_model=ContainerResponse)
-async def get_single_container(container_id: int, db_session: Session = Depends(get_db)):
-    """Get a specific container by ID."""
-    container = get_container(db_session, container_id)
+@query_budget(1)
+async def get_single_container(
+    container_id: int, request: Request, response: Response, db_session: DBSession = Depends(get_session)
+):
+    """Get a specific container by ID, honouring If-None-Match."""
+    container = await run_db(db_session, get_cached_container, container_id)
     if container is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Container not found")
+    etag = content_etag(container)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(conditional_headers(etag))
     return container
 
+@router.get("/{container_id}/history", response_model=ContainerHistoryResponse)
+async def get_container_occupancy_history(
+    container_id: int,
+    from_: Optional[datetime] = Query(None, alias="from", description="Range start; defaults to 7 days before to"),
+    to: Optional[datetime] = Query(None, description="Range end (exclusive); defaults to now"),
+    step: str = Query("1h", description="Bucket width: minutes, hours or days, e.g. 15m, 1h, 1d"),
+    db_session: DBSession = Depends(get_session)
+):
+    """
+    Get the occupancy history of a container, averaged per step.
+
+    Day-aligned steps read the daily rollup, hour-aligned steps the hourly
+    rollup and shorter steps the raw readings; ranges reaching past a
+    source's retention fall back to the next coarser one.
+    """
+    match = STEP_PATTERN.match(step)
+    if not match or int(match.group(1)) == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="step must look like 15m, 1h or 1d")
+    step_delta = timedelta(**{STEP_UNITS[match.group(2)]: int(match.group(1))})
+    end = _aware_utc(to) or datetime.now(timezone.utc)
+    start = _aware_utc(from_) or end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="from must be before to")
+    if (end - start) / step_delta > HISTORY_MAX_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range and step would return more than {HISTORY_MAX_POINTS} points"
+        )
+    if await run_db(db_session, get_cached_container, container_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Container not found")
+    source, points = await run_db(db_session, get_container_history, container_id, start, end, step_delta)
+    return {"container_id": container_id, "step": step, "source": source, "points": points}
+
 @router.get("/code/{container_code}", response_model=ContainerResponse)
-async def get_container_by_container_code(container_code: str, db_session: Session = Depends(get_db)):
-    """Get a specific container by container code."""
-    container = get_container_by_code(db_session, container_code)
+@query_budget(2)
+async def get_container_by_container_code(
+    container_code: str, request: Request, response: Response, db_session: DBSession = Depends(get_session)
+):
+    """Get a specific container by container code, honouring If-None-Match."""
+    container = await run_db(db_session, get_cached_container_by_code, container_code)
     if container is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Container not found")
+    etag = content_etag(container)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(conditional_headers(etag))
     return container
 
 @router.post("/", response_model=ContainerResponse, status_code=status.HTTP_201_CREATED)
-async def create_new_container(container: ContainerCreate, db_session: Session = Depends(get_db)):
+@query_budget(4)
+async def create_new_container(container: ContainerCreate, db_session: DBSession = Depends(get_session)):
     """Create a new container."""
-    # Check if a container with the same code already exists
-    existing_container = get_container_by_code(db_session, container.container_code)
-    if existing_container:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Container with code {container.container_code} already exists"
-        )
-    
-    new_container = create_container(db_session, container)
-    return new_container
+    try:
+        return await run_db(db_session, create_container, container)
+    except DuplicateContainerCodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.put("/{container_id}", response_model=ContainerResponse)
-async def update_existing_container(container_id: int, container: ContainerUpdate, db_session: Session = Depends(get_db)):
-    """Update an existing container."""
-    # Check if the container exists
-    updated_container = update_container(db_session, container_id, container)
+@query_budget(5)
+async def update_existing_container(container_id: int, container: ContainerUpdate, db_session: DBSession = Depends(get_session)):
+    """Update an existing container; a code already used by another container is rejected without writing."""
+    try:
+        updated_container = await run_db(db_session, update_container, container_id, container)
+    except DuplicateContainerCodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if updated_container is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Container not found")
-    
-    # If container code is being updated, check if new code already exists
-    if container.container_code:
-        existing = get_container_by_code(db_session, container.container_code)
-        if existing and existing.id != container_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Container with code {container.container_code} already exists"
-            )
-    
     return updated_container
 
 @router.delete("/{container_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_existing_container(container_id: int, db_session: Session = Depends(get_db)):
-    """Delete a container by ID."""
-    success = delete_container(db_session, container_id)
+@query_budget(4)
+async def delete_existing_container(container_id: int, db_session: DBSession = Depends(get_session)):
+    """Delete a container by ID, together with its occupancy history."""
+    success = await run_db(db_session, delete_container, container_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Container not found")
     return None 
\ No newline at end of file
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
 
 from app.schemas.item import ItemCreate, ItemResponse, ItemUpdate
-from app.database import get_db
-from app.db import get_items, get_item, create_item, update_item, delete_item
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from app.database import DBSession, get_session
+from app.pagination import paginate, parse_fields, projected_response
+from app.metrics import query_budget
+from app.db import run_db, get_item_rows, get_item, create_item, update_item, delete_item
+
+# Columns of a full item page, in ItemResponse order
+ITEM_FIELDS = list(ItemResponse.model_fields)
 
 router = APIRouter(
     prefix="/items",
@@ -13,37 +18,70 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[ItemResponse])
-async def get_all_items(db_session: Session = Depends(get_db)):
-    """Get all items."""
-    items = get_items(db_session)
-    return items
+@query_budget(1)
+async def get_all_items(
+    response: Response,
+    limit: Optional[int] = Query(
+        None, ge=1, le=PAGE_SIZE_MAX,
+        description=f"Page size; without limit and after_id every item is returned, else {PAGE_SIZE_DEFAULT}"
+    ),
+    after_id: Optional[int] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    is_available: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0.0),
+    max_price: Optional[float] = Query(None, ge=0.0),
+    name_prefix: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,price"),
+    db_session: DBSession = Depends(get_session)
+):
+    """
+    Get items ordered by ID, one page at a time.
+
+    When more items match, the X-Next-Cursor response header holds the
+    after_id to pass for the next page. Without limit and after_id all
+    matching items are returned.
+    """
+    columns = parse_fields(fields, ITEM_FIELDS)
+    if limit is None and after_id is not None:
+        limit = PAGE_SIZE_DEFAULT
+    filters = dict(
+        limit=None if limit is None else limit + 1, after_id=after_id, is_available=is_available,
+        min_price=min_price, max_price=max_price, name_prefix=name_prefix
+    )
+    rows = await run_db(db_session, get_item_rows, columns or ITEM_FIELDS, **filters)
+    if limit is not None:
+        rows = paginate(rows, limit, response)
+    return projected_response(rows, response)
 
 @router.get("/{item_id}", response_model=ItemResponse)
-async def get_single_item(item_id: int, db_session: Session = Depends(get_db)):
+@query_budget(1)
+async def get_single_item(item_id: int, db_session: DBSession = Depends(get_session)):
     """Get a specific item by ID."""
-    item = get_item(db_session, item_id)
+    item = await run_db(db_session, get_item, item_id)
     if item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
     return item
 
 @router.post("/", response_model=ItemResponse, status_code=status.HTTP_201_CREATED)
-async def create_new_item(item: ItemCreate, db_session: Session = Depends(get_db)):
+@query_budget(1)
+async def create_new_item(item: ItemCreate, db_session: DBSession = Depends(get_session)):
     """Create a new item."""
-    new_item = create_item(db_session, item)
+    new_item = await run_db(db_session, create_item, item)
     return new_item
 
 @router.put("/{item_id}", response_model=ItemResponse)
-async def update_existing_item(item_id: int, item: ItemUpdate, db_session: Session = Depends(get_db)):
+@query_budget(1)
+async def update_existing_item(item_id: int, item: ItemUpdate, db_session: DBSession = Depends(get_session)):
     """Update an existing item."""
-    updated_item = update_item(db_session, item_id, item)
+    updated_item = await run_db(db_session, update_item, item_id, item)
     if updated_item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
     return updated_item
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_existing_item(item_id: int, db_session: Session = Depends(get_db)):
+@query_budget(1)
+async def delete_existing_item(item_id: int, db_session: DBSession = Depends(get_session)):
     """Delete an item by ID."""
-    success = delete_item(db_session, item_id)
+    success = await run_db(db_session, delete_item, item_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
     return None 
\ No newline at end of file
@@ -0,0 +1,323 @@
+import json
+import time
+from typing import List, Literal, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse
+
+from app.config import (
+    DEPOT_LAT, DEPOT_LON, ROUTING_PROVIDER, ROUTING_PARTITION_CLUSTERS, ROUTING_PARTITION_METHOD,
+    ROUTING_PARTITION_MIN_STOPS, ROUTING_TIME_LIMIT_SECONDS, ROUTING_MAX_TIME_LIMIT_SECONDS, ROUTING_WORKERS,
+    ROUTE_MAP_CACHE_MAX_ENTRIES
+)
+from app.cache import MISSING, LocalBackend
+from app.database import DBSession, get_session
+from app.db import run_db, get_containers_to_collect
+from app.etag import conditional_headers, etag_matches, make_etag, not_modified
+from app.metrics import route_plan_seconds, route_solve_seconds
+from app.models.container import Container
+from app.routing.geojson import BoundingBox, route_map
+from app.routing.partition import plan_fleet_partitioned
+from app.routing.plans import StoredPlan, plan_key, route_plans
+from app.routing.service import plan_fleet, run_in_pool
+from app.serialization import dumps
+from app.schemas.route import (
+    FleetPlanRequest, FleetPlanResponse, RoutePlanRequest, RoutePlanResponse, RouteStop, VehiclePlan
+)
+
+router = APIRouter(
+    prefix="/routes",
+    tags=["routes"],
+)
+
+DEPOT_CODE = "Depo"
+
+# Rendered maps keyed by ETag, which covers the plan's solve_id and the rendering options. A key
+# never comes back for a different tour, so entries never go stale and are only evicted as least recently used
+_map_cache = LocalBackend(max_entries=ROUTE_MAP_CACHE_MAX_ENTRIES, ttl_seconds=float("inf"))
+
+MAP_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Route {plan_id}</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+const map = L.map("map", {{ preferCanvas: true }});
+L.tileLayer("https://tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+  maxZoom: 19, attribution: "&copy; OpenStreetMap contributors"
+}}).addTo(map);
+fetch({geojson_url}).then(response => response.json()).then(data => {{
+  const layer = L.geoJSON(data, {{
+    style: {{ color: "blue", weight: 4, opacity: 0.7 }},
+    pointToLayer: (feature, latlng) => L.circleMarker(latlng, feature.properties.kind === "depot"
+      ? {{ radius: 8, color: "red", fillOpacity: 0.9 }}
+      : {{ radius: 5, color: "blue", fillOpacity: 0.6 }}),
+    onEachFeature: (feature, marker) => {{
+      if (feature.properties.kind !== "route") {{
+        marker.bindTooltip(`${{feature.properties.sequence + 1}}. ${{feature.properties.container_code}}`);
+      }}
+    }}
+  }}).addTo(map);
+  map.fitBounds(layer.getBounds());
+}});
+</script>
+</body>
+</html>
+"""
+
+def _time_limit(requested):
+    """Clamp a requested solve budget to the configured maximum."""
+    return min(requested or ROUTING_TIME_LIMIT_SECONDS, ROUTING_MAX_TIME_LIMIT_SECONDS)
+
+def _partition(request: FleetPlanRequest, stop_count: int) -> Tuple[str, int]:
+    """Partition method and district count for a fleet plan; ("none", 1) to solve it whole."""
+    method = request.partition
+    if method == "auto":
+        method = ROUTING_PARTITION_METHOD if stop_count >= ROUTING_PARTITION_MIN_STOPS else "none"
+    clusters = request.clusters or ROUTING_PARTITION_CLUSTERS or ROUTING_WORKERS
+    clusters = min(clusters, len(request.vehicles), stop_count)
+    if method == "none" or clusters < 2:
+        return "none", 1
+    return method, clusters
+
+def _stops(
+    order: Sequence[int], depots: Sequence[Tuple[float, float]], containers: Sequence[Container]
+) -> List[RouteStop]:
+    """Translate solver node indices (depots first, then containers) into route stops."""
+    stops = []
+    for sequence, node in enumerate(order):
+        if node < len(depots):
+            code = DEPOT_CODE if len(depots) == 1 else f"{DEPOT_CODE}{node + 1}"
+            stops.append(RouteStop(sequence=sequence, container_code=code, lat=depots[node][0], lon=depots[node][1]))
+        else:
+            container = containers[node - len(depots)]
+            stops.append(RouteStop(
+                sequence=sequence, container_id=container.id, container_code=container.container_code,
+                lat=container.lang, lon=container.long
+            ))
+    return stops
+
+@router.post("/plan", response_model=RoutePlanResponse)
+async def plan_collection_route(request: RoutePlanRequest, db_session: DBSession = Depends(get_session)):
+    """
+    Plan a collection route from the depot through every container that needs emptying.
+
+    The last tour per depot, vehicle and parameters is kept. When only a few
+    containers joined or left the set since, it is repaired and briefly
+    re-searched in milliseconds; otherwise the tour is solved from scratch in
+    a separate process within the requested time budget.
+    """
+    depot = (request.depot.lat, request.depot.lon) if request.depot else (DEPOT_LAT, DEPOT_LON)
+    containers = await run_db(
+        db_session, get_containers_to_collect, request.occupancy_threshold, request.due_within_hours
+    )
+
+    points = [depot] + [(container.lang, container.long) for container in containers]
+    key = plan_key(
+        depot, request.vehicle_id, request.occupancy_threshold, request.due_within_hours, request.alpha, request.beta
+    )
+    started = time.perf_counter()
+    plan, mode = await route_plans.plan(
+        key, points, [container.id for container in containers],
+        time_limit_seconds=_time_limit(request.time_limit_seconds), metaheuristic=request.metaheuristic,
+        reoptimize=request.reoptimize,
+        container_codes={container.id: container.container_code for container in containers}
+    )
+    planner = "route" if mode == "full" else f"route_{mode}"
+    route_plan_seconds.labels(planner).observe(time.perf_counter() - started)
+    if plan is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No route found")
+    solution = plan.solution
+    if mode != "unchanged":
+        route_solve_seconds.labels(planner).observe(solution.solve_seconds)
+
+    # The stored plan numbers its stops in its own order, not the query's
+    by_id = {container.id: container for container in containers}
+    return RoutePlanResponse(
+        plan_id=plan.plan_id,
+        version=plan.version,
+        mode=mode,
+        stops=_stops(solution.order, [depot], [by_id[container_id] for container_id in plan.container_ids]),
+        total_distance_km=solution.total_distance_km,
+        total_duration_min=solution.total_duration_min,
+        solve_seconds=solution.solve_seconds,
+        provider=ROUTING_PROVIDER,
+    )
+
+@router.post("/plan/fleet", response_model=FleetPlanResponse)
+async def plan_fleet_routes(request: FleetPlanRequest, db_session: DBSession = Depends(get_session)):
+    """
+    Plan routes for several capacitated trucks, optionally from several depots.
+
+    Each container's demand is its occupancy ratio. Containers that no truck
+    can take within capacity, shift length or time windows are returned as
+    unassigned. Large plans are split into districts, each with the trucks
+    nearest to it, that are solved in parallel and stitched together.
+    """
+    depots = [(depot.lat, depot.lon) for depot in request.depots] or [(DEPOT_LAT, DEPOT_LON)]
+    for vehicle in request.vehicles:
+        if vehicle.depot_index >= len(depots):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Vehicle depot_index {vehicle.depot_index} does not match any depot"
+            )
+    for window in request.time_windows.values():
+        if window.start_min > window.end_min:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Time window start_min is after end_min")
+
+    containers = await run_db(
+        db_session, get_containers_to_collect, request.occupancy_threshold, request.due_within_hours
+    )
+    node_of = {container.id: len(depots) + i for i, container in enumerate(containers)}
+    time_windows = {
+        node_of[container_id]: (window.start_min, window.end_min)
+        for container_id, window in request.time_windows.items()
+        if container_id in node_of
+    }
+
+    points = depots + [(container.lang, container.long) for container in containers]
+    demands = [0.0] * len(depots) + [container.occupancy_ratio or 0.0 for container in containers]
+    method, clusters = _partition(request, len(containers))
+    problem = (
+        points, len(depots), demands,
+        [vehicle.capacity for vehicle in request.vehicles],
+        [vehicle.depot_index for vehicle in request.vehicles],
+    )
+    options = dict(
+        time_windows=time_windows,
+        alpha=request.alpha, beta=request.beta,
+        service_minutes=request.service_minutes, shift_minutes=request.shift_minutes,
+        time_limit_seconds=_time_limit(request.time_limit_seconds),
+    )
+    planner = "fleet" if method == "none" else "fleet_partitioned"
+    started = time.perf_counter()
+    if method == "none":
+        solution = await run_in_pool(plan_fleet, *problem, **options)
+    else:
+        solution = await plan_fleet_partitioned(*problem, clusters=clusters, method=method, **options)
+    route_plan_seconds.labels(planner).observe(time.perf_counter() - started)
+    if solution is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No route found")
+    route_solve_seconds.labels(planner).observe(solution.solve_seconds)
+
+    return FleetPlanResponse(
+        vehicles=[
+            VehiclePlan(
+                vehicle=route.vehicle,
+                stops=_stops(route.order, depots, containers),
+                load=route.load,
+                distance_km=route.distance_km,
+                duration_min=route.duration_min,
+            )
+            for route in solution.routes
+        ],
+        unassigned_container_ids=[containers[node - len(depots)].id for node in solution.dropped],
+        clusters=solution.districts,
+        whole_fleet_fallback=solution.whole_fleet_fallback,
+        total_distance_km=solution.total_distance_km,
+        total_duration_min=solution.total_duration_min,
+        solve_seconds=solution.solve_seconds,
+        provider=ROUTING_PROVIDER,
+    )
+
+def _stored_plan(plan_id: str) -> StoredPlan:
+    plan = route_plans.get(plan_id)
+    if plan is None:
+        # Plans are kept per worker process, up to ROUTING_PLAN_MAX_ENTRIES
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Route plan not found; it may have been evicted, or solved by another worker process"
+        )
+    return plan
+
+def _bbox(
+    min_lat: Optional[float], min_lon: Optional[float], max_lat: Optional[float], max_lon: Optional[float]
+) -> Optional[BoundingBox]:
+    """The bounding box query parameters: all four or none."""
+    values = (min_lat, min_lon, max_lat, max_lon)
+    if all(value is None for value in values):
+        return None
+    if any(value is None for value in values):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Give all of min_lat, min_lon, max_lat and max_lon"
+        )
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_lat/min_lon must not be greater than max_lat/max_lon"
+        )
+    return values
+
+@router.get(
+    "/{plan_id}/geojson",
+    responses={200: {"content": {"application/geo+json": {}}}, 404: {"description": "Route plan not found"}},
+)
+async def get_route_geojson(
+    plan_id: str,
+    request: Request,
+    format: Literal["geojson", "polyline"] = Query("geojson", description="GeoJSON, or Google encoded polylines"),
+    simplify_m: float = Query(0.0, ge=0.0, le=100000.0, description="Route simplification tolerance in meters"),
+    min_lat: Optional[float] = Query(None, ge=-90.0, le=90.0),
+    min_lon: Optional[float] = Query(None, ge=-180.0, le=180.0),
+    max_lat: Optional[float] = Query(None, ge=-90.0, le=90.0),
+    max_lon: Optional[float] = Query(None, ge=-180.0, le=180.0),
+    markers: bool = Query(True, description="Include the depot and container markers"),
+):
+    """
+    Get a stored route plan as GeoJSON or encoded polylines for drawing on a map.
+
+    The plan_id and version come from POST /routes/plan. Coordinates are
+    rounded to about a meter. simplify_m thins out the route line and the
+    bounding box keeps only the route parts and markers inside it, for
+    plans with thousands of stops. Renders are cached per solve and options
+    and carry an ETag; they are built in the threadpool.
+    """
+    plan = _stored_plan(plan_id)
+    bbox = _bbox(min_lat, min_lon, max_lat, max_lon)
+    # The version alone repeats for another tour after eviction or a restart; the solve_id does not
+    etag = make_etag(plan.version, request, plan.solve_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    body = _map_cache.get(etag)
+    if body is MISSING:
+        rendered = await run_in_threadpool(
+            route_map, plan, DEPOT_CODE,
+            polyline=format == "polyline", simplify_m=simplify_m, bbox=bbox, markers=markers
+        )
+        body = dumps(rendered)
+        _map_cache.set(etag, body)
+    media_type = "application/geo+json" if format == "geojson" else "application/json"
+    return Response(content=body, media_type=media_type, headers=conditional_headers(etag))
+
+@router.get("/{plan_id}/map", response_class=HTMLResponse, responses={404: {"description": "Route plan not found"}})
+async def get_route_map(
+    plan_id: str,
+    simplify_m: float = Query(0.0, ge=0.0, le=100000.0),
+    min_lat: Optional[float] = Query(None, ge=-90.0, le=90.0),
+    min_lon: Optional[float] = Query(None, ge=-180.0, le=180.0),
+    max_lat: Optional[float] = Query(None, ge=-90.0, le=90.0),
+    max_lon: Optional[float] = Query(None, ge=-180.0, le=180.0),
+    markers: bool = True,
+):
+    """
+    Get an HTML page drawing a stored route plan with Leaflet.
+
+    The page is a small shell that loads the plan from the geojson endpoint
+    with the same options, so markers are not embedded in the page.
+    """
+    plan = _stored_plan(plan_id)
+    bbox = _bbox(min_lat, min_lon, max_lat, max_lon)
+    query = {"simplify_m": simplify_m, "markers": str(markers).lower()}
+    if bbox is not None:
+        query.update(min_lat=min_lat, min_lon=min_lon, max_lat=max_lat, max_lon=max_lon)
+    geojson_url = f"geojson?{urlencode(query)}"
+    return HTMLResponse(MAP_PAGE.format(plan_id=plan.plan_id, geojson_url=json.dumps(geojson_url)))
@@ -0,0 +1,206 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.routing.partition import planar_km
+from app.routing.plans import StoredPlan
+from app.routing.providers import Point
+
+# Decimal places of rendered coordinates (about 1 m), also the polyline precision
+COORDINATE_PRECISION = 5
+
+# (min_lat, min_lon, max_lat, max_lon)
+BoundingBox = Tuple[float, float, float, float]
+
+def encode_polyline(points: Sequence[Point], precision: int = COORDINATE_PRECISION) -> str:
+    """
+    Encode (lat, lon) points with Google's encoded polyline algorithm.
+
+    Args:
+        points: (lat, lon) points in order
+        precision: Decimal places kept; 5 is what Google Maps and Leaflet plugins expect
+
+    Returns:
+        The encoded polyline, a few bytes per point
+    """
+    if not len(points):
+        return ""
+    scaled = np.rint(np.asarray(points, dtype=np.float64).reshape(-1, 2) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    zigzag = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    chunks = []
+    for value in zigzag.tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+def simplify_line(points: Sequence[Point], tolerance_m: float) -> List[int]:
+    """
+    Douglas-Peucker simplification of a line.
+
+    Args:
+        points: (lat, lon) points of the line
+        tolerance_m: Largest distance in meters a dropped point may lie from the simplified line
+
+    Returns:
+        Indices of the points kept, in order; always the first and the last
+    """
+    count = len(points)
+    if count <= 2 or tolerance_m <= 0:
+        return list(range(count))
+    coordinates = planar_km(points, points[0]) * 1000
+    keep = np.zeros(count, dtype=bool)
+    keep[[0, count - 1]] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = coordinates[first], coordinates[last]
+        between = coordinates[first + 1:last]
+        segment = end - start
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(*(between - start).T)
+        else:
+            offsets = between - start
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.extend(((first, index), (index, last)))
+    return np.flatnonzero(keep).tolist()
+
+def _inside(points: np.ndarray, bbox: BoundingBox) -> np.ndarray:
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return (
+        (points[:, 0] >= min_lat) & (points[:, 0] <= max_lat) & (points[:, 1] >= min_lon) & (points[:, 1] <= max_lon)
+    )
+
+def clip_line(points: Sequence[Point], bbox: BoundingBox) -> List[List[Point]]:
+    """
+    Keep the parts of a line whose segments touch a bounding box.
+
+    Segments are tested against the box (Liang-Barsky, vectorized) and kept
+    whole; runs of consecutive kept segments become separate parts.
+
+    Returns:
+        Parts of the line, each with at least two points
+    """
+    line = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(line) < 2:
+        return []
+    start, delta = line[:-1], np.diff(line, axis=0)
+    low = np.zeros(len(start))
+    high = np.ones(len(start))
+    touches = np.ones(len(start), dtype=bool)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    for axis, lower, upper in ((0, min_lat, max_lat), (1, min_lon, max_lon)):
+        for p, q in ((-delta[:, axis], start[:, axis] - lower), (delta[:, axis], upper - start[:, axis])):
+            parallel = p == 0
+            touches &= ~(parallel & (q < 0))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = q / p
+            entering = ~parallel & (p < 0)
+            leaving = ~parallel & (p > 0)
+            low = np.where(entering, np.maximum(low, ratio), low)
+            high = np.where(leaving, np.minimum(high, ratio), high)
+    touches &= low <= high
+
+    parts = []
+    index = 0
+    while index < len(touches):
+        if not touches[index]:
+            index += 1
+            continue
+        end = index
+        while end < len(touches) and touches[end]:
+            end += 1
+        parts.append([tuple(point) for point in line[index:end + 1].tolist()])
+        index = end
+    return parts
+
+def _lon_lat(points: Sequence[Point]) -> List[List[float]]:
+    """GeoJSON positions, [lon, lat], rounded to COORDINATE_PRECISION."""
+    return np.round(np.asarray(points, dtype=np.float64).reshape(-1, 2)[:, ::-1], COORDINATE_PRECISION).tolist()
+
+def route_map(
+    plan: StoredPlan,
+    depot_code: str,
+    polyline: bool = False,
+    simplify_m: float = 0.0,
+    bbox: Optional[BoundingBox] = None,
+    markers: bool = True,
+) -> Dict[str, Any]:
+    """
+    Render a stored plan as GeoJSON, or as encoded polylines.
+
+    The route is simplified (simplify_m) and then clipped to bbox; markers
+    are only clipped, so every stop inside the box keeps its exact position.
+
+    Args:
+        plan: Plan to render
+        depot_code: Label of the depot marker
+        polyline: Return encoded polylines instead of a GeoJSON FeatureCollection
+        simplify_m: Douglas-Peucker tolerance of the route in meters; 0 keeps every stop
+        bbox: Only the parts of the route and the markers inside this box
+        markers: Include the depot and container markers
+
+    Returns:
+        A GeoJSON FeatureCollection with a (Multi)LineString for the route and
+        a Point per stop, or {"route": [polylines], "markers": polyline,
+        "stops": [[sequence, container_id, container_code], ...]} in marker order
+    """
+    order = plan.solution.order
+    route_points = [plan.points[node] for node in order]
+    route_points = [route_points[index] for index in simplify_line(route_points, simplify_m)]
+    parts = clip_line(route_points, bbox) if bbox is not None else [route_points]
+
+    stops = []
+    if markers:
+        # The tour ends where it started; the depot gets one marker
+        sequence_nodes = list(enumerate(order[:-1]))
+        positions = np.asarray([plan.points[node] for _, node in sequence_nodes], dtype=np.float64)
+        inside = _inside(positions, bbox) if bbox is not None else np.ones(len(positions), dtype=bool)
+        for (sequence, node), keep in zip(sequence_nodes, inside.tolist()):
+            if keep:
+                container_id = plan.container_ids[node - 1] if node else None
+                code = plan.container_codes.get(container_id, "") if node else depot_code
+                stops.append((sequence, container_id, code, plan.points[node]))
+
+    summary = {
+        "plan_id": plan.plan_id,
+        "version": plan.version,
+        "total_distance_km": round(plan.solution.total_distance_km, 3),
+        "total_duration_min": round(plan.solution.total_duration_min, 1),
+    }
+    if polyline:
+        return {
+            **summary,
+            "route": [encode_polyline(part) for part in parts],
+            "markers": encode_polyline([point for *_, point in stops]),
+            "stops": [[sequence, container_id, code] for sequence, container_id, code, _ in stops],
+        }
+
+    if len(parts) == 1:
+        geometry = {"type": "LineString", "coordinates": _lon_lat(parts[0])}
+    else:
+        geometry = {"type": "MultiLineString", "coordinates": [_lon_lat(part) for part in parts]}
+    features = [{"type": "Feature", "geometry": geometry, "properties": {"kind": "route", **summary}}]
+    if stops:
+        positions = _lon_lat([point for *_, point in stops])
+        features.extend(
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": position},
+                "properties": {
+                    "kind": "depot" if container_id is None else "container",
+                    "sequence": sequence, "container_id": container_id, "container_code": code,
+                },
+            }
+            for (sequence, container_id, code, _), position in zip(stops, positions)
+        )
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,246 @@
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.routing.providers import MatrixProvider, Point
+
+# Decimal places of the coordinates used as cache keys (about 1 m)
+KEY_PRECISION = 5
+
+@contextmanager
+def _file_lock(path: str):
+    """Hold an exclusive lock on path across processes (no-op where fcntl is unavailable)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def location_key(point: Point) -> str:
+    """Cache key of a location, its coordinates rounded to KEY_PRECISION decimals."""
+    return f"{point[0]:.{KEY_PRECISION}f},{point[1]:.{KEY_PRECISION}f}"
+
+class MatrixCache:
+    """
+    Persistent distance/duration cache shared by all solver processes.
+
+    Each provider (and, for traffic-aware providers, each time-of-day bucket)
+    has its own store: an index assigning every location a slot, and three
+    memory-mapped .npy matrices indexed by slot holding the distance, the
+    duration and the fetch time of each pair. Only missing or expired pairs
+    are requested from the provider, so adding one location costs one new
+    row and one new column. Once a store holds max_locations locations, the
+    least recently used ones give up their slots to new locations.
+
+    Args:
+        directory: Root directory of the stores
+        ttl_seconds: Age after which a cached pair is fetched again
+        bucket_minutes: Width of the time-of-day buckets for time-dependent providers
+        initial_capacity: Number of slots allocated for a new store
+        max_locations: Locations kept per store; a single request may exceed it
+    """
+
+    def __init__(
+        self, directory: str, ttl_seconds: float = 86400.0, bucket_minutes: int = 60, initial_capacity: int = 256,
+        max_locations: int = 2048
+    ):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.bucket_minutes = bucket_minutes
+        self.initial_capacity = initial_capacity
+        self.max_locations = max_locations
+        self.requested_pairs = 0
+
+    def store_path(self, provider: MatrixProvider, now: Optional[float] = None) -> str:
+        """Directory of the store used for provider at time now."""
+        if not provider.time_dependent:
+            return os.path.join(self.directory, provider.name, "static")
+        moment = datetime.fromtimestamp(now if now is not None else time.time())
+        bucket = (moment.hour * 60 + moment.minute) // self.bucket_minutes
+        return os.path.join(self.directory, provider.name, f"bucket-{bucket:03d}")
+
+    def _load_index(self, path: str) -> Dict:
+        index_path = os.path.join(path, "index.json")
+        if not os.path.exists(index_path):
+            index = {"slots": {}}
+        else:
+            with open(index_path) as index_file:
+                index = json.load(index_file)
+        index.setdefault("used", {})
+        # The matrices are the truth about the capacity: an index saved before
+        # a resize (e.g. by an older version) must not shrink it
+        distance_path = os.path.join(path, "distance.npy")
+        index["capacity"] = np.load(distance_path, mmap_mode="r").shape[0] if os.path.exists(distance_path) else 0
+        return index
+
+    def _save_index(self, path: str, index: Dict):
+        temp_path = os.path.join(path, "index.json.tmp")
+        with open(temp_path, "w") as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_path, os.path.join(path, "index.json"))
+
+    def _resize(self, path: str, old_capacity: int, new_capacity: int):
+        """Grow the matrices of a store, keeping the cached pairs."""
+        for name, dtype in (("distance", np.float32), ("duration", np.float32), ("fetched_at", np.uint32)):
+            target = os.path.join(path, f"{name}.npy")
+            temp_path = target + ".tmp"
+            grown = np.lib.format.open_memmap(temp_path, mode="w+", dtype=dtype, shape=(new_capacity, new_capacity))
+            if old_capacity:
+                current = np.load(target, mmap_mode="r")
+                grown[:old_capacity, :old_capacity] = current
+                del current
+            grown.flush()
+            del grown
+            os.replace(temp_path, target)
+
+    def _assign_slots(self, index: Dict, keys: Sequence[str], now: float) -> List[int]:
+        """
+        Give the new keys slots, evicting least recently used locations beyond max_locations.
+
+        Returns:
+            The slots taken from evicted locations, whose cached pairs must be cleared
+        """
+        slots_by_key = index["slots"]
+        used = index["used"]
+        requested = set(keys)
+        new_keys = [key for key in dict.fromkeys(keys) if key not in slots_by_key]
+        excess = len(slots_by_key) + len(new_keys) - self.max_locations
+        freed = []
+        if new_keys and excess > 0:
+            candidates = sorted((key for key in slots_by_key if key not in requested), key=lambda key: used.get(key, 0))
+            for key in candidates[:excess]:
+                freed.append(slots_by_key.pop(key))
+                used.pop(key, None)
+        next_slot = len(slots_by_key) + len(freed)
+        available = list(freed)
+        for key in new_keys:
+            if available:
+                slots_by_key[key] = available.pop()
+            else:
+                slots_by_key[key] = next_slot
+                next_slot += 1
+        for key in requested:
+            used[key] = int(now)
+        return freed
+
+    def matrices(
+        self, provider: MatrixProvider, points: Sequence[Point], now: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the square distance and duration matrices between points.
+
+        Args:
+            provider: Provider asked for the pairs missing from the cache
+            points: (lat, lon) locations
+            now: Current UNIX time, for tests
+
+        Returns:
+            (distance_km, duration_min) as float64 arrays
+        """
+        now = time.time() if now is None else now
+        path = self.store_path(provider, now)
+        os.makedirs(path, exist_ok=True)
+
+        with _file_lock(os.path.join(path, ".lock")):
+            index = self._load_index(path)
+            keys = [location_key(point) for point in points]
+            freed = self._assign_slots(index, keys, now)
+            slots_by_key = index["slots"]
+            if len(slots_by_key) > index["capacity"]:
+                capacity = max(self.initial_capacity, index["capacity"])
+                while capacity < len(slots_by_key):
+                    capacity *= 2
+                self._resize(path, index["capacity"], capacity)
+                index["capacity"] = capacity
+
+            distance = np.load(os.path.join(path, "distance.npy"), mmap_mode="r+")
+            duration = np.load(os.path.join(path, "duration.npy"), mmap_mode="r+")
+            fetched_at = np.load(os.path.join(path, "fetched_at.npy"), mmap_mode="r+")
+            if freed:
+                # Pairs of evicted locations must not be read as the pairs of their successors
+                fetched_at[freed, :] = 0
+                fetched_at[:, freed] = 0
+                fetched_at.flush()
+            # Saved before the provider is asked, so a failed request leaves a consistent store
+            self._save_index(path, index)
+
+            slots = np.array([slots_by_key[key] for key in keys], dtype=np.int64)
+            grid = np.ix_(slots, slots)
+            ages = now - fetched_at[grid].astype(np.float64)
+            stale = (fetched_at[grid] == 0) | (ages > self.ttl_seconds)
+            np.fill_diagonal(stale, False)
+
+            if stale.any():
+                # Fetch the rows that are entirely stale (new locations) in full, then
+                # only the stale columns for the other rows
+                rows = np.flatnonzero(stale.sum(axis=1) >= len(points) - 1)
+                if rows.size:
+                    self._fetch(provider, points, rows, np.arange(len(points)), slots, distance, duration, fetched_at, now)
+                    stale[rows, :] = False
+                columns = np.flatnonzero(stale.any(axis=0))
+                if columns.size:
+                    rows = np.flatnonzero(stale[:, columns].any(axis=1))
+                    self._fetch(provider, points, rows, columns, slots, distance, duration, fetched_at, now)
+                distance.flush()
+                duration.flush()
+                fetched_at.flush()
+
+            distance_km = distance[grid].astype(np.float64)
+            duration_min = duration[grid].astype(np.float64)
+            del distance, duration, fetched_at
+
+        np.fill_diagonal(distance_km, 0.0)
+        np.fill_diagonal(duration_min, 0.0)
+        return distance_km, duration_min
+
+    def _fetch(self, provider, points, rows, columns, slots, distance, duration, fetched_at, now):
+        """Ask the provider for the rows x columns block and store it."""
+        origins = [points[i] for i in rows]
+        destinations = [points[j] for j in columns]
+        block_distance, block_duration = provider.rect(origins, destinations)
+        target = np.ix_(slots[rows], slots[columns])
+        distance[target] = block_distance
+        duration[target] = block_duration
+        fetched_at[target] = int(now)
+        self.requested_pairs += len(rows) * len(columns)
+
+    def prune(self, max_age_seconds: Optional[float] = None) -> int:
+        """
+        Delete stores that have not been written to for max_age_seconds (the TTL by default).
+
+        Every pair in such a store has expired, so nothing reusable is lost.
+        Each store is checked again under its lock before it is removed.
+
+        Returns:
+            Number of stores deleted
+        """
+        cutoff = time.time() - (self.ttl_seconds if max_age_seconds is None else max_age_seconds)
+        if not os.path.isdir(self.directory):
+            return 0
+        deleted = 0
+        for provider_name in os.listdir(self.directory):
+            provider_path = os.path.join(self.directory, provider_name)
+            if not os.path.isdir(provider_path):
+                continue
+            for store in os.listdir(provider_path):
+                store_path = os.path.join(provider_path, store)
+                index_path = os.path.join(store_path, "index.json")
+                if not (os.path.exists(index_path) and os.path.getmtime(index_path) < cutoff):
+                    continue
+                with _file_lock(os.path.join(store_path, ".lock")):
+                    if os.path.exists(index_path) and os.path.getmtime(index_path) < cutoff:
+                        shutil.rmtree(store_path, ignore_errors=True)
+                        deleted += 1
+        return deleted
@@ -0,0 +1,295 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import ROUTING_PARTITION_FALLBACK_SECONDS
+from app.routing.providers import Point
+from app.routing.service import plan_fleet, run_in_pool
+from app.routing.solver import FleetSolution, VehicleRoute
+
+# Partitioning methods accepted by plan_fleet_partitioned
+PARTITION_METHODS = ("kmeans", "sweep")
+
+def planar_km(points: Sequence[Point], origin: Point) -> np.ndarray:
+    """Project (lat, lon) points to approximate kilometers east and north of origin."""
+    coordinates = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    north = (coordinates[:, 0] - origin[0]) * 110.574
+    east = (coordinates[:, 1] - origin[1]) * 111.320 * np.cos(np.radians(origin[0]))
+    return np.column_stack([east, north])
+
+def kmeans_labels(coordinates: np.ndarray, clusters: int, iterations: int = 50, seed: int = 0) -> np.ndarray:
+    """
+    Cluster planar coordinates with Lloyd's k-means, seeded with k-means++.
+
+    Every iteration is a handful of array operations over all points, so
+    thousands of containers cluster in milliseconds.
+
+    Args:
+        coordinates: (n, 2) planar coordinates
+        clusters: Number of clusters, at most n
+        iterations: Maximum Lloyd iterations
+        seed: Seed of the k-means++ sampling
+
+    Returns:
+        Cluster label of each point, 0..clusters-1; a cluster left empty is
+        reseeded at the points farthest from their centers, so labels only
+        go unused when there are fewer distinct points than clusters
+    """
+    rng = np.random.default_rng(seed)
+    centers = [coordinates[rng.integers(len(coordinates))]]
+    nearest = ((coordinates - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, clusters):
+        total = nearest.sum()
+        index = rng.choice(len(coordinates), p=nearest / total) if total > 0 else rng.integers(len(coordinates))
+        centers.append(coordinates[index])
+        nearest = np.minimum(nearest, ((coordinates - coordinates[index]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    labels = np.full(len(coordinates), -1)
+    for _ in range(iterations):
+        distances = ((coordinates[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=clusters)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, coordinates)
+        occupied = counts > 0
+        centers[occupied] = sums[occupied] / counts[occupied, None]
+        empty = np.flatnonzero(~occupied)
+        if len(empty):
+            spread = distances[np.arange(len(coordinates)), labels]
+            centers[empty] = coordinates[np.argsort(-spread, kind="stable")[:len(empty)]]
+    return labels
+
+def sweep_labels(coordinates: np.ndarray, weights: np.ndarray, clusters: int) -> np.ndarray:
+    """
+    Cut points into angular sectors around the origin of equal total weight.
+
+    The sweep starts at the widest empty angle, so no sector straddles two
+    far-apart groups of points.
+
+    Args:
+        coordinates: (n, 2) planar coordinates relative to the depot
+        weights: Weight of each point, e.g. its demand
+        clusters: Number of sectors
+
+    Returns:
+        Sector label of each point, 0..clusters-1
+    """
+    angles = np.arctan2(coordinates[:, 1], coordinates[:, 0])
+    order = np.argsort(angles)
+    sorted_angles = angles[order]
+    gaps = np.diff(np.append(sorted_angles, sorted_angles[0] + 2 * np.pi))
+    order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+
+    weights = np.maximum(np.asarray(weights, dtype=np.float64)[order], 1e-9)
+    before = np.cumsum(weights) - weights
+    labels = np.empty(len(coordinates), dtype=np.int64)
+    labels[order] = np.minimum((before / weights.sum() * clusters).astype(np.int64), clusters - 1)
+    return labels
+
+def assign_vehicles(
+    centroids: np.ndarray, cluster_demands: np.ndarray, vehicle_capacities: Sequence[float], vehicle_positions: np.ndarray
+) -> List[int]:
+    """
+    Give every cluster the trucks closest to it, in proportion to its demand.
+
+    Each cluster first gets one truck, largest demand first; the remaining
+    trucks go one by one to the cluster with the most demand not yet covered
+    by the capacity of its trucks. A cluster takes the nearest truck that
+    covers what it still needs (the smaller one of equally near trucks), or
+    else the largest truck left. Clusters must not be empty, or they would
+    take a truck for nothing.
+
+    Args:
+        centroids: (k, 2) planar cluster centers
+        cluster_demands: Total demand of each cluster
+        vehicle_capacities: Capacity of each truck
+        vehicle_positions: (v, 2) planar position of each truck's depot
+
+    Returns:
+        Cluster of each truck
+    """
+    distances = ((vehicle_positions[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+    assigned = [-1] * len(vehicle_capacities)
+    uncovered = np.asarray(cluster_demands, dtype=np.float64).copy()
+
+    def take(cluster):
+        free = [vehicle for vehicle, owner in enumerate(assigned) if owner < 0]
+        covering = [vehicle for vehicle in free if vehicle_capacities[vehicle] >= uncovered[cluster]]
+        if covering:
+            vehicle = min(covering, key=lambda candidate: (distances[candidate, cluster], vehicle_capacities[candidate]))
+        else:
+            vehicle = min(free, key=lambda candidate: (-vehicle_capacities[candidate], distances[candidate, cluster]))
+        assigned[vehicle] = cluster
+        uncovered[cluster] -= vehicle_capacities[vehicle]
+
+    for cluster in np.argsort(-uncovered):
+        take(int(cluster))
+    for _ in range(len(vehicle_capacities) - len(centroids)):
+        take(int(np.argmax(uncovered)))
+    return assigned
+
+def partition_stops(
+    points: Sequence[Point],
+    depot_count: int,
+    demands: Sequence[float],
+    vehicle_capacities: Sequence[float],
+    vehicle_depots: Sequence[int],
+    clusters: int,
+    method: str = "kmeans",
+) -> Tuple[np.ndarray, List[int]]:
+    """
+    Split the stops of a fleet problem into districts and share the trucks among them.
+
+    Args:
+        points: (lat, lon) of the depots followed by the stops
+        depot_count: Number of depots at the start of points
+        demands: Demand per point, 0 for depots
+        vehicle_capacities: Capacity of each vehicle
+        vehicle_depots: Depot index of each vehicle
+        clusters: Number of districts, at most the number of vehicles
+        method: "kmeans" for compact districts, "sweep" for sectors of equal demand
+
+    Returns:
+        (district of each stop, district of each vehicle); districts that
+        would have no stops are left out, so there may be fewer than clusters
+    """
+    if method not in PARTITION_METHODS:
+        raise ValueError(f"Unknown partition method '{method}'")
+    origin = tuple(np.mean([points[depot] for depot in vehicle_depots], axis=0))
+    coordinates = planar_km(points, origin)
+    stops = coordinates[depot_count:]
+    stop_demands = np.asarray(demands[depot_count:], dtype=np.float64)
+    if method == "kmeans":
+        labels = kmeans_labels(stops, clusters)
+    else:
+        labels = sweep_labels(stops, stop_demands, clusters)
+    # Renumber the districts that got stops, e.g. when stops share a location
+    used, labels = np.unique(labels, return_inverse=True)
+    clusters = len(used)
+
+    counts = np.bincount(labels, minlength=clusters)
+    centroids = np.zeros((clusters, 2))
+    np.add.at(centroids, labels, stops)
+    centroids /= np.maximum(counts, 1)[:, None]
+    cluster_demands = np.bincount(labels, weights=stop_demands, minlength=clusters)
+    vehicle_clusters = assign_vehicles(
+        centroids, cluster_demands, vehicle_capacities, coordinates[list(vehicle_depots)]
+    )
+    return labels, vehicle_clusters
+
+async def plan_fleet_partitioned(
+    points: Sequence[Point],
+    depot_count: int,
+    demands: Sequence[float],
+    vehicle_capacities: Sequence[float],
+    vehicle_depots: Sequence[int],
+    time_windows: Optional[Dict[int, Tuple[float, float]]] = None,
+    clusters: int = 2,
+    method: str = "kmeans",
+    fallback_time_limit_seconds: float = ROUTING_PARTITION_FALLBACK_SECONDS,
+    **solve_options,
+) -> FleetSolution:
+    """
+    Solve a fleet problem as independent districts in parallel and stitch the plans.
+
+    Stops are clustered with partition_stops(), each district is planned
+    with its own trucks by plan_fleet() in the solver process pool, and the
+    routes and dropped stops are mapped back to the original node and
+    vehicle indices. Every district builds only its own, much smaller,
+    matrices. Routes never cross districts, so the result can cost more
+    than a single solve of the whole problem. When districts drop stops (or
+    find no plan at all) that the trucks' unused capacity could still take,
+    the whole fleet is solved once more within fallback_time_limit_seconds
+    and that plan is returned if it serves more stops.
+
+    Args:
+        points, depot_count, demands, vehicle_capacities, vehicle_depots,
+            time_windows: As for app.routing.service.plan_fleet
+        clusters: Number of districts
+        method: "kmeans" or "sweep"
+        fallback_time_limit_seconds: Budget of the whole-fleet solve after dropped stops
+            (at most time_limit_seconds); 0 never runs it
+        solve_options: Passed on to plan_fleet (alpha, beta, time_limit_seconds, ...)
+
+    Returns:
+        The stitched plan; solve_seconds is the wall-clock time of the parallel solves
+        and the fallback, districts the number of districts actually solved
+    """
+    started = time.perf_counter()
+    clusters = max(1, min(clusters, len(vehicle_capacities), len(points) - depot_count))
+    labels, vehicle_clusters = partition_stops(
+        points, depot_count, demands, vehicle_capacities, vehicle_depots, clusters, method
+    )
+    clusters = int(labels.max()) + 1
+
+    districts = []
+    for cluster in range(clusters):
+        vehicles = [vehicle for vehicle, owner in enumerate(vehicle_clusters) if owner == cluster]
+        depots = sorted({vehicle_depots[vehicle] for vehicle in vehicles})
+        stops = [depot_count + int(index) for index in np.flatnonzero(labels == cluster)]
+        districts.append((depots + stops, len(depots), vehicles))
+
+    def solve(nodes, district_depot_count, vehicles):
+        local = {node: index for index, node in enumerate(nodes)}
+        return run_in_pool(
+            plan_fleet, [points[node] for node in nodes], district_depot_count,
+            [0.0] * district_depot_count + [demands[node] for node in nodes[district_depot_count:]],
+            [vehicle_capacities[vehicle] for vehicle in vehicles],
+            [local[vehicle_depots[vehicle]] for vehicle in vehicles],
+            time_windows={
+                local[node]: window for node, window in (time_windows or {}).items()
+                if node >= depot_count and node in local
+            },
+            **solve_options,
+        )
+
+    # Submitted together, so the districts are solved side by side
+    solutions = await asyncio.gather(*(solve(*district) for district in districts))
+
+    routes: List[VehicleRoute] = []
+    dropped: List[int] = []
+    objective = 0
+    for (nodes, district_depot_count, vehicles), solution in zip(districts, solutions):
+        if solution is None:
+            dropped.extend(nodes[district_depot_count:])
+            continue
+        objective += solution.objective
+        dropped.extend(nodes[node] for node in solution.dropped)
+        for route in solution.routes:
+            route.vehicle = vehicles[route.vehicle]
+            route.order = [nodes[node] for node in route.order]
+            routes.append(route)
+    routes.sort(key=lambda route: route.vehicle)
+    stitched = FleetSolution(
+        routes=routes,
+        dropped=sorted(dropped),
+        total_distance_km=sum(route.distance_km for route in routes),
+        total_duration_min=sum(route.duration_min for route in routes),
+        objective=objective,
+        solve_seconds=0.0,
+        districts=clusters,
+    )
+    # A stop that did not fit its district's trucks may still fit a truck of another district, but
+    # only if some truck has room for it; on days short of capacity the fallback is skipped
+    spare = sum(vehicle_capacities) - sum(route.load for route in routes)
+    fits = stitched.dropped and spare >= min(demands[node] for node in stitched.dropped)
+    if fits and fallback_time_limit_seconds > 0:
+        options = dict(solve_options)
+        options["time_limit_seconds"] = min(
+            fallback_time_limit_seconds, options.get("time_limit_seconds", fallback_time_limit_seconds)
+        )
+        whole = await run_in_pool(
+            plan_fleet, points, depot_count, demands, vehicle_capacities, vehicle_depots,
+            time_windows=time_windows, **options,
+        )
+        if whole is not None and len(whole.dropped) < len(stitched.dropped):
+            whole.whole_fleet_fallback = True
+            stitched = whole
+    stitched.solve_seconds = time.perf_counter() - started
+    return stitched
@@ -0,0 +1,305 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import (
+    ROUTING_PLAN_MAX_ENTRIES, ROUTING_REOPTIMIZE_INTERVAL_SECONDS, ROUTING_REPAIR_MAX_CHANGE_RATIO,
+    ROUTING_REPAIR_TIME_LIMIT_SECONDS
+)
+from app.metrics import route_solve_seconds
+from app.routing.matrix_cache import location_key
+from app.routing.providers import Point
+from app.routing.service import build_matrices, extend_matrices, run_in_pool
+from app.routing.solver import (
+    RouteSolution, cheapest_insertion, path_length, solve_tsp, tour_objective, weighted_cost_matrix
+)
+
+# (depot location, vehicle, occupancy threshold, due within hours, alpha, beta)
+PlanKey = Tuple[str, str, Optional[float], Optional[float], float, float]
+
+def plan_key(
+    depot: Point, vehicle_id: str, occupancy_threshold: Optional[float], due_within_hours: Optional[float],
+    alpha: float, beta: float
+) -> PlanKey:
+    """Key of the stored plan for a depot, vehicle and the parameters that define its stops and costs."""
+    return (location_key(depot), vehicle_id, occupancy_threshold, due_within_hours, alpha, beta)
+
+@dataclass
+class StoredPlan:
+    """
+    The last tour solved for one plan key.
+
+    Node 0 of the matrices is the depot and node i is the container
+    container_ids[i - 1] at points[i], labelled container_codes[id]. version grows with every change of the
+    tour; repaired is set while the tour holds incremental repairs that no
+    full solve has revisited yet.
+
+    plan_id is random and kept while the key stays in the store; a key
+    planned again after eviction or a restart gets a new one. solve_id is
+    new for every tour, so it never repeats even where versions do.
+    """
+    plan_id: str
+    version: int
+    points: List[Point]
+    container_ids: List[int]
+    container_codes: Dict[int, str]
+    distance_matrix: np.ndarray
+    duration_matrix: np.ndarray
+    alpha: float
+    beta: float
+    solution: RouteSolution
+    metaheuristic: str
+    time_limit_seconds: float
+    repaired: bool
+    updated_at: float
+    solve_id: str
+
+def changed_stops(plan: StoredPlan, points: Sequence[Point], container_ids: Sequence[int]) -> int:
+    """Number of stops to remove from and insert into plan to visit container_ids at points[1:]."""
+    previous = {
+        container_id: location_key(point) for container_id, point in zip(plan.container_ids, plan.points[1:])
+    }
+    kept = sum(
+        1 for container_id, point in zip(container_ids, points[1:])
+        if previous.get(container_id) == location_key(point)
+    )
+    return (len(previous) - kept) + (len(container_ids) - kept)
+
+def repair_tour(
+    plan: StoredPlan, points: Sequence[Point], container_ids: Sequence[int], alpha: float, beta: float
+) -> Tuple[List[Point], List[int], np.ndarray, np.ndarray, np.ndarray, List[int]]:
+    """
+    Patch a stored tour to visit a new set of containers.
+
+    Containers that left the set (or moved) are cut out of the tour, keeping
+    the order of the others, and new ones are added by cheapest insertion.
+    The matrices are reused for the kept stops; only rows and columns of the
+    new ones are fetched.
+
+    Args:
+        plan: Plan to repair
+        points: (lat, lon) of the depot followed by the containers to visit
+        container_ids: IDs of the containers at points[1:]
+        alpha, beta: Weights of distance and duration in the arc cost
+
+    Returns:
+        (points, container_ids, distance, duration, cost, order) of the repaired tour
+    """
+    current = {container_id: point for container_id, point in zip(container_ids, points[1:])}
+    kept_nodes = [0] + [
+        node for node, container_id in enumerate(plan.container_ids, start=1)
+        if container_id in current and location_key(current[container_id]) == location_key(plan.points[node])
+    ]
+    kept_ids = [plan.container_ids[node - 1] for node in kept_nodes[1:]]
+    kept = set(kept_ids)
+    added_ids = [container_id for container_id in container_ids if container_id not in kept]
+    new_points = [plan.points[node] for node in kept_nodes] + [current[container_id] for container_id in added_ids]
+
+    grid = np.ix_(kept_nodes, kept_nodes)
+    distance, duration = extend_matrices(plan.distance_matrix[grid], plan.duration_matrix[grid], new_points)
+    cost = weighted_cost_matrix(distance, duration, alpha, beta)
+
+    renumbered = {node: index for index, node in enumerate(kept_nodes)}
+    order = [renumbered[node] for node in plan.solution.order if node in renumbered]
+    for node in range(len(kept_nodes), len(new_points)):
+        order = cheapest_insertion(cost, order, node)
+    return new_points, kept_ids + added_ids, distance, duration, cost, order
+
+class RoutePlanStore:
+    """
+    The last solved tour per depot, vehicle and parameters, kept up to date incrementally.
+
+    Planning again with the same key compares the containers to visit with
+    the stored tour. Unchanged sets return the stored tour without solving;
+    when at most max_change_ratio of the stops changed, the tour is repaired
+    (removals cut out, cheapest insertion for new stops) and a short local
+    search is warm-started from it. Larger changes, and the first plan of a
+    key, are solved from scratch. reoptimize() re-solves repaired tours in
+    full and keeps the better one. The least recently used plan is dropped
+    beyond max_entries. The store lives in the memory of one process, so
+    with several workers a plan is only known to the one that solved it.
+
+    Args:
+        max_entries: Plans kept at most
+        max_change_ratio: Largest share of changed stops that is repaired instead of re-solved
+        repair_time_limit_seconds: Local search budget after a repair; 0 skips the search
+    """
+
+    def __init__(
+        self, max_entries: int = 16, max_change_ratio: float = 0.25, repair_time_limit_seconds: float = 0.05
+    ):
+        self.max_entries = max_entries
+        self.max_change_ratio = max_change_ratio
+        self.repair_time_limit_seconds = repair_time_limit_seconds
+        self._plans: "OrderedDict[PlanKey, StoredPlan]" = OrderedDict()
+        self._locks: Dict[PlanKey, asyncio.Lock] = {}
+
+    def get(self, plan_id: str) -> Optional[StoredPlan]:
+        """Return the stored plan with this ID, or None."""
+        for plan in self._plans.values():
+            if plan.plan_id == plan_id:
+                return plan
+        return None
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def clear(self):
+        self._plans.clear()
+
+    def _lock(self, key: PlanKey) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def _store(self, key: PlanKey, plan: StoredPlan):
+        self._plans[key] = plan
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.max_entries:
+            evicted, _ = self._plans.popitem(last=False)
+            self._locks.pop(evicted, None)
+
+    async def plan(
+        self,
+        key: PlanKey,
+        points: Sequence[Point],
+        container_ids: Sequence[int],
+        time_limit_seconds: float,
+        metaheuristic: str = "automatic",
+        reoptimize: bool = False,
+        container_codes: Optional[Dict[int, str]] = None,
+    ) -> Tuple[Optional[StoredPlan], str]:
+        """
+        Return the tour for key visiting container_ids, reusing the stored one where possible.
+
+        Args:
+            key: Plan key from plan_key()
+            points: (lat, lon) of the depot followed by the containers to visit
+            container_ids: IDs of the containers at points[1:]
+            time_limit_seconds: Budget of a full solve
+            metaheuristic: Local search strategy of a full solve
+            reoptimize: Solve from scratch even if the stored tour could be reused
+            container_codes: Code of each container, kept for rendering the plan
+
+        Returns:
+            (plan, mode) where mode is "unchanged", "incremental" or "full";
+            plan is None when the solver found no tour
+        """
+        alpha, beta = key[4], key[5]
+        async with self._lock(key):
+            stored = self._plans.get(key)
+            mode = "full"
+            if stored is not None and not reoptimize:
+                changes = changed_stops(stored, points, container_ids)
+                if changes == 0:
+                    self._plans.move_to_end(key)
+                    return stored, "unchanged"
+                if changes <= self.max_change_ratio * max(len(stored.container_ids), 1):
+                    mode = "incremental"
+
+            if mode == "incremental":
+                points, container_ids, distance, duration, cost, order = await run_in_threadpool(
+                    repair_tour, stored, points, container_ids, alpha, beta
+                )
+                solution = await self._search(cost, distance, duration, order)
+            else:
+                distance, duration = await run_in_threadpool(build_matrices, points)
+                cost = weighted_cost_matrix(distance, duration, alpha, beta)
+                solution = await run_in_pool(solve_tsp, cost, distance, duration, time_limit_seconds, metaheuristic)
+            if solution is None:
+                return None, mode
+
+            plan = StoredPlan(
+                plan_id=stored.plan_id if stored is not None else uuid.uuid4().hex[:12],
+                version=stored.version + 1 if stored is not None else 1,
+                points=list(points),
+                container_ids=list(container_ids),
+                container_codes={
+                    container_id: (container_codes or {}).get(container_id, "") for container_id in container_ids
+                },
+                distance_matrix=distance,
+                duration_matrix=duration,
+                alpha=alpha,
+                beta=beta,
+                solution=solution,
+                metaheuristic=metaheuristic,
+                time_limit_seconds=time_limit_seconds,
+                repaired=mode == "incremental",
+                updated_at=time.time(),
+                solve_id=uuid.uuid4().hex,
+            )
+            self._store(key, plan)
+            return plan, mode
+
+    async def _search(self, cost, distance, duration, order) -> Optional[RouteSolution]:
+        """Improve a repaired tour with a short greedy local search started from it."""
+        if self.repair_time_limit_seconds <= 0:
+            return RouteSolution(
+                order=order,
+                total_distance_km=path_length(distance, order),
+                total_duration_min=path_length(duration, order),
+                objective=tour_objective(cost, order),
+                solve_seconds=0.0,
+            )
+        return await run_in_pool(
+            solve_tsp, cost, distance, duration, self.repair_time_limit_seconds, "greedy_descent",
+            initial_order=order
+        )
+
+    async def reoptimize(self) -> int:
+        """
+        Solve every repaired tour from scratch and keep the result when it is cheaper.
+
+        Plans that change while being re-solved keep their newer tour and are
+        picked up again by the next call.
+
+        Returns:
+            Number of tours that were improved
+        """
+        improved = 0
+        for key, plan in list(self._plans.items()):
+            if not plan.repaired:
+                continue
+            cost = weighted_cost_matrix(plan.distance_matrix, plan.duration_matrix, plan.alpha, plan.beta)
+            solution = await run_in_pool(
+                solve_tsp, cost, plan.distance_matrix, plan.duration_matrix, plan.time_limit_seconds, plan.metaheuristic
+            )
+            if solution is not None:
+                route_solve_seconds.labels("reoptimize").observe(solution.solve_seconds)
+            async with self._lock(key):
+                if self._plans.get(key) is not plan:
+                    continue
+                if solution is not None and solution.objective < plan.solution.objective:
+                    self._plans[key] = replace(
+                        plan, version=plan.version + 1, solution=solution, repaired=False, updated_at=time.time(),
+                        solve_id=uuid.uuid4().hex,
+                    )
+                    improved += 1
+                else:
+                    plan.repaired = False
+        return improved
+
+# Plans of this process
+route_plans = RoutePlanStore(
+    max_entries=ROUTING_PLAN_MAX_ENTRIES,
+    max_change_ratio=ROUTING_REPAIR_MAX_CHANGE_RATIO,
+    repair_time_limit_seconds=ROUTING_REPAIR_TIME_LIMIT_SECONDS,
+)
+
+async def reoptimize_plans_periodically(interval: float = ROUTING_REOPTIMIZE_INTERVAL_SECONDS):
+    """Re-solve repaired route plans in full every interval seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            improved = await route_plans.reoptimize()
+            if improved:
+                print(f"Route plans re-optimized: {improved} improved")
+        except Exception as e:
+            print(f"Error re-optimizing route plans: {str(e)}")
@@ -0,0 +1,178 @@
+import json
+import time
+from typing import Sequence, Tuple
+from urllib.request import urlopen
+
+import numpy as np
+
+from app.spatial import EARTH_RADIUS_M
+
+# Cost used for pairs the provider could not route
+UNREACHABLE = 99999.0
+
+Point = Tuple[float, float]
+
+class MatrixProvider:
+    """
+    Source of travel distance and duration between locations.
+
+    Subclasses implement rect(), returning two matrices with one row per
+    origin and one column per destination: distances in kilometers and
+    durations in minutes.
+    """
+
+    name = "base"
+    # Whether results depend on the time of day (live traffic)
+    time_dependent = False
+
+    def rect(self, origins: Sequence[Point], destinations: Sequence[Point]) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    def matrices(self, points: Sequence[Point]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the square distance and duration matrices between all points."""
+        return self.rect(points, points)
+
+class HaversineProvider(MatrixProvider):
+    """
+    Offline provider estimating road travel from great-circle distance.
+
+    Distances are scaled by a detour factor and durations assume a constant
+    average speed, which is good enough for tests and rough plans.
+    """
+
+    name = "haversine"
+
+    def __init__(self, detour_factor: float = 1.3, speed_kmh: float = 25.0):
+        self.detour_factor = detour_factor
+        self.speed_kmh = speed_kmh
+
+    def rect(self, origins: Sequence[Point], destinations: Sequence[Point]) -> Tuple[np.ndarray, np.ndarray]:
+        origin_coords = np.radians(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+        destination_coords = np.radians(np.asarray(destinations, dtype=np.float64).reshape(-1, 2))
+        lat1 = origin_coords[:, 0][:, None]
+        lon1 = origin_coords[:, 1][:, None]
+        lat2 = destination_coords[:, 0][None, :]
+        lon2 = destination_coords[:, 1][None, :]
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        distance_km = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0))) / 1000 * self.detour_factor
+        duration_min = distance_km / self.speed_kmh * 60
+        return distance_km, duration_min
+
+class GoogleMapsProvider(MatrixProvider):
+    """
+    Provider using the Google Maps Distance Matrix API with live traffic.
+
+    Requests are split into blocks that respect the API limits of 25
+    origins or destinations and 100 elements per request.
+    """
+
+    name = "google"
+    time_dependent = True
+    max_side = 25
+    max_elements = 100
+
+    def __init__(self, api_key: str, request_delay_seconds: float = 0.0):
+        try:
+            import googlemaps
+        except ImportError as e:
+            raise RuntimeError("The googlemaps package is required for ROUTING_PROVIDER=google") from e
+        if not api_key:
+            raise RuntimeError("GOOGLE_MAPS_API_KEY is not set")
+        self.client = googlemaps.Client(key=api_key)
+        self.request_delay_seconds = request_delay_seconds
+
+    def rect(self, origins: Sequence[Point], destinations: Sequence[Point]) -> Tuple[np.ndarray, np.ndarray]:
+        distance_km = np.full((len(origins), len(destinations)), UNREACHABLE)
+        duration_min = np.full((len(origins), len(destinations)), UNREACHABLE)
+
+        origin_block = min(self.max_side, max(1, len(origins)))
+        destination_block = min(self.max_side, max(1, self.max_elements // origin_block))
+        for i in range(0, len(origins), origin_block):
+            for j in range(0, len(destinations), destination_block):
+                response = self.client.distance_matrix(
+                    list(origins[i:i + origin_block]),
+                    list(destinations[j:j + destination_block]),
+                    mode="driving",
+                    departure_time="now"  # live traffic
+                )
+                block_distance, block_duration = self._parse_block(response)
+                rows, columns = block_distance.shape
+                distance_km[i:i + rows, j:j + columns] = block_distance
+                duration_min[i:i + rows, j:j + columns] = block_duration
+                if self.request_delay_seconds:
+                    time.sleep(self.request_delay_seconds)
+
+        return distance_km, duration_min
+
+    @staticmethod
+    def _parse_block(response) -> Tuple[np.ndarray, np.ndarray]:
+        """Turn one Distance Matrix response into distance (km) and duration (min) arrays."""
+        elements = [row["elements"] for row in response["rows"]]
+        shape = (len(elements), len(elements[0]) if elements else 0)
+        values = np.array([
+            (element["distance"]["value"], element.get("duration_in_traffic", element["duration"])["value"])
+            if element.get("status") == "OK" else (np.nan, np.nan)
+            for row in elements for element in row
+        ], dtype=np.float64).reshape(shape + (2,))
+        distance_km = np.where(np.isnan(values[..., 0]), UNREACHABLE, values[..., 0] / 1000)
+        duration_min = np.where(np.isnan(values[..., 1]), UNREACHABLE, values[..., 1] / 60)
+        return distance_km, duration_min
+
+class OSRMProvider(MatrixProvider):
+    """
+    Provider using the table service of a self-hosted OSRM server.
+
+    Args:
+        base_url: Server URL, e.g. http://localhost:5000
+        profile: Routing profile configured on the server
+    """
+
+    name = "osrm"
+
+    def __init__(self, base_url: str, profile: str = "driving", timeout_seconds: float = 30.0):
+        if not base_url:
+            raise RuntimeError("OSRM_URL is not set")
+        self.base_url = base_url.rstrip("/")
+        self.profile = profile
+        self.timeout_seconds = timeout_seconds
+
+    def rect(self, origins: Sequence[Point], destinations: Sequence[Point]) -> Tuple[np.ndarray, np.ndarray]:
+        points = list(origins) + list(destinations)
+        coordinates = ";".join(f"{lon},{lat}" for lat, lon in points)
+        sources = ";".join(str(i) for i in range(len(origins)))
+        targets = ";".join(str(len(origins) + j) for j in range(len(destinations)))
+        url = (
+            f"{self.base_url}/table/v1/{self.profile}/{coordinates}"
+            f"?sources={sources}&destinations={targets}&annotations=distance,duration"
+        )
+        with urlopen(url, timeout=self.timeout_seconds) as response:
+            body = json.load(response)
+        if body.get("code") != "Ok":
+            raise RuntimeError(f"OSRM table request failed: {body.get('message', body.get('code'))}")
+
+        # OSRM returns null for unroutable pairs
+        distance_m = np.array(body["distances"], dtype=np.float64)
+        duration_s = np.array(body["durations"], dtype=np.float64)
+        distance_km = np.where(np.isnan(distance_m), UNREACHABLE, distance_m / 1000)
+        duration_min = np.where(np.isnan(duration_s), UNREACHABLE, duration_s / 60)
+        return distance_km, duration_min
+
+def get_provider(name: str, api_key: str = "", osrm_url: str = "") -> MatrixProvider:
+    """
+    Create a matrix provider by name.
+
+    Args:
+        name: "google", "osrm" or "haversine"
+        api_key: Google Maps API key, required for "google"
+        osrm_url: OSRM server URL, required for "osrm"
+
+    Returns:
+        The provider instance
+    """
+    if name == "google":
+        return GoogleMapsProvider(api_key)
+    if name == "osrm":
+        return OSRMProvider(osrm_url)
+    if name == "haversine":
+        return HaversineProvider()
+    raise ValueError(f"Unknown routing provider '{name}'")
@@ -0,0 +1,183 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import (
+    GOOGLE_MAPS_API_KEY, OSRM_URL, ROUTING_PROVIDER, ROUTING_WORKERS,
+    ROUTING_MATRIX_CACHE_DIR, ROUTING_MATRIX_TTL_SECONDS, ROUTING_MATRIX_BUCKET_MINUTES, ROUTING_MATRIX_MAX_LOCATIONS
+)
+from app.routing.matrix_cache import MatrixCache
+from app.routing.providers import MatrixProvider, Point, get_provider
+from app.routing.solver import FleetSolution, RouteSolution, solve_cvrp, solve_tsp, weighted_cost_matrix
+
+# Solver processes, created on first use
+_pool: Optional[ProcessPoolExecutor] = None
+
+# Matrix cache of this process, created on first use
+_matrix_cache: Optional[MatrixCache] = None
+
+def get_matrix_cache() -> Optional[MatrixCache]:
+    """Return the persistent matrix cache, or None when ROUTING_MATRIX_CACHE_DIR is empty."""
+    global _matrix_cache
+    if _matrix_cache is None and ROUTING_MATRIX_CACHE_DIR:
+        _matrix_cache = MatrixCache(
+            ROUTING_MATRIX_CACHE_DIR,
+            ttl_seconds=ROUTING_MATRIX_TTL_SECONDS,
+            bucket_minutes=ROUTING_MATRIX_BUCKET_MINUTES,
+            max_locations=ROUTING_MATRIX_MAX_LOCATIONS,
+        )
+    return _matrix_cache
+
+def build_matrices(
+    points: Sequence[Point], provider: Optional[MatrixProvider] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the distance (km) and duration (min) matrices between points.
+
+    Pairs are served from the persistent matrix cache when it is enabled, so
+    only new or expired pairs reach the provider.
+
+    Args:
+        points: (lat, lon) locations
+        provider: Matrix provider; the configured ROUTING_PROVIDER when None
+    """
+    if provider is None:
+        provider = get_provider(ROUTING_PROVIDER, GOOGLE_MAPS_API_KEY, OSRM_URL)
+    cache = get_matrix_cache()
+    if cache is None:
+        return provider.matrices(points)
+    return cache.matrices(provider, points)
+
+def extend_matrices(
+    distance_matrix: np.ndarray, duration_matrix: np.ndarray, points: Sequence[Point],
+    provider: Optional[MatrixProvider] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Grow known matrices to cover points appended after the ones they hold.
+
+    The first len(distance_matrix) points must be the ones the matrices were
+    built for. Only the new rows and columns are requested: from the
+    persistent matrix cache when it is enabled, which fetches what it lacks,
+    else straight from the provider.
+
+    Args:
+        distance_matrix: Distances (km) between the known points
+        duration_matrix: Durations (min) between the known points
+        points: (lat, lon) of the known points followed by the new ones
+        provider: Matrix provider; the configured ROUTING_PROVIDER when None
+    """
+    known = len(distance_matrix)
+    if known == len(points):
+        return distance_matrix, duration_matrix
+    if provider is None:
+        provider = get_provider(ROUTING_PROVIDER, GOOGLE_MAPS_API_KEY, OSRM_URL)
+    cache = get_matrix_cache()
+    if cache is not None:
+        return cache.matrices(provider, points)
+
+    size = len(points)
+    distance = np.zeros((size, size))
+    duration = np.zeros((size, size))
+    distance[:known, :known] = distance_matrix
+    duration[:known, :known] = duration_matrix
+    distance[known:, :], duration[known:, :] = provider.rect(points[known:], points)
+    if known:
+        distance[:known, known:], duration[:known, known:] = provider.rect(points[:known], points[known:])
+    np.fill_diagonal(distance, 0.0)
+    np.fill_diagonal(duration, 0.0)
+    return distance, duration
+
+def plan_route(
+    points: Sequence[Point],
+    alpha: float = 0.7,
+    beta: float = 0.3,
+    time_limit_seconds: float = 2.0,
+    metaheuristic: str = "automatic",
+    provider: Optional[MatrixProvider] = None,
+) -> Optional[RouteSolution]:
+    """
+    Build the cost matrix for points and solve the tour.
+
+    Args:
+        points: (lat, lon) of the depot followed by the stops
+        alpha: Weight of distance (km) in the arc cost
+        beta: Weight of traffic duration (min) in the arc cost
+        time_limit_seconds: Solver time budget
+        metaheuristic: Local search strategy, see app.routing.solver.METAHEURISTICS
+        provider: Matrix provider; the configured ROUTING_PROVIDER when None
+
+    Returns:
+        The solved tour over indices into points, or None if none was found
+    """
+    distance_matrix, duration_matrix = build_matrices(points, provider)
+    cost_matrix = weighted_cost_matrix(distance_matrix, duration_matrix, alpha, beta)
+    return solve_tsp(cost_matrix, distance_matrix, duration_matrix, time_limit_seconds, metaheuristic)
+
+def plan_fleet(
+    points: Sequence[Point],
+    depot_count: int,
+    demands: Sequence[float],
+    vehicle_capacities: Sequence[float],
+    vehicle_depots: Sequence[int],
+    time_windows: Optional[Dict[int, Tuple[float, float]]] = None,
+    alpha: float = 0.7,
+    beta: float = 0.3,
+    service_minutes: float = 2.0,
+    shift_minutes: float = 480.0,
+    time_limit_seconds: float = 10.0,
+    metaheuristic: str = "guided_local_search",
+    provider: Optional[MatrixProvider] = None,
+) -> Optional[FleetSolution]:
+    """
+    Build the cost matrix for depots and stops and solve the capacitated fleet plan.
+
+    Args:
+        points: (lat, lon) of the depots followed by the stops
+        depot_count: Number of depots at the start of points
+        demands: Demand per point in full-container units, 0 for depots
+        vehicle_capacities: Capacity of each vehicle in full-container units
+        vehicle_depots: Depot index of each vehicle
+        time_windows: Optional {point index: (earliest, latest)} in minutes from shift start
+        alpha, beta: Weights of distance and duration in the arc cost
+        service_minutes: Time spent at each stop
+        shift_minutes: Length of the working day
+        time_limit_seconds: Solver time budget
+        metaheuristic: Local search strategy, see app.routing.solver.METAHEURISTICS
+        provider: Matrix provider; the configured ROUTING_PROVIDER when None
+
+    Returns:
+        The solved plan over indices into points, or None if none was found
+    """
+    distance_matrix, duration_matrix = build_matrices(points, provider)
+    cost_matrix = weighted_cost_matrix(distance_matrix, duration_matrix, alpha, beta)
+    return solve_cvrp(
+        cost_matrix, distance_matrix, duration_matrix, depot_count, demands,
+        vehicle_capacities, vehicle_depots, time_windows=time_windows,
+        service_minutes=service_minutes, shift_minutes=shift_minutes,
+        time_limit_seconds=time_limit_seconds, metaheuristic=metaheuristic,
+    )
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the shared solver process pool."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=ROUTING_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+async def run_in_pool(func, *args, **kwargs):
+    """Run a picklable function in the solver pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), partial(func, *args, **kwargs))
+
+def shutdown_pool():
+    """Stop the solver processes."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
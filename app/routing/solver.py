@@ -0,0 +1,314 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+
+# Local search strategies accepted by the solvers
+METAHEURISTICS = {
+    "automatic": routing_enums_pb2.LocalSearchMetaheuristic.AUTOMATIC,
+    "greedy_descent": routing_enums_pb2.LocalSearchMetaheuristic.GREEDY_DESCENT,
+    "guided_local_search": routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH,
+    "simulated_annealing": routing_enums_pb2.LocalSearchMetaheuristic.SIMULATED_ANNEALING,
+    "tabu_search": routing_enums_pb2.LocalSearchMetaheuristic.TABU_SEARCH,
+}
+
+# First solution heuristics accepted by the solvers
+FIRST_SOLUTION_STRATEGIES = {
+    "path_cheapest_arc": routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC,
+    "parallel_cheapest_insertion": routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION,
+    "savings": routing_enums_pb2.FirstSolutionStrategy.SAVINGS,
+    "christofides": routing_enums_pb2.FirstSolutionStrategy.CHRISTOFIDES,
+}
+
+@dataclass
+class RouteSolution:
+    """
+    A solved tour.
+
+    order holds node indices into the cost matrix, starting and ending at
+    the depot (node 0).
+    """
+    order: List[int]
+    total_distance_km: float
+    total_duration_min: float
+    objective: int
+    solve_seconds: float
+
+# Solver arc costs are integers; costs are scaled by this factor before rounding
+COST_SCALE = 1000
+
+def integer_matrix(matrix: np.ndarray, scale: float = COST_SCALE) -> List[List[int]]:
+    """
+    Scale and round a float matrix once for RegisterTransitMatrix.
+
+    Registering a precomputed matrix keeps arc evaluation inside OR-Tools
+    instead of calling back into Python for every arc.
+    """
+    return np.rint(np.asarray(matrix, dtype=np.float64) * scale).astype(np.int64).tolist()
+
+def path_length(matrix: np.ndarray, order: Sequence[int]) -> float:
+    """Sum matrix entries along consecutive nodes of order."""
+    nodes = np.asarray(order, dtype=np.int64)
+    return float(np.asarray(matrix)[nodes[:-1], nodes[1:]].sum())
+
+def tour_objective(cost_matrix: np.ndarray, order: Sequence[int]) -> int:
+    """Solver objective of a tour: its arc costs scaled and rounded as in integer_matrix."""
+    nodes = np.asarray(order, dtype=np.int64)
+    return int(np.rint(np.asarray(cost_matrix, dtype=np.float64)[nodes[:-1], nodes[1:]] * COST_SCALE).sum())
+
+def weighted_cost_matrix(
+    distance_matrix: np.ndarray, duration_matrix: np.ndarray, alpha: float = 0.7, beta: float = 0.3
+) -> np.ndarray:
+    """Blend distance (km) and traffic duration (min) into a single arc cost."""
+    return alpha * distance_matrix + beta * duration_matrix
+
+def search_parameters(
+    time_limit_seconds: float, metaheuristic: str = "automatic", first_solution_strategy: str = "path_cheapest_arc"
+):
+    """
+    Build OR-Tools search parameters bounded by a time budget.
+
+    Args:
+        time_limit_seconds: Maximum solve time
+        metaheuristic: Key of METAHEURISTICS
+        first_solution_strategy: Key of FIRST_SOLUTION_STRATEGIES
+
+    Returns:
+        RoutingSearchParameters
+    """
+    if metaheuristic not in METAHEURISTICS:
+        raise ValueError(f"Unknown metaheuristic '{metaheuristic}'")
+    if first_solution_strategy not in FIRST_SOLUTION_STRATEGIES:
+        raise ValueError(f"Unknown first solution strategy '{first_solution_strategy}'")
+    parameters = pywrapcp.DefaultRoutingSearchParameters()
+    parameters.first_solution_strategy = FIRST_SOLUTION_STRATEGIES[first_solution_strategy]
+    parameters.local_search_metaheuristic = METAHEURISTICS[metaheuristic]
+    parameters.time_limit.FromMilliseconds(max(1, int(time_limit_seconds * 1000)))
+    return parameters
+
+def cheapest_insertion(cost_matrix: np.ndarray, order: List[int], node: int) -> List[int]:
+    """
+    Insert node into a tour between the two consecutive stops where it adds the least cost.
+
+    Args:
+        cost_matrix: Square matrix of arc costs
+        order: Tour starting and ending at the depot
+        node: Node to insert
+
+    Returns:
+        A new tour including node
+    """
+    cost = np.asarray(cost_matrix)
+    previous = np.asarray(order[:-1], dtype=np.int64)
+    following = np.asarray(order[1:], dtype=np.int64)
+    added = cost[previous, node] + cost[node, following] - cost[previous, following]
+    position = int(np.argmin(added)) + 1
+    return order[:position] + [node] + order[position:]
+
+def solve_tsp(
+    cost_matrix: np.ndarray,
+    distance_matrix: np.ndarray,
+    duration_matrix: np.ndarray,
+    time_limit_seconds: float = 2.0,
+    metaheuristic: str = "automatic",
+    initial_order: Optional[Sequence[int]] = None,
+) -> Optional[RouteSolution]:
+    """
+    Solve a single-vehicle tour that starts and ends at node 0.
+
+    Args:
+        cost_matrix: Square matrix of arc costs
+        distance_matrix: Square matrix of distances in km, used for the totals
+        duration_matrix: Square matrix of durations in minutes, used for the totals
+        time_limit_seconds: Search time budget
+        metaheuristic: Key of METAHEURISTICS
+        initial_order: Tour over every node to start the local search from
+            (e.g. a repaired previous plan) instead of building a first solution
+
+    Returns:
+        The best tour found, or None if the solver found no solution
+    """
+    started = time.perf_counter()
+    size = len(cost_matrix)
+    if size <= 1:
+        return RouteSolution([0, 0], 0.0, 0.0, 0, 0.0)
+
+    manager = pywrapcp.RoutingIndexManager(size, 1, 0)
+    routing = pywrapcp.RoutingModel(manager)
+
+    transit_callback_index = routing.RegisterTransitMatrix(integer_matrix(cost_matrix))
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+
+    parameters = search_parameters(time_limit_seconds, metaheuristic)
+    if initial_order is None:
+        solution = routing.SolveWithParameters(parameters)
+    else:
+        routing.CloseModelWithParameters(parameters)
+        initial = routing.ReadAssignmentFromRoutes([list(initial_order[1:-1])], True)
+        if initial is None:
+            raise ValueError("initial_order is not a tour over every node")
+        solution = routing.SolveFromAssignmentWithParameters(initial, parameters)
+    if not solution:
+        return None
+
+    order = []
+    index = routing.Start(0)
+    while not routing.IsEnd(index):
+        order.append(manager.IndexToNode(index))
+        index = solution.Value(routing.NextVar(index))
+    order.append(manager.IndexToNode(index))
+
+    return RouteSolution(
+        order=order,
+        total_distance_km=path_length(distance_matrix, order),
+        total_duration_min=path_length(duration_matrix, order),
+        objective=solution.ObjectiveValue(),
+        solve_seconds=time.perf_counter() - started,
+    )
+
+# Demand units per completely full container, so occupancy ratios stay integral
+DEMAND_SCALE = 100
+
+@dataclass
+class VehicleRoute:
+    """Route of one vehicle; order holds node indices from its start depot to its end depot."""
+    vehicle: int
+    order: List[int]
+    load: float
+    distance_km: float
+    duration_min: float
+
+@dataclass
+class FleetSolution:
+    """
+    A solved multi-vehicle plan; dropped lists the stops no vehicle could serve.
+
+    districts is the number of separately solved districts the routes come
+    from (1 for a solve of the whole fleet), and whole_fleet_fallback is set
+    when a partitioned plan was replaced by a solve of the whole fleet.
+    """
+    routes: List[VehicleRoute]
+    dropped: List[int]
+    total_distance_km: float
+    total_duration_min: float
+    objective: int
+    solve_seconds: float
+    districts: int = 1
+    whole_fleet_fallback: bool = False
+
+def solve_cvrp(
+    cost_matrix: np.ndarray,
+    distance_matrix: np.ndarray,
+    duration_matrix: np.ndarray,
+    depot_count: int,
+    demands: Sequence[float],
+    vehicle_capacities: Sequence[float],
+    vehicle_depots: Sequence[int],
+    time_windows: Optional[Dict[int, Tuple[float, float]]] = None,
+    service_minutes: float = 2.0,
+    shift_minutes: float = 480.0,
+    time_limit_seconds: float = 10.0,
+    metaheuristic: str = "guided_local_search",
+    first_solution_strategy: str = "path_cheapest_arc",
+) -> Optional[FleetSolution]:
+    """
+    Solve a capacitated vehicle routing problem with optional time windows.
+
+    Nodes 0..D-1 are depots and the remaining nodes are stops. Each vehicle
+    starts and ends at its own depot. Stops that cannot be served within
+    capacity, shift length or time windows are dropped at a high penalty
+    instead of making the model infeasible.
+
+    Args:
+        cost_matrix: Square matrix of arc costs over depots and stops
+        distance_matrix: Distances in km, used for the totals
+        duration_matrix: Travel times in minutes, used for the time dimension
+        depot_count: Number of depot nodes at the start of the matrices
+        demands: Demand per node in full-container units (0 for depots), e.g. occupancy_ratio
+        vehicle_capacities: Capacity of each vehicle in full-container units
+        vehicle_depots: Depot node index of each vehicle
+        time_windows: Optional {node: (earliest, latest)} in minutes from shift start
+        service_minutes: Time spent emptying each stop
+        shift_minutes: Length of the working day, the time horizon
+        time_limit_seconds: Search time budget
+        metaheuristic: Key of METAHEURISTICS
+        first_solution_strategy: Key of FIRST_SOLUTION_STRATEGIES
+
+    Returns:
+        The best plan found, or None if the solver found no solution
+    """
+    started = time.perf_counter()
+    size = len(cost_matrix)
+    vehicle_count = len(vehicle_capacities)
+    depots = set(range(depot_count))
+    used_depots = set(vehicle_depots)
+
+    manager = pywrapcp.RoutingIndexManager(size, vehicle_count, list(vehicle_depots), list(vehicle_depots))
+    routing = pywrapcp.RoutingModel(manager)
+
+    cost_index = routing.RegisterTransitMatrix(integer_matrix(cost_matrix))
+    routing.SetArcCostEvaluatorOfAllVehicles(cost_index)
+
+    # Capacity: occupancy-weighted demand against truck capacity
+    scaled_demands = np.rint(np.asarray(demands, dtype=np.float64) * DEMAND_SCALE).astype(np.int64).tolist()
+    demand_index = routing.RegisterUnaryTransitVector(scaled_demands)
+    routing.AddDimensionWithVehicleCapacity(
+        demand_index, 0, [int(round(capacity * DEMAND_SCALE)) for capacity in vehicle_capacities], True, "Capacity"
+    )
+
+    # Time: travel plus service at the origin, in seconds, bounded by the shift
+    service_seconds = np.full(size, int(service_minutes * 60), dtype=np.int64)
+    service_seconds[:depot_count] = 0
+    time_matrix = (np.asarray(duration_matrix, dtype=np.float64) * 60).astype(np.int64) + service_seconds[:, None]
+    time_index = routing.RegisterTransitMatrix(time_matrix.tolist())
+    horizon = int(shift_minutes * 60)
+    routing.AddDimension(time_index, horizon, horizon, False, "Time")
+    time_dimension = routing.GetDimensionOrDie("Time")
+    for node, (earliest, latest) in (time_windows or {}).items():
+        if node in depots:
+            continue
+        time_dimension.CumulVar(manager.NodeToIndex(node)).SetRange(int(earliest * 60), int(latest * 60))
+
+    # Let the solver skip stops rather than fail; depots without vehicles are skipped for free
+    drop_penalty = int(max(float(np.max(cost_matrix)), 1.0) * COST_SCALE * 100)
+    for node in range(size):
+        if node in used_depots:
+            continue
+        routing.AddDisjunction([manager.NodeToIndex(node)], 0 if node in depots else drop_penalty)
+
+    parameters = search_parameters(time_limit_seconds, metaheuristic, first_solution_strategy)
+    solution = routing.SolveWithParameters(parameters)
+    if not solution:
+        return None
+
+    routes = []
+    visited = set()
+    for vehicle in range(vehicle_count):
+        order = []
+        index = routing.Start(vehicle)
+        while not routing.IsEnd(index):
+            order.append(manager.IndexToNode(index))
+            index = solution.Value(routing.NextVar(index))
+        order.append(manager.IndexToNode(index))
+        if len(order) <= 2:
+            continue
+        visited.update(order)
+        routes.append(VehicleRoute(
+            vehicle=vehicle,
+            order=order,
+            load=float(np.asarray(demands, dtype=np.float64)[order].sum()),
+            distance_km=path_length(distance_matrix, order),
+            duration_min=solution.Value(time_dimension.CumulVar(index)) / 60,
+        ))
+
+    dropped = [node for node in range(size) if node not in visited and node not in depots]
+    return FleetSolution(
+        routes=routes,
+        dropped=dropped,
+        total_distance_km=sum(route.distance_km for route in routes),
+        total_duration_min=sum(route.duration_min for route in routes),
+        objective=solution.ObjectiveValue(),
+        solve_seconds=time.perf_counter() - started,
+    )
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
 
 class ContainerBase(BaseModel):
     """Base schema for Container data."""
@@ -23,9 +24,75 @@ class ContainerUpdate(BaseModel):
     occupancy_ratio: Optional[float] = None
     is_full: Optional[bool] = None
 
+class ContainerImportRow(ContainerUpdate):
+    """Schema for one row of a container import; new containers also need name, lang and long."""
+    container_code: str
+
+    @field_validator("name", "lang", "long", "occupancy_ratio", "is_full")
+    @classmethod
+    def not_null(cls, value):
+        # A column may be left out of a row, but not cleared
+        if value is None:
+            raise ValueError("may be left out but not null")
+        return value
+
 class ContainerResponse(ContainerBase):
     """Schema for container responses, includes the ID."""
     id: int
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class NearbyContainerResponse(ContainerResponse):
+    """Schema for nearby-search results, includes the distance from the search point."""
+    distance_m: float
+
+class DueContainerResponse(ContainerResponse):
+    """Schema for a container forecast to become full, with its estimated fill rate."""
+    fill_rate_per_hour: Optional[float] = None  # None when the container has no usable history
+    hours_until_full: float
+    predicted_full_at: datetime  # UTC
+
+class ContainerReading(BaseModel):
+    """Schema for one fill-level reading reported by a container sensor."""
+    container_code: str
+    occupancy_ratio: float = Field(ge=0.0, le=1.0)
+    ts: datetime
+
+class ReadingBatchResponse(BaseModel):
+    """Schema for the outcome of a batch of sensor readings."""
+    received: int
+    applied: int
+    duplicates: int  # Exact repeats of another reading in the batch (same container and ts)
+    stale: int  # Readings older than the stored one or than a newer one in the batch
+    unknown_codes: List[str]
+
+class ImportRowError(BaseModel):
+    """Schema for a rejected row of a container import."""
+    line: int  # Line of a CSV/NDJSON file, row number of a Parquet file
+    error: str
+
+class ContainerImportResponse(BaseModel):
+    """Schema for the outcome of a container import."""
+    received: int
+    inserted: int
+    updated: int
+    skipped: int  # Existing containers left alone with skip_existing
+    rejected: int
+    errors: List[ImportRowError]  # The first rejected rows
+    error: Optional[str] = None  # Why the file could not be read to the end
+
+class HistoryPoint(BaseModel):
+    """Schema for one bucket of a container's occupancy history."""
+    ts: datetime  # Bucket start (UTC)
+    avg: float
+    min: float
+    max: float
+    count: int
+
+class ContainerHistoryResponse(BaseModel):
+    """Schema for a container's occupancy history."""
+    container_id: int
+    step: str
+    source: str  # "raw", "hour" or "day": the table the points were computed from
+    points: List[HistoryPoint]
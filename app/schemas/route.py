@@ -0,0 +1,102 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+
+class Location(BaseModel):
+    """A coordinate in degrees."""
+    lat: float = Field(..., ge=-90.0, le=90.0)
+    lon: float = Field(..., ge=-180.0, le=180.0)
+
+class RoutePlanRequest(BaseModel):
+    """Schema for planning a collection route."""
+    depot: Optional[Location] = None
+    occupancy_threshold: Optional[float] = Field(
+        None, ge=0.0, le=1.0,
+        description="Collect containers at or above this occupancy; uses is_full when omitted"
+    )
+    due_within_hours: Optional[float] = Field(
+        None, gt=0.0, le=8760.0,
+        description="Collect containers forecast to reach the threshold within this many hours"
+    )
+    time_limit_seconds: Optional[float] = Field(None, gt=0.0)
+    alpha: float = Field(0.7, ge=0.0, description="Weight of distance (km) in the arc cost")
+    beta: float = Field(0.3, ge=0.0, description="Weight of traffic duration (min) in the arc cost")
+    metaheuristic: Literal[
+        "automatic", "greedy_descent", "guided_local_search", "simulated_annealing", "tabu_search"
+    ] = "automatic"
+    vehicle_id: str = Field("default", max_length=64, description="Keeps a separate stored plan per vehicle")
+    reoptimize: bool = Field(False, description="Solve from scratch instead of updating the stored plan")
+
+class RouteStop(BaseModel):
+    """A stop on a planned route; the depot has no container_id."""
+    sequence: int
+    container_id: Optional[int] = None
+    container_code: str
+    lat: float
+    lon: float
+
+class RoutePlanResponse(BaseModel):
+    """Schema for a planned route."""
+    plan_id: str
+    version: int
+    mode: Literal["full", "incremental", "unchanged"] = Field(
+        ..., description="How this version was produced: solved from scratch, repaired, or reused as is"
+    )
+    stops: List[RouteStop]
+    total_distance_km: float
+    total_duration_min: float
+    solve_seconds: float
+    provider: str
+
+class Vehicle(BaseModel):
+    """A truck in the fleet."""
+    capacity: float = Field(..., gt=0.0, description="Capacity in full containers")
+    depot_index: int = Field(0, ge=0, description="Index into the request's depots")
+
+class TimeWindow(BaseModel):
+    """Allowed service window in minutes from the start of the shift."""
+    start_min: float = Field(..., ge=0.0)
+    end_min: float = Field(..., ge=0.0)
+
+class FleetPlanRequest(BaseModel):
+    """Schema for planning routes for a fleet of capacitated trucks."""
+    depots: List[Location] = Field(default_factory=list, description="Defaults to the configured depot")
+    vehicles: List[Vehicle] = Field(..., min_length=1)
+    occupancy_threshold: Optional[float] = Field(
+        None, ge=0.0, le=1.0,
+        description="Collect containers at or above this occupancy; uses is_full when omitted"
+    )
+    due_within_hours: Optional[float] = Field(
+        None, gt=0.0, le=8760.0,
+        description="Collect containers forecast to reach the threshold within this many hours"
+    )
+    time_windows: Dict[int, TimeWindow] = Field(default_factory=dict, description="Keyed by container ID")
+    service_minutes: float = Field(2.0, ge=0.0)
+    shift_minutes: float = Field(480.0, gt=0.0)
+    time_limit_seconds: Optional[float] = Field(None, gt=0.0)
+    alpha: float = Field(0.7, ge=0.0)
+    beta: float = Field(0.3, ge=0.0)
+    partition: Literal["auto", "none", "kmeans", "sweep"] = Field(
+        "auto", description="Split the stops into districts solved in parallel; auto does so for large plans"
+    )
+    clusters: Optional[int] = Field(None, ge=2, le=256, description="Number of districts when partitioning")
+
+class VehiclePlan(BaseModel):
+    """Route of one vehicle in a fleet plan."""
+    vehicle: int
+    stops: List[RouteStop]
+    load: float
+    distance_km: float
+    duration_min: float
+
+class FleetPlanResponse(BaseModel):
+    """Schema for a planned fleet day."""
+    vehicles: List[VehiclePlan]
+    unassigned_container_ids: List[int]
+    clusters: int = Field(..., description="Districts the routes were solved in, 1 when not partitioned")
+    whole_fleet_fallback: bool = Field(
+        False, description="The districts dropped containers and a solve of the whole fleet served more"
+    )
+    total_distance_km: float
+    total_duration_min: float
+    solve_seconds: float
+    provider: str
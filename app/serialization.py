@@ -0,0 +1,45 @@
+from typing import Any, Iterable, Iterator, Sequence, Tuple
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Used when orjson is missing: pydantic-core's serializer, still much cheaper than jsonable_encoder
+_fallback_adapter = TypeAdapter(Any)
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode plain data (dicts, lists, numbers, strings, datetimes) to JSON bytes.
+
+    Nothing is validated: callers pass rows already shaped like the response
+    schema, e.g. column tuples zipped with the schema's field names.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return _fallback_adapter.dump_json(content)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with dumps instead of json.dumps."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def json_array_chunks(batches: Iterable[Sequence[Tuple[Any, ...]]], fields: Sequence[str]) -> Iterator[bytes]:
+    """Encode batches of row tuples as one JSON array of objects, yielding one chunk per batch."""
+    yield b"["
+    separator = b""
+    for batch in batches:
+        if batch:
+            yield separator + dumps([dict(zip(fields, row)) for row in batch])[1:-1]
+            separator = b","
+    yield b"]"
+
+def ndjson_chunks(batches: Iterable[Sequence[Tuple[Any, ...]]], fields: Sequence[str]) -> Iterator[bytes]:
+    """Encode batches of row tuples as newline-delimited JSON objects, yielding one chunk per batch."""
+    for batch in batches:
+        if batch:
+            yield b"\n".join(dumps(dict(zip(fields, row))) for row in batch) + b"\n"
@@ -0,0 +1,291 @@
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import SPATIAL_GRID_TTL_SECONDS
+
+# Geohash alphabet (base32 without a, i, l, o)
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Precision of the stored geohash column, about 4.8 m x 4.8 m cells
+GEOHASH_PRECISION = 9
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """
+    Encode a coordinate as a geohash string.
+
+    Args:
+        lat: Latitude in degrees
+        lon: Longitude in degrees
+        precision: Number of characters
+
+    Returns:
+        The geohash of the cell containing the point
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """Return the (lat, lon) size in degrees of a geohash cell at a precision."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+def geohash_range(prefix: str, precision: int = GEOHASH_PRECISION) -> Tuple[str, str]:
+    """
+    Return the inclusive bounds of all stored geohashes starting with prefix.
+
+    Comparing with BETWEEN instead of LIKE lets a plain B-tree index serve
+    the lookup under any collation.
+    """
+    return prefix, prefix + GEOHASH_ALPHABET[-1] * (precision - len(prefix))
+
+def _meters_to_degrees(lat: float, meters: float) -> Tuple[float, float]:
+    """Convert a distance in meters to (lat, lon) degree offsets around a latitude."""
+    lat_deg = meters / METERS_PER_DEGREE
+    lon_deg = meters / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat_deg, lon_deg
+
+def geohash_cover(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float, max_cells: int = 32
+) -> List[str]:
+    """
+    Cover a bounding box with geohash prefixes.
+
+    The finest precision needing at most max_cells cells is used, so the
+    cover over-selects by at most one cell on each side.
+
+    Returns:
+        Distinct geohash prefixes whose cells together contain the box
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lon = geohash_cell_size(precision)
+        rows = math.floor(max_lat / cell_lat) - math.floor(min_lat / cell_lat) + 1
+        cols = math.floor(max_lon / cell_lon) - math.floor(min_lon / cell_lon) + 1
+        if rows * cols <= max_cells or precision == 1:
+            break
+    cells = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            cells.add(geohash_encode(min(lat, max_lat), min(lon, max_lon), precision))
+            if lon >= max_lon:
+                break
+            lon += cell_lon
+        if lat >= max_lat:
+            break
+        lat += cell_lat
+    return sorted(cells)
+
+def radius_cover(lat: float, lon: float, radius_m: float) -> List[str]:
+    """Cover the circle of radius_m around a point with geohash prefixes."""
+    lat_deg, lon_deg = _meters_to_degrees(lat, radius_m)
+    return geohash_cover(
+        max(lat - lat_deg, -90.0), max(lon - lon_deg, -180.0),
+        min(lat + lat_deg, 90.0), min(lon + lon_deg, 180.0),
+        max_cells=9
+    )
+
+def haversine_m(lat: float, lon: float, lats, lons):
+    """
+    Great-circle distance in meters from one point to many.
+
+    Args:
+        lat, lon: Origin in degrees
+        lats, lons: Scalars or NumPy arrays of destinations in degrees
+
+    Returns:
+        Distances in meters, with the shape of lats
+    """
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - np.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class SpatialGrid:
+    """
+    In-memory uniform grid over container coordinates.
+
+    Points are bucketed into square cells sized so that each holds a handful
+    of points on average; radius and k-nearest queries only scan the cells
+    overlapping the search circle.
+    """
+
+    def __init__(self, ids: Sequence[int], lats: Sequence[float], lons: Sequence[float], points_per_cell: int = 16):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cells: Dict[Tuple[int, int], np.ndarray] = {}
+        self.cell_deg = 0.01
+        if len(self.ids) == 0:
+            return
+
+        # Size cells from the data extent so density stays roughly constant
+        extent = max(np.ptp(self.lats), np.ptp(self.lons), 1e-6)
+        cells_per_side = max(1, int(math.sqrt(len(self.ids) / points_per_cell)))
+        self.cell_deg = extent / cells_per_side
+
+        rows = np.floor(self.lats / self.cell_deg).astype(np.int64)
+        cols = np.floor(self.lons / self.cell_deg).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        keys = np.stack((rows[order], cols[order]), axis=1)
+        boundaries = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        for chunk in np.split(order, boundaries):
+            first = chunk[0]
+            self.cells[(int(rows[first]), int(cols[first]))] = chunk
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _candidates(self, lat: float, lon: float, radius_m: float) -> np.ndarray:
+        """Indices of points in the cells overlapping the search circle."""
+        lat_deg, lon_deg = _meters_to_degrees(lat, radius_m)
+        row_lo = math.floor((lat - lat_deg) / self.cell_deg)
+        row_hi = math.floor((lat + lat_deg) / self.cell_deg)
+        col_lo = math.floor((lon - lon_deg) / self.cell_deg)
+        col_hi = math.floor((lon + lon_deg) / self.cell_deg)
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self.cells):
+            # The circle spans more cells than exist, scan the occupied ones
+            chunks = [
+                chunk for (row, col), chunk in self.cells.items()
+                if row_lo <= row <= row_hi and col_lo <= col <= col_hi
+            ]
+        else:
+            chunks = [
+                self.cells[(row, col)]
+                for row in range(row_lo, row_hi + 1)
+                for col in range(col_lo, col_hi + 1)
+                if (row, col) in self.cells
+            ]
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def within(self, lat: float, lon: float, radius_m: float, k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Find points within radius_m of a location, nearest first.
+
+        Args:
+            lat, lon: Search origin in degrees
+            radius_m: Search radius in meters
+            k: Return at most this many points
+
+        Returns:
+            List of (container id, distance in meters)
+        """
+        candidates = self._candidates(lat, lon, radius_m)
+        if len(candidates) == 0:
+            return []
+        distances = haversine_m(lat, lon, self.lats[candidates], self.lons[candidates])
+        mask = distances <= radius_m
+        candidates = candidates[mask]
+        distances = distances[mask]
+        if k is not None and len(distances) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+            candidates = candidates[nearest]
+            distances = distances[nearest]
+        order = np.argsort(distances, kind="stable")
+        return [(int(self.ids[i]), float(d)) for i, d in zip(candidates[order], distances[order])]
+
+    def nearest(self, lat: float, lon: float, k: int, radius_m: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Find the k nearest points, optionally limited to radius_m.
+
+        The search radius starts at about one cell and doubles until k points
+        are found, the radius limit is reached or the whole grid was covered.
+        """
+        if len(self.ids) == 0:
+            return []
+        if radius_m is not None:
+            return self.within(lat, lon, radius_m, k)
+        search_m = self.cell_deg * METERS_PER_DEGREE
+        max_m = math.pi * EARTH_RADIUS_M
+        while True:
+            found = self.within(lat, lon, search_m, k)
+            if len(found) >= k or search_m >= max_m:
+                return found
+            search_m *= 2
+
+    def in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> np.ndarray:
+        """Return the IDs of points inside a bounding box, in ID order."""
+        mask = (
+            (self.lats >= min_lat) & (self.lats <= max_lat)
+            & (self.lons >= min_lon) & (self.lons <= max_lon)
+        )
+        return np.sort(self.ids[mask])
+
+class SpatialGridCache:
+    """
+    Lazily rebuilt SpatialGrid shared by all requests of a worker.
+
+    The grid is rebuilt from the database when it was invalidated by a
+    coordinate write in this process, or after ttl seconds to pick up
+    writes made by other workers.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._grid: Optional[SpatialGrid] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Force a rebuild on the next lookup."""
+        self._grid = None
+
+    def get(self, loader) -> SpatialGrid:
+        """
+        Return the current grid, rebuilding it with loader when stale.
+
+        Args:
+            loader: Callable returning (ids, lats, lons) sequences
+        """
+        grid = self._grid
+        if grid is not None and time.monotonic() - self._built_at < self.ttl:
+            return grid
+        with self._lock:
+            if self._grid is None or time.monotonic() - self._built_at >= self.ttl:
+                ids, lats, lons = loader()
+                self._grid = SpatialGrid(ids, lats, lons)
+                self._built_at = time.monotonic()
+            return self._grid
+
+# Grid cache used for the SQLite stand-in (see SPATIAL_INDEX in app.config)
+spatial_grid_cache = SpatialGridCache(ttl=SPATIAL_GRID_TTL_SECONDS)
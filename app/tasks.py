@@ -1,41 +1,252 @@
 import asyncio
+import os
 import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from app.db import get_containers, update_container
-from app.schemas.container import ContainerUpdate
+from sqlalchemy.pool import NullPool
+from app.config import (
+    FORECAST_SYNC_INTERVAL_SECONDS, FULL_THRESHOLD, HISTORY_COMPACT_INTERVAL_SECONDS, REFRESH_INTERVAL_SECONDS,
+    REFRESH_LOCK_KEY, REFRESH_LOCK_DB_URL, DB_POOL_PROFILE
+)
+from app.database import SessionLocal, engine
+from app.db import compact_history, get_container_ids, bulk_update_container_occupancy, sync_forecaster
+from app.routing.service import get_matrix_cache
+from app.metrics import refresh_cycle_seconds, refresh_lag_seconds, refresh_last_run_seconds, refresh_updated_containers
 
-async def update_containers_randomly():
-    """Update all containers except Kon1 with random values every 5 minutes."""
-    while True:
+# The refresh does blocking database I/O, so it gets its own thread instead of the event loop
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="container-refresh")
+# Forecaster syncs run on every worker, so they get a thread of their own
+_forecast_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="forecast-sync")
+
+# Held for the lifetime of the leader worker (a DB connection or a lock file)
+_leader_handle = None
+# Engine the advisory lock connection comes from, see _get_lock_engine
+_lock_engine = None
+_lock_unavailable_reported = False
+
+def refresh_containers_once() -> int:
+    """Give all containers except Kon1 a random occupancy in one transaction."""
+    db: Session = SessionLocal()
+    try:
+        container_ids = get_container_ids(db, exclude_codes=["Kon1"])
+
+        # Generate random values between 0.1 and 1.0
+        occupancy = {
+            container_id: round(random.uniform(0.1, 1.0), 2)
+            for container_id in container_ids
+        }
+        return bulk_update_container_occupancy(db, occupancy, full_threshold=FULL_THRESHOLD)
+    finally:
+        db.close()
+
+def compact_history_once() -> dict:
+    """Apply the occupancy history retention policy."""
+    db: Session = SessionLocal()
+    try:
+        return compact_history(db)
+    finally:
+        db.close()
+
+def prune_matrix_cache_once() -> int:
+    """Delete routing matrix stores whose pairs have all expired; returns how many."""
+    cache = get_matrix_cache()
+    return cache.prune() if cache is not None else 0
+
+def sync_forecaster_once():
+    """Fold the occupancy readings written since the last sync into this worker's forecaster."""
+    db: Session = SessionLocal()
+    try:
+        sync_forecaster(db)
+    finally:
+        db.close()
+
+def _leader_connection_lost() -> bool:
+    """Whether the connection holding the advisory lock has dropped (and with it the lock)."""
+    if not isinstance(_leader_handle, Connection):
+        return False
+    try:
+        _leader_handle.execute(text("SELECT 1")).scalar()
+        _leader_handle.commit()
+        return False
+    except Exception:
         try:
-            db: Session = SessionLocal()
-            containers = get_containers(db)
-            
-            for container in containers:
-                # Skip Kon1
-                if container.container_code == "Kon1":
-                    continue
-                    
-                # Generate random values
-                new_occupancy = round(random.uniform(0.1, 1.0), 2)  # Random value between 0.1 and 1.0
-                new_is_full = new_occupancy >= 0.7
-                
-                # Update container
-                update_data = ContainerUpdate(
-                    occupancy_ratio=new_occupancy,
-                    is_full=new_is_full
+            _leader_handle.invalidate()
+            _leader_handle.close()
+        except Exception:
+            pass
+        return True
+
+def _get_lock_engine():
+    """
+    Engine for the connection holding the refresh advisory lock.
+
+    With REFRESH_LOCK_DB_URL set, the lock is taken on a direct, unpooled
+    connection to that URL; otherwise the application engine is used.
+
+    Returns:
+        SQLAlchemy engine
+    """
+    global _lock_engine
+    if _lock_engine is None:
+        _lock_engine = create_engine(REFRESH_LOCK_DB_URL, poolclass=NullPool) if REFRESH_LOCK_DB_URL else engine
+    return _lock_engine
+
+def try_acquire_refresh_leadership() -> bool:
+    """
+    Try to become the single worker that runs the refresh.
+
+    On PostgreSQL this takes a session-level advisory lock on a dedicated
+    connection; elsewhere an exclusive lock on a temp file is used. The lock
+    is kept until the process exits, so another worker takes over if the
+    leader dies. The advisory lock lives only as long as its connection, so
+    a held lock is checked on every call and taken again if the connection
+    dropped. Under the serverless pool profile the application engine may
+    go through a transaction-mode pooler, where the lock could be released
+    or shared between workers, so no worker becomes leader unless
+    REFRESH_LOCK_DB_URL points at the database directly.
+
+    Returns:
+        True if this process holds the refresh lock
+    """
+    global _leader_handle, _lock_unavailable_reported
+    if _leader_handle is not None:
+        if not _leader_connection_lost():
+            return True
+        print(f"[{datetime.now()}] Refresh lock connection lost, trying to take the lock again")
+        _leader_handle = None
+
+    lock_engine = _get_lock_engine()
+    if lock_engine.dialect.name == "postgresql":
+        if lock_engine is engine and DB_POOL_PROFILE == "serverless":
+            if not _lock_unavailable_reported:
+                _lock_unavailable_reported = True
+                print(
+                    f"[{datetime.now()}] Refresh disabled: set REFRESH_LOCK_DB_URL to a direct database URL "
+                    "to take the refresh lock under DB_POOL_PROFILE=serverless"
                 )
-                update_container(db, container.id, update_data)
-                
-            print(f"[{datetime.now()}] Containers updated randomly")
-            db.close()
-            
+            return False
+        connection = lock_engine.connect()
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": REFRESH_LOCK_KEY}
+        ).scalar()
+        if acquired:
+            connection.commit()
+            _leader_handle = connection
+            return True
+        connection.close()
+        return False
+
+    try:
+        import fcntl
+    except ImportError:
+        # No advisory file locks on this platform, assume a single worker
+        _leader_handle = True
+        return True
+
+    lock_path = os.path.join(tempfile.gettempdir(), f"kmt-refresh-{REFRESH_LOCK_KEY}.lock")
+    lock_file = open(lock_path, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _leader_handle = lock_file
+    return True
+
+def _record_cycle(started: float, scheduled: float, updated: int):
+    """Record the duration and scheduling lag of a finished cycle in the refresh metrics."""
+    duration = time.monotonic() - started
+    lag = max(0.0, started - scheduled)
+    refresh_cycle_seconds.observe(duration)
+    refresh_lag_seconds.observe(lag)
+    refresh_updated_containers.set(updated)
+    refresh_last_run_seconds.set(time.time())
+    print(
+        f"[{datetime.now()}] {updated} containers updated randomly "
+        f"in {duration:.3f}s (lag {lag:.3f}s)"
+    )
+
+async def update_containers_randomly(interval: float = REFRESH_INTERVAL_SECONDS):
+    """
+    Periodically refresh container occupancy without blocking the event loop.
+
+    Only the worker holding the refresh lock runs cycles; the others retry
+    for leadership once per interval. The leader also compacts the occupancy
+    history and prunes expired routing matrix stores every
+    HISTORY_COMPACT_INTERVAL_SECONDS.
+
+    Args:
+        interval: Seconds between the start of two cycles
+    """
+    loop = asyncio.get_running_loop()
+    scheduled = time.monotonic()
+    last_compaction = None
+    while True:
+        is_leader = await loop.run_in_executor(_executor, try_acquire_refresh_leadership)
+        if is_leader:
+            started = time.monotonic()
+            try:
+                updated = await loop.run_in_executor(_executor, refresh_containers_once)
+                _record_cycle(started, scheduled, updated)
+            except Exception as e:
+                print(f"Error updating containers: {str(e)}")
+
+            if last_compaction is None or started - last_compaction >= HISTORY_COMPACT_INTERVAL_SECONDS:
+                last_compaction = started
+                try:
+                    deleted = await loop.run_in_executor(_executor, compact_history_once)
+                    print(f"[{datetime.now()}] Occupancy history compacted: {deleted}")
+                except Exception as e:
+                    print(f"Error compacting occupancy history: {str(e)}")
+                try:
+                    pruned = await loop.run_in_executor(_executor, prune_matrix_cache_once)
+                    if pruned:
+                        print(f"[{datetime.now()}] Routing matrix cache: {pruned} expired stores deleted")
+                except Exception as e:
+                    print(f"Error pruning the routing matrix cache: {str(e)}")
+
+        # Sleep until the next scheduled start, not a full interval after this cycle ended
+        scheduled += interval
+        now = time.monotonic()
+        if scheduled < now:
+            scheduled = now
+        await asyncio.sleep(scheduled - now)
+
+async def sync_forecaster_periodically(interval: float = FORECAST_SYNC_INTERVAL_SECONDS):
+    """
+    Keep this worker's fill-rate forecaster current off the request path.
+
+    The forecaster lives in each process, so unlike the refresh every
+    worker runs this loop, the first sync fitting it from the rollups.
+
+    Args:
+        interval: Seconds between two syncs
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(_forecast_executor, sync_forecaster_once)
         except Exception as e:
-            print(f"Error updating containers: {str(e)}")
-            if 'db' in locals():
-                db.close()
-                
-        # Wait for 5 minutes
-        await asyncio.sleep(300)  # 300 seconds = 5 minutes 
\ No newline at end of file
+            print(f"Error syncing the fill forecaster: {str(e)}")
+        await asyncio.sleep(interval)
+
+def shutdown():
+    """Stop the background threads and release the leader lock."""
+    global _leader_handle
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _forecast_executor.shutdown(wait=False, cancel_futures=True)
+    if _leader_handle is not None and _leader_handle is not True:
+        _leader_handle.close()
+    _leader_handle = None
+
+if __name__ == "__main__":
+    # Run the refresh as a standalone worker process (set REFRESH_ENABLED=False for the API)
+    try:
+        asyncio.run(update_containers_randomly())
+    finally:
+        shutdown()
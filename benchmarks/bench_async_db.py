@@ -0,0 +1,127 @@
+"""
+Load test concurrent request throughput with the sync and async database paths.
+
+Each mode runs in its own process against the same seeded SQLite file:
+
+- blocking:   the original handlers, sync CRUD called inside ``async def``
+- threadpool: DB_ASYNC=False, sync CRUD run in the threadpool via run_db
+- async:      DB_ASYNC=True, AsyncSession on aiosqlite
+
+With more concurrent requests than pool connections the blocking mode
+stalls: the event loop blocks waiting for a connection that can only be
+returned by a request the loop is no longer running. Such runs are reported
+as stalled after --timeout seconds.
+
+Requires httpx (and aiosqlite for the async mode).
+
+Usage:
+    python -m benchmarks.bench_async_db [--containers 1000] [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+MODES = ("blocking", "threadpool", "async")
+
+
+def build_app(mode):
+    """Return the FastAPI app for a mode (imports app modules after env is set)."""
+    if mode != "blocking":
+        from main import app
+        return app
+
+    from fastapi import Depends, FastAPI, HTTPException
+    from app.database import get_db
+    from app.db import get_container_by_code
+
+    app = FastAPI()
+
+    @app.get("/containers/code/{container_code}")
+    async def get_container_by_container_code(container_code: str, db_session=Depends(get_db)):
+        container = get_container_by_code(db_session, container_code)
+        if container is None:
+            raise HTTPException(status_code=404, detail="Container not found")
+        return {"id": container.id, "container_code": container.container_code}
+
+    return app
+
+
+async def drive(app, containers, total, concurrency):
+    """Send total get-by-code requests with the given concurrency and return req/s."""
+    import httpx
+
+    codes = [f"Kon{random.randint(1, containers)}" for _ in range(total)]
+    queue = asyncio.Queue()
+    for code in codes:
+        queue.put_nowait(code)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                code = queue.get_nowait()
+                response = await client.get(f"/containers/code/{code}")
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def run_mode(args):
+    """Child process entry point: measure one mode and print JSON."""
+    app = build_app(args.mode)
+    rps = asyncio.run(drive(app, args.containers, args.requests, args.concurrency))
+    print(json.dumps({"mode": args.mode, "requests_per_second": rps}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    from benchmarks.common import make_sessionmaker, seed
+
+    engine, Session = make_sessionmaker()
+    with Session() as db:
+        seed(db, args.containers)
+    db_path = engine.url.database
+    engine.dispose()
+
+    print(f"containers: {args.containers}, requests: {args.requests}, concurrency: {args.concurrency}")
+    for mode in MODES:
+        env = dict(
+            os.environ,
+            DB_URL=f"sqlite:///{db_path}",
+            DB_ASYNC=str(mode == "async"),
+            REFRESH_ENABLED="False",
+        )
+        try:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_async_db", "--mode", mode,
+                 "--containers", str(args.containers), "--requests", str(args.requests),
+                 "--concurrency", str(args.concurrency)],
+                env=env, check=True, capture_output=True, text=True, timeout=args.timeout,
+            ).stdout
+        except subprocess.TimeoutExpired:
+            print(f"{mode:>10}: stalled after {args.timeout:.0f} s")
+            continue
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>10}: {result['requests_per_second']:.0f} req/s")
+    os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Compare the per-row and bulk occupancy refresh paths.
+
+Usage:
+    python -m benchmarks.bench_bulk_update [--containers 10000]
+"""
+import argparse
+import random
+
+from benchmarks.common import make_sessionmaker, seed, timed
+
+from app.db import bulk_update_container_occupancy, get_container_ids, get_containers, update_container
+from app.schemas.container import ContainerUpdate
+
+
+def per_row_refresh(db, occupancy):
+    """The original refresh: one SELECT, commit and refresh per container."""
+    for container in get_containers(db):
+        ratio = occupancy[container.id]
+        update_container(db, container.id, ContainerUpdate(occupancy_ratio=ratio, is_full=ratio >= 0.7))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=10000)
+    args = parser.parse_args()
+
+    engine, Session = make_sessionmaker()
+    with Session() as db:
+        seed(db, args.containers)
+        ids = get_container_ids(db)
+        occupancy = {container_id: round(random.uniform(0.1, 1.0), 2) for container_id in ids}
+
+        _, bulk_seconds = timed(bulk_update_container_occupancy, db, occupancy)
+        _, row_seconds = timed(per_row_refresh, db, occupancy)
+
+    print(f"containers: {args.containers}")
+    print(f"per-row refresh: {row_seconds:.3f} s")
+    print(f"bulk refresh:    {bulk_seconds:.3f} s")
+    print(f"speedup:         {row_seconds / bulk_seconds:.1f}x")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
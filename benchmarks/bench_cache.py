@@ -0,0 +1,82 @@
+"""
+Benchmark single-container lookups with and without the read-through cache.
+
+Runs a skewed (hot/cold) stream of get-by-code lookups and reports, per lookup:
+
+- uncached: get_container_by_code straight from the database
+- cold:     get_cached_container_by_code starting from an empty cache
+- warm:     the same stream again with the cache populated
+
+It also runs the stream while refresh-style bulk occupancy updates
+invalidate the cache, and prints the hit/miss/eviction counters.
+
+Usage:
+    python -m benchmarks.bench_cache [--containers 10000] [--lookups 20000] [--hot 0.2]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import make_sessionmaker, seed
+
+import app.db as crud
+from app.cache import container_cache
+
+
+def per_lookup_us(func, codes):
+    """Call func for every code and return the mean time per call in microseconds."""
+    start = time.perf_counter()
+    for code in codes:
+        func(code)
+    return (time.perf_counter() - start) * 1e6 / len(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--hot", type=float, default=0.2, help="share of containers receiving 80%% of lookups")
+    parser.add_argument("--refresh-every", type=int, default=2000, help="lookups between bulk occupancy updates")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    hot_count = max(1, int(args.containers * args.hot))
+    codes = [
+        f"Kon{rng.randint(1, hot_count) if rng.random() < 0.8 else rng.randint(1, args.containers)}"
+        for _ in range(args.lookups)
+    ]
+
+    engine, Session = make_sessionmaker()
+    with Session() as db:
+        seed(db, args.containers)
+        container_ids = crud.get_container_ids(db)
+
+        uncached = per_lookup_us(lambda code: crud.get_container_by_code(db, code), codes)
+
+        container_cache.clear()
+        cold = per_lookup_us(lambda code: crud.get_cached_container_by_code(db, code), codes)
+        cold_stats = container_cache.stats()
+        warm = per_lookup_us(lambda code: crud.get_cached_container_by_code(db, code), codes)
+
+        container_cache.clear()
+        start = time.perf_counter()
+        for i in range(0, len(codes), args.refresh_every):
+            crud.bulk_update_container_occupancy(
+                db, {container_id: round(rng.uniform(0.1, 1.0), 2) for container_id in container_ids}
+            )
+            for code in codes[i:i + args.refresh_every]:
+                crud.get_cached_container_by_code(db, code)
+        with_refresh = (time.perf_counter() - start) * 1e6 / len(codes)
+        refresh_stats = container_cache.stats()
+
+    print(f"containers: {args.containers}, lookups: {args.lookups}, hot share: {args.hot:.0%}")
+    print(f"{'uncached':>30}: {uncached:8.1f} us/lookup")
+    print(f"{'cache cold':>30}: {cold:8.1f} us/lookup  (hit ratio {cold_stats['hit_ratio']:.1%})")
+    print(f"{'cache warm':>30}: {warm:8.1f} us/lookup  ({uncached / warm:.1f}x faster than uncached)")
+    print(f"{'cache + refresh (incl. update)':>30}: {with_refresh:8.1f} us/lookup")
+    print(f"stats after refresh run: {refresh_stats}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
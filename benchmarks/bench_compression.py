@@ -0,0 +1,121 @@
+"""
+Benchmark buffered vs streamed container pages and response compression.
+
+For each table size, requests one page holding every container straight
+through the ASGI app and reports, per body mode and content coding:
+
+- first byte: time until the first non-empty body chunk reaches the server
+- total:      time until the last chunk
+- peak:       peak Python memory allocated while serving (tracemalloc)
+- wire:       bytes sent, after compression
+
+Body modes are the buffered JSON page (streaming turned off), the chunked
+JSON array streamed from a cursor, and NDJSON. brotli is measured only when
+the brotli package is installed.
+
+Usage:
+    python -m benchmarks.bench_compression [--sizes 1000,10000] [--repeat 3]
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("REFRESH_ENABLED", "False")
+
+from benchmarks.common import make_sessionmaker, seed
+
+
+async def request(app, path, headers):
+    """Send one GET through the ASGI app; return (first byte s, total s, wire bytes)."""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": path,
+        "raw_path": path.encode(), "query_string": b"", "root_path": "", "server": ("bench", 80),
+        "client": ("127.0.0.1", 1), "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+    if "?" in path:
+        scope["path"], query = path.split("?", 1)
+        scope["query_string"] = query.encode()
+    received = False
+    first_byte = None
+    size = 0
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal first_byte, size
+        if message["type"] == "http.response.body" and message.get("body"):
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            size += len(message["body"])
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    end = time.perf_counter()
+    return (first_byte or end) - start, end - start, size
+
+
+def measure(app, path, headers, repeat):
+    """Best first byte and total time over repeat requests, the wire size and the peak memory."""
+    from app.cache import response_cache
+
+    best_first = best_total = float("inf")
+    for _ in range(repeat):
+        response_cache.clear()
+        first, total, size = asyncio.run(request(app, path, headers))
+        best_first, best_total = min(best_first, first), min(best_total, total)
+    response_cache.clear()
+    tracemalloc.start()
+    asyncio.run(request(app, path, headers))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best_first, best_total, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    import app.database as database
+    import app.routers.containers as containers_router
+    from app.compression import available_encodings
+    from main import app
+
+    codings = ["identity"] + available_encodings()[::-1]
+    streaming_threshold = containers_router.LIST_STREAM_MIN_ROWS
+    modes = [
+        ("buffered", {}, max(sizes) + 1),
+        ("streamed", {}, 1),
+        ("ndjson", {"Accept": "application/x-ndjson"}, 1),
+    ]
+    for count in sizes:
+        engine, Session = make_sessionmaker()
+        with Session() as db:
+            seed(db, count)
+        database.SessionLocal.configure(bind=engine)
+        path = f"/containers/?limit={count}"
+
+        print(f"containers: {count}")
+        for mode, headers, threshold in modes:
+            containers_router.LIST_STREAM_MIN_ROWS = threshold
+            for coding in codings:
+                first, total, size, peak = measure(app, path, {**headers, "Accept-Encoding": coding}, args.repeat)
+                print(
+                    f"  {mode:>8} {coding:>8}: first byte {first * 1000:7.1f} ms, total {total * 1000:7.1f} ms, "
+                    f"peak {peak / 1e6:6.1f} MB, wire {size / 1e6:6.2f} MB"
+                )
+        engine.dispose()
+    containers_router.LIST_STREAM_MIN_ROWS = streaming_threshold
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Report CVRP solution quality against solve time budget.
+
+Builds a random instance of stops around the depot with occupancy-weighted
+demand and solves it with guided local search under each time budget.
+
+Usage:
+    python -m benchmarks.bench_cvrp [--stops 2000] [--vehicles 30] [--budgets 5,15,30,60]
+"""
+import argparse
+import random
+import time
+
+import benchmarks.common  # noqa: F401  (sets up the import path)
+
+from app.routing.providers import HaversineProvider
+from app.routing.solver import solve_cvrp, weighted_cost_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stops", type=int, default=2000)
+    parser.add_argument("--vehicles", type=int, default=30)
+    parser.add_argument("--depots", type=int, default=2)
+    parser.add_argument("--budgets", default="5,15,30,60", help="Comma-separated time limits in seconds")
+    parser.add_argument("--first-solution", default="path_cheapest_arc")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    depots = [(40.9765 + rng.uniform(-0.05, 0.05), 28.8706 + rng.uniform(-0.05, 0.05)) for _ in range(args.depots)]
+    stops = [(40.9765 + rng.uniform(-0.15, 0.15), 28.8706 + rng.uniform(-0.2, 0.2)) for _ in range(args.stops)]
+    demands = [0.0] * args.depots + [round(rng.uniform(0.3, 1.0), 2) for _ in stops]
+    # Enough total capacity for every stop with about 10 % slack
+    capacity = round(sum(demands) * 1.1 / args.vehicles, 2)
+
+    start = time.perf_counter()
+    distance, duration = HaversineProvider().matrices(depots + stops)
+    cost = weighted_cost_matrix(distance, duration)
+    matrix_seconds = time.perf_counter() - start
+
+    print(f"stops: {args.stops}, vehicles: {args.vehicles}, depots: {args.depots}, capacity: {capacity}")
+    print(f"matrix: {matrix_seconds:.2f} s")
+    print(f"{'budget s':>9} {'wall s':>8} {'distance km':>12} {'routes':>7} {'dropped':>8} {'objective':>14}")
+    for budget in (float(value) for value in args.budgets.split(",")):
+        solution = solve_cvrp(
+            cost, distance, duration, args.depots, demands,
+            [capacity] * args.vehicles, [v % args.depots for v in range(args.vehicles)],
+            shift_minutes=24 * 60, time_limit_seconds=budget,
+            first_solution_strategy=args.first_solution,
+        )
+        if solution is None:
+            print(f"{budget:>9.1f} no solution")
+            continue
+        print(
+            f"{budget:>9.1f} {solution.solve_seconds:>8.2f} {solution.total_distance_km:>12.1f} "
+            f"{len(solution.routes):>7} {len(solution.dropped):>8} {solution.objective:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
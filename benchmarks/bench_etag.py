@@ -0,0 +1,68 @@
+"""
+Benchmark polling the container list with conditional GETs.
+
+Measures, per request through the ASGI app (TestClient):
+
+- uncached:     full query and serialization (response cache emptied before every poll)
+- cached body:  unchanged table, served from the serialized response cache
+- 304:          client sends If-None-Match with the current ETag
+
+Usage:
+    python -m benchmarks.bench_etag [--containers 10000] [--polls 200]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("REFRESH_ENABLED", "False")
+
+from benchmarks.common import make_sessionmaker, seed
+
+
+def per_request_ms(func, count):
+    """Call func count times and return the mean time per call in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=10000)
+    parser.add_argument("--polls", type=int, default=200)
+    args = parser.parse_args()
+
+    engine, Session = make_sessionmaker()
+    with Session() as db:
+        seed(db, args.containers)
+
+    from fastapi.testclient import TestClient
+
+    import app.database as database
+    from app.cache import response_cache
+    from main import app
+
+    database.SessionLocal.configure(bind=engine)
+    url = f"/containers/?limit={args.containers}"
+    with TestClient(app) as client:
+        etag = client.get(url).headers["etag"]
+
+        def uncached():
+            response_cache.clear()
+            client.get(url)
+
+        results = {
+            "uncached": per_request_ms(uncached, max(1, args.polls // 10)),
+            "cached body": per_request_ms(lambda: client.get(url), args.polls),
+            "304 Not Modified": per_request_ms(lambda: client.get(url, headers={"If-None-Match": etag}), args.polls),
+        }
+
+    print(f"containers: {args.containers}, page size: {args.containers}")
+    for name, ms in results.items():
+        print(f"{name:>18}: {ms:8.2f} ms/request")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
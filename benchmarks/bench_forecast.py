@@ -0,0 +1,115 @@
+"""
+Benchmark the fill-rate forecaster.
+
+Generates a synthetic reading history (containers filling at different
+rates and being emptied at random) and reports:
+
+- loop fit:     a per-container Python weighted regression, the naive approach
+- batch fit:    FillForecaster.fit over all readings at once
+- update:       folding one new reading per container into the estimates
+- predict:      hours until full for every container
+
+It also prints how far the batch fit's rates are from the true fill rates.
+
+Usage:
+    python -m benchmarks.bench_forecast [--containers 10000] [--hours 72]
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from app.forecast import FillForecaster
+
+
+def synthetic_history(containers: int, hours: int, rng: np.random.Generator):
+    """Hourly readings per container; returns (ids, hours, ratios, true rates)."""
+    true_rates = rng.uniform(0.005, 0.05, containers)
+    ids = np.repeat(np.arange(1, containers + 1), hours)
+    times = np.tile(np.arange(hours, dtype=np.float64), containers)
+    level = rng.uniform(0.0, 0.3, containers)
+    ratios = np.empty(containers * hours)
+    for hour in range(hours):
+        emptied = (level > 0.8) | (rng.random(containers) < 0.01)
+        level = np.where(emptied, rng.uniform(0.0, 0.05, containers), level + true_rates)
+        ratios[hour::hours] = np.clip(level + rng.normal(0.0, 0.01, containers), 0.0, 1.0)
+    return ids, times, ratios, true_rates
+
+
+def loop_fit(ids, times, ratios, half_life_hours: float, reset_drop: float):
+    """Reference fit: one weighted least-squares regression per container in plain Python."""
+    decay = math.log(2) / half_life_hours
+    by_container = {}
+    for container_id, t, y in zip(ids.tolist(), times.tolist(), ratios.tolist()):
+        by_container.setdefault(container_id, []).append((t, y))
+    rates = {}
+    for container_id, readings in by_container.items():
+        readings.sort()
+        start = 0
+        for i in range(1, len(readings)):
+            if readings[i][1] < readings[i - 1][1] - reset_drop:
+                start = i
+        cycle = readings[start:]
+        last_t = cycle[-1][0]
+        sw = st = sy = stt = sty = 0.0
+        for t, y in cycle:
+            w = math.exp(-decay * (last_t - t))
+            sw += w
+            st += w * t
+            sy += w * y
+            stt += w * t * t
+            sty += w * t * y
+        denominator = sw * stt - st * st
+        rates[container_id] = (sw * sty - st * sy) / denominator if len(cycle) > 1 and denominator > 1e-9 else math.nan
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=10000)
+    parser.add_argument("--hours", type=int, default=72)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(16)
+    ids, times, ratios, true_rates = synthetic_history(args.containers, args.hours, rng)
+
+    start = time.perf_counter()
+    loop_rates = loop_fit(ids, times, ratios, 24.0, 0.2)
+    loop_seconds = time.perf_counter() - start
+
+    forecaster = FillForecaster(half_life_hours=24.0, reset_drop=0.2)
+    start = time.perf_counter()
+    forecaster.fit(ids, times, ratios)
+    fit_seconds = time.perf_counter() - start
+
+    new_ratios = np.clip(forecaster.last_y + true_rates, 0.0, 1.0)
+    new_ids = np.arange(1, args.containers + 1)
+    start = time.perf_counter()
+    forecaster.update(new_ids, np.full(args.containers, float(args.hours)), new_ratios)
+    update_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, rates, _, hours_left = forecaster.predict(0.7, float(args.hours))
+    predict_seconds = time.perf_counter() - start
+
+    forecaster.fit(ids, times, ratios)
+    batch_rates = forecaster.rates()
+    reference = np.array([loop_rates[int(container_id)] for container_id in forecaster.ids])
+    agree = np.isnan(reference) == np.isnan(batch_rates)
+    both = ~np.isnan(reference) & ~np.isnan(batch_rates)
+    error = np.abs(batch_rates[both] - true_rates[forecaster.ids[both] - 1])
+
+    print(f"containers: {args.containers}, readings: {len(ids)} ({args.hours} per container)")
+    print(f"{'loop fit':>12}: {loop_seconds * 1000:9.1f} ms")
+    print(f"{'batch fit':>12}: {fit_seconds * 1000:9.1f} ms  ({loop_seconds / fit_seconds:.0f}x faster)")
+    print(f"{'update':>12}: {update_seconds * 1000:9.1f} ms for {args.containers} readings")
+    print(f"{'predict':>12}: {predict_seconds * 1000:9.1f} ms")
+    print(f"batch vs loop: max rate difference {np.nanmax(np.abs(batch_rates[both] - reference[both])):.2e}, "
+          f"same missing estimates: {agree.all()}")
+    print(f"rate error vs truth: median {np.median(error):.4f}/h, p90 {np.quantile(error, 0.9):.4f}/h")
+    print(f"due within 12h: {int((hours_left <= 12).sum())}")
+
+
+if __name__ == "__main__":
+    main()
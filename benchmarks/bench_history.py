@@ -0,0 +1,87 @@
+"""
+Benchmark occupancy history writes and reads.
+
+Runs --cycles refresh-style bulk updates, --interval-minutes apart in
+simulated time (each appends one reading per container and folds it into
+the rollups), compares the cycle time with history recording disabled,
+then times history queries answered from the raw readings versus the
+hourly and daily rollups.
+
+Usage:
+    python -m benchmarks.bench_history [--containers 1000] [--cycles 288] [--interval-minutes 5]
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+from unittest import mock
+
+from benchmarks.common import make_sessionmaker, seed
+
+from sqlalchemy import func, select
+
+import app.db as crud
+from app.models.reading import OccupancyReading, OccupancyRollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=1000)
+    parser.add_argument("--cycles", type=int, default=288)
+    parser.add_argument("--interval-minutes", type=float, default=5.0)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    engine, Session = make_sessionmaker()
+    with Session() as db:
+        seed(db, args.containers)
+        container_ids = crud.get_container_ids(db)
+        interval = timedelta(minutes=args.interval_minutes)
+        start = crud._utc_now() - interval * args.cycles
+
+        without_history = []
+        with mock.patch.object(crud, "record_occupancy"):
+            for _ in range(10):
+                occupancy = {container_id: round(rng.uniform(0.1, 1.0), 2) for container_id in container_ids}
+                began = time.perf_counter()
+                crud.bulk_update_container_occupancy(db, occupancy)
+                without_history.append(time.perf_counter() - began)
+
+        cycle_seconds = []
+        for cycle in range(args.cycles):
+            occupancy = {container_id: round(rng.uniform(0.1, 1.0), 2) for container_id in container_ids}
+            moment = start + interval * cycle
+            with mock.patch.object(crud, "_utc_now", return_value=moment):
+                began = time.perf_counter()
+                crud.bulk_update_container_occupancy(db, occupancy)
+                cycle_seconds.append(time.perf_counter() - began)
+
+        raw_rows = db.scalar(select(func.count()).select_from(OccupancyReading))
+        rollup_rows = db.scalar(select(func.count()).select_from(OccupancyRollup))
+
+        end = crud._utc_now()
+        queried = [rng.choice(container_ids) for _ in range(args.queries)]
+        results = {}
+        for label, step, source in (
+            ("1h from raw readings", timedelta(hours=1), "raw"),
+            ("1h from hourly rollup", timedelta(hours=1), "hour"),
+            ("1d from daily rollup", timedelta(days=1), "day"),
+        ):
+            with mock.patch.object(crud, "choose_history_source", return_value=source):
+                began = time.perf_counter()
+                for container_id in queried:
+                    crud.get_container_history(db, container_id, start, end, step)
+                results[label] = (time.perf_counter() - began) * 1000 / args.queries
+
+    print(f"containers: {args.containers}, cycles: {args.cycles}")
+    print(f"refresh cycle without history: mean {sum(without_history) / len(without_history) * 1000:.1f} ms")
+    print(f"refresh cycle with history:    mean {sum(cycle_seconds) / len(cycle_seconds) * 1000:.1f} ms")
+    print(f"rows: {raw_rows} raw readings, {rollup_rows} rollup buckets")
+    for label, ms in results.items():
+        print(f"{label:>24}: {ms:.3f} ms/query")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
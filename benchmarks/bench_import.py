@@ -0,0 +1,123 @@
+"""
+Benchmark bulk container import and export.
+
+Writes a synthetic district of containers to CSV, NDJSON and Parquet files
+and reports, per format:
+
+- import:  chunked ON CONFLICT upserts into an empty table, then again as
+           updates of the same codes
+- export:  streaming every container back to a file
+
+plus the old seed_containers.py path (existence check and create_container
+per row) on a sample of the rows, and the peak Python memory of an import
+at two file sizes to show it does not grow with the file.
+
+Usage:
+    python -m benchmarks.bench_import [--containers 50000] [--per-row-sample 2000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import make_sessionmaker
+
+import app.db as crud
+from app.container_io import EXPORT_FIELDS, ImportSummary, parquet_available, read_rows, validated_batches, write_rows
+from app.schemas.container import ContainerCreate
+
+
+def synthetic_rows(count, rng):
+    for i in range(count):
+        yield (
+            i + 1, f"D{i + 1}", f"District bin {i + 1}",
+            40.9765 + rng.uniform(-0.05, 0.05), 28.8706 + rng.uniform(-0.05, 0.05),
+            round(rng.uniform(0.0, 1.0), 2), False,
+        )
+
+
+def write_file(path, fmt, count, chunk_size=5000):
+    rows = synthetic_rows(count, random.Random(17))
+    batches = iter(lambda: [row for _, row in zip(range(chunk_size), rows)], [])
+    with open(path, "wb") as file:
+        for data in write_rows(batches, fmt):
+            file.write(data)
+
+
+def import_file(Session, path, fmt, chunk_size):
+    summary = ImportSummary()
+    with open(path, "rb") as file, Session() as db:
+        for batch in validated_batches(read_rows(file, fmt), chunk_size, summary):
+            summary.add(crud.upsert_containers(db, batch))
+    return summary
+
+
+def export_file(Session, path, fmt):
+    with open(path, "wb") as file, Session() as db:
+        for data in write_rows(crud.iter_container_batches(db, EXPORT_FIELDS), fmt):
+            file.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--per-row-sample", type=int, default=2000, help="rows created one at a time")
+    args = parser.parse_args()
+
+    formats = ["csv", "ndjson"] + (["parquet"] if parquet_available() else [])
+    workdir = tempfile.mkdtemp(prefix="kmt_import_")
+    print(f"containers: {args.containers}, chunk size: {args.chunk_size}")
+
+    engine, Session = make_sessionmaker()
+    rng = random.Random(3)
+    start = time.perf_counter()
+    with Session() as db:
+        for i in range(args.per_row_sample):
+            code = f"S{i}"
+            if crud.get_container_by_code(db, code) is None:
+                crud.create_container(db, ContainerCreate(
+                    container_code=code, name=code, lang=40.97 + rng.uniform(-0.05, 0.05),
+                    long=28.87 + rng.uniform(-0.05, 0.05), occupancy_ratio=rng.random(),
+                ))
+    per_row = (time.perf_counter() - start) / args.per_row_sample
+    print(f"{'per-row create':>16}: {1 / per_row:9.0f} rows/s  ({per_row * args.containers:.1f} s for the district)")
+    engine.dispose()
+
+    for fmt in formats:
+        path = os.path.join(workdir, f"district.{fmt}")
+        write_file(path, fmt, args.containers)
+        size_mb = os.path.getsize(path) / 1e6
+
+        engine, Session = make_sessionmaker()
+        start = time.perf_counter()
+        summary = import_file(Session, path, fmt, args.chunk_size)
+        inserted = time.perf_counter() - start
+        start = time.perf_counter()
+        import_file(Session, path, fmt, args.chunk_size)
+        updated = time.perf_counter() - start
+        start = time.perf_counter()
+        export_file(Session, os.path.join(workdir, f"export.{fmt}"), fmt)
+        exported = time.perf_counter() - start
+        engine.dispose()
+        print(
+            f"{fmt:>16}: {size_mb:6.1f} MB, import {summary.inserted / inserted:9.0f} rows/s, "
+            f"re-import {args.containers / updated:9.0f} rows/s, export {args.containers / exported:9.0f} rows/s"
+        )
+
+    for count in (args.containers // 5, args.containers):
+        path = os.path.join(workdir, f"memory_{count}.csv")
+        write_file(path, "csv", count)
+        engine, Session = make_sessionmaker()
+        tracemalloc.start()
+        import_file(Session, path, "csv", args.chunk_size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        engine.dispose()
+        print(f"{'peak memory':>16}: {peak / 1e6:6.1f} MB importing {count} rows")
+
+
+if __name__ == "__main__":
+    main()
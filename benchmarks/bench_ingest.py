@@ -0,0 +1,93 @@
+"""
+Benchmark sensor reading ingestion: one PUT per reading vs the batch endpoint.
+
+Both paths go through the ASGI app (TestClient) against a seeded SQLite
+database. The batch readings arrive out of order with repeats per container,
+as buffered sensor gateways send them.
+
+Usage:
+    python -m benchmarks.bench_ingest [--containers 10000] [--readings 50000] [--single 500]
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("REFRESH_ENABLED", "False")
+
+from benchmarks.common import make_sessionmaker, seed
+
+
+def make_readings(count, containers, rng):
+    """Readings spread over an hour, shuffled so timestamps arrive out of order."""
+    start = datetime(2026, 1, 1, 8, tzinfo=timezone.utc)
+    readings = [
+        {
+            "container_code": f"Kon{rng.randint(1, containers)}",
+            "occupancy_ratio": round(rng.uniform(0.0, 1.0), 2),
+            "ts": (start + timedelta(seconds=rng.uniform(0, 3600))).isoformat(),
+        }
+        for _ in range(count)
+    ]
+    rng.shuffle(readings)
+    return readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=10000)
+    parser.add_argument("--readings", type=int, default=50000)
+    parser.add_argument("--single", type=int, default=500, help="readings sent one PUT at a time")
+    args = parser.parse_args()
+
+    engine, Session = make_sessionmaker()
+    with Session() as db:
+        seed(db, args.containers)
+
+    from fastapi.testclient import TestClient
+
+    import app.database as database
+    from main import app
+
+    database.SessionLocal.configure(bind=engine)
+    rng = random.Random(3)
+    readings = make_readings(args.readings, args.containers, rng)
+
+    with TestClient(app) as client:
+        # Baseline: one PUT per reading by container ID, as sensors do today
+        start = time.perf_counter()
+        for i in range(args.single):
+            ratio = readings[i]["occupancy_ratio"]
+            client.put(f"/containers/{rng.randint(1, args.containers)}", json={
+                "occupancy_ratio": ratio, "is_full": ratio >= 0.7
+            })
+        single_rate = args.single / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        json_result = client.post("/containers/readings:batch", json=readings).json()
+        json_rate = args.readings / (time.perf_counter() - start)
+
+        # Same readings shifted an hour later so they are applied again
+        later = [
+            {**reading, "ts": (datetime.fromisoformat(reading["ts"]) + timedelta(hours=1)).isoformat()}
+            for reading in readings
+        ]
+        body = "\n".join(json.dumps(reading) for reading in later)
+        start = time.perf_counter()
+        ndjson_result = client.post(
+            "/containers/readings:batch", content=body, headers={"Content-Type": "application/x-ndjson"}
+        ).json()
+        ndjson_rate = args.readings / (time.perf_counter() - start)
+
+    print(f"containers: {args.containers}, readings per batch: {args.readings}")
+    print(f"{'PUT per reading':>16}: {single_rate:10.0f} readings/s")
+    print(f"{'batch (JSON)':>16}: {json_rate:10.0f} readings/s  {json_result}")
+    print(f"{'batch (NDJSON)':>16}: {ndjson_rate:10.0f} readings/s  "
+          f"applied {ndjson_result['applied']}, duplicates {ndjson_result['duplicates']}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Reproducible load test of the API at several fleet sizes.
+
+For every size a fresh database is seeded with that many containers and the
+app is driven by concurrent clients, once in-process over httpx's ASGI
+transport and once over HTTP against a uvicorn server. Each run measures
+these scenarios one after another:
+
+- list:        GET /containers/ pages starting at random cursors
+- get_by_code: GET /containers/code/{code}
+- update:      PUT /containers/{id} with a new occupancy
+- route_plan:  POST /routes/plan over a fixed set of --plan-stops containers
+
+and reports throughput and p50/p90/p99 latency per scenario. Distances come
+from the offline haversine provider standing in for Google Maps, with a
+fresh matrix cache per run, so no run depends on the network or on earlier
+runs.
+
+Results are written as JSON (commit, parameters and one record per size,
+transport and scenario) so runs of different commits can be compared;
+--compare exits with status 1 when throughput or p99 latency regressed by
+more than --tolerance against an earlier results file.
+
+By default each size uses a temporary SQLite file. Pass --db-url to run
+against e.g. a scratch Postgres database instead; its tables are dropped
+and recreated for every run.
+
+Usage:
+    python -m benchmarks.bench_load [--sizes 1000,10000,100000] [--transports inprocess,uvicorn]
+        [--concurrency 32] [--requests 1000] [--output load.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+TRANSPORTS = ("inprocess", "uvicorn")
+SCENARIOS = ("list", "get_by_code", "update", "route_plan")
+
+# Occupancy of the containers every route plan collects; all others stay below it
+PLAN_OCCUPANCY = 0.98
+OTHER_MAX_OCCUPANCY = 0.95
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(scenario, latencies, errors, elapsed, concurrency):
+    latencies = sorted(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        "scenario": scenario,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p90_ms": ms(percentile(latencies, 90)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+
+def scenario_requests(scenario, size, count, rng, args):
+    """The (method, url, json body) requests of a scenario, drawn from rng."""
+    if scenario == "list":
+        return [("GET", f"/containers/?limit={args.page_size}&after_id={rng.randint(0, size)}", None) for _ in range(count)]
+    if scenario == "get_by_code":
+        return [("GET", f"/containers/code/Kon{rng.randint(1, size)}", None) for _ in range(count)]
+    if scenario == "update":
+        return [
+            ("PUT", f"/containers/{rng.randint(1, size)}",
+             {"occupancy_ratio": round(rng.uniform(0.0, OTHER_MAX_OCCUPANCY), 2)})
+            for _ in range(count)
+        ]
+    body = {
+        "occupancy_threshold": PLAN_OCCUPANCY,
+        "time_limit_seconds": args.plan_time_limit,
+        "metaheuristic": "greedy_descent",
+    }
+    return [("POST", "/routes/plan", body) for _ in range(count)]
+
+
+async def run_scenario(client, scenario, requests, concurrency):
+    """Send requests with concurrency workers and summarize their latencies."""
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            method, url, body = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(scenario, latencies, errors, time.perf_counter() - started, concurrency)
+
+
+async def drive(client, args):
+    rng = random.Random(args.seed)
+    results = []
+    for scenario in SCENARIOS:
+        plan = scenario == "route_plan"
+        count = args.plan_requests if plan else args.requests
+        concurrency = min(args.concurrency, args.plan_concurrency) if plan else args.concurrency
+        warmup = scenario_requests(scenario, args.size, 1 if plan else args.warmup, rng, args)
+        await run_scenario(client, scenario, warmup, concurrency)
+        requests = scenario_requests(scenario, args.size, count, rng, args)
+        results.append(await run_scenario(client, scenario, requests, concurrency))
+    return results
+
+
+async def drive_inprocess(args):
+    import httpx
+    from main import app
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await drive(client, args)
+    finally:
+        await app.router.shutdown()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive_uvicorn(args):
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        stdout=subprocess.DEVNULL,
+    )
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout
+        ) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not start")
+                await asyncio.sleep(0.2)
+            return await drive(client, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_transport(args):
+    """Child process entry point: drive one transport and print its results as JSON."""
+    drive_transport = drive_inprocess if args.transport == "inprocess" else drive_uvicorn
+    print(json.dumps(asyncio.run(drive_transport(args))))
+
+
+def seed_database(size, plan_stops, db_url=None):
+    """
+    Seed size containers and return the database URL.
+
+    Exactly plan_stops containers are at PLAN_OCCUPANCY, so every route plan
+    solves the same number of stops whatever the fleet size.
+    """
+    from sqlalchemy import update
+
+    from benchmarks.common import make_sessionmaker, seed
+    from app.models.container import Container
+
+    engine, Session = make_sessionmaker(url=db_url)
+    with Session() as db:
+        seed(db, size)
+        db.execute(
+            update(Container).where(Container.occupancy_ratio > OTHER_MAX_OCCUPANCY)
+            .values(occupancy_ratio=OTHER_MAX_OCCUPANCY)
+        )
+        planned = random.Random(size).sample(range(1, size + 1), min(plan_stops, size))
+        db.execute(update(Container).where(Container.id.in_(planned)).values(occupancy_ratio=PLAN_OCCUPANCY))
+        db.commit()
+    url = engine.url.render_as_string(hide_password=False)
+    engine.dispose()
+    return url
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def compare(results, baseline_path, tolerance):
+    """Print the change of every result against a baseline file; return the number of regressions."""
+    with open(baseline_path) as file:
+        baseline = {
+            (record["size"], record["transport"], record["scenario"]): record for record in json.load(file)["results"]
+        }
+    regressions = 0
+    print(f"\ncompared with {baseline_path} (tolerance {tolerance:.0%}):")
+    for record in results:
+        old = baseline.get((record["size"], record["transport"], record["scenario"]))
+        if old is None or not old["requests_per_second"] or not record["requests_per_second"]:
+            continue
+        throughput = record["requests_per_second"] / old["requests_per_second"] - 1
+        p99 = record["p99_ms"] / old["p99_ms"] - 1
+        regressed = throughput < -tolerance or p99 > tolerance
+        regressions += regressed
+        print(
+            f"{record['size']:>8} {record['transport']:>10} {record['scenario']:>12}: "
+            f"throughput {throughput:+7.1%}, p99 {p99:+7.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated container counts")
+    parser.add_argument("--transports", default=",".join(TRANSPORTS), help="comma-separated: inprocess, uvicorn")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests before each scenario")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--plan-stops", type=int, default=50, help="containers in every route plan")
+    parser.add_argument("--plan-requests", type=int, default=10)
+    parser.add_argument("--plan-concurrency", type=int, default=2)
+    parser.add_argument("--plan-time-limit", type=float, default=1.0)
+    parser.add_argument("--db-url", help="scratch database to use instead of SQLite (tables are recreated)")
+    parser.add_argument("--db-async", action="store_true", help="run the app with DB_ASYNC=True")
+    parser.add_argument("--seed", type=int, default=19)
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--transport", choices=TRANSPORTS, help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.transport:
+        run_transport(args)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    transports = [transport for transport in args.transports.split(",") if transport]
+    commit, dirty = git_revision()
+    print(f"sizes: {sizes}, transports: {transports}, concurrency: {args.concurrency}, requests: {args.requests}")
+
+    results = []
+    child_args = [
+        "--concurrency", str(args.concurrency), "--requests", str(args.requests), "--warmup", str(args.warmup),
+        "--page-size", str(args.page_size), "--plan-requests", str(args.plan_requests),
+        "--plan-concurrency", str(args.plan_concurrency), "--plan-time-limit", str(args.plan_time_limit),
+        "--seed", str(args.seed), "--timeout", str(args.timeout),
+    ]
+    for size in sizes:
+        for transport in transports:
+            start = time.perf_counter()
+            db_url = seed_database(size, args.plan_stops, args.db_url)
+            seed_seconds = time.perf_counter() - start
+            cache_dir = tempfile.mkdtemp(prefix="kmt_load_matrix_")
+            env = dict(
+                os.environ,
+                DB_URL=db_url,
+                DB_ASYNC=str(args.db_async),
+                REFRESH_ENABLED="False",
+                ROUTING_PROVIDER="haversine",
+                ROUTING_MATRIX_CACHE_DIR=cache_dir,
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_load", "--transport", transport, "--size", str(size),
+                 *child_args],
+                env=env, check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+            print(f"\n{size} containers, {transport} (seeded in {seed_seconds:.1f} s)")
+            for record in json.loads(output.strip().splitlines()[-1]):
+                record = {"size": size, "transport": transport, **record}
+                results.append(record)
+                print(
+                    f"{record['scenario']:>12}: {record['requests_per_second']:9.1f} req/s  "
+                    f"p50 {record['p50_ms']:8.1f} ms  p99 {record['p99_ms']:8.1f} ms  errors {record['errors']}"
+                )
+            if args.db_url is None:
+                os.remove(db_url[len("sqlite:///"):])
+
+    report = {
+        "benchmark": "bench_load",
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": "sqlite" if args.db_url is None else args.db_url.split(":", 1)[0],
+        "parameters": {
+            "sizes": sizes, "transports": transports, "concurrency": args.concurrency,
+            "requests": args.requests, "warmup": args.warmup, "page_size": args.page_size,
+            "plan_stops": args.plan_stops, "plan_requests": args.plan_requests,
+            "plan_concurrency": args.plan_concurrency, "plan_time_limit": args.plan_time_limit,
+            "db_async": args.db_async, "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
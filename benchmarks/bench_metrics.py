@@ -0,0 +1,85 @@
+"""
+Benchmark the cost of the request and query instrumentation.
+
+Reports, per call:
+
+- middleware: MetricsMiddleware around a trivial ASGI app that sets a
+  route and sends a response, minus the same app without the middleware
+- query hooks: a SELECT 1 on SQLite with the engine hooks, minus the same
+  query on an uninstrumented engine
+- render: producing the /metrics text after the run
+
+Usage:
+    python -m benchmarks.bench_metrics [--requests 200000] [--queries 100000]
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import benchmarks.common  # noqa: F401  (sets a throwaway DB_URL)
+
+from sqlalchemy import create_engine, text
+
+from app.metrics import MetricsMiddleware, instrument_engine, render_metrics
+
+ROUTES = [SimpleNamespace(path=f"/bench/{i}/{{item_id}}") for i in range(20)]
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = ROUTES[hash(scope["path"]) % len(ROUTES)]
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def per_request_us(app, count):
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scopes = [{"type": "http", "method": "GET", "path": f"/bench/{i % 100}"} for i in range(count)]
+    start = time.perf_counter()
+    for scope in scopes:
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) * 1e6 / count
+
+
+def per_query_us(engine, count):
+    with engine.connect() as connection:
+        statement = text("SELECT 1")
+        start = time.perf_counter()
+        for _ in range(count):
+            connection.execute(statement)
+        return (time.perf_counter() - start) * 1e6 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=100000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(per_request_us(endpoint, args.requests))
+    wrapped = asyncio.run(per_request_us(MetricsMiddleware(endpoint), args.requests))
+
+    plain_engine = create_engine("sqlite://")
+    instrumented_engine = create_engine("sqlite://")
+    instrument_engine(instrumented_engine)
+    per_query_us(plain_engine, 1000)
+    per_query_us(instrumented_engine, 1000)
+    plain = per_query_us(plain_engine, args.queries)
+    instrumented = per_query_us(instrumented_engine, args.queries)
+
+    start = time.perf_counter()
+    body = render_metrics()
+    render_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{'middleware':>12}: {wrapped - bare:6.2f} us/request  ({bare:.2f} -> {wrapped:.2f})")
+    print(f"{'query hooks':>12}: {instrumented - plain:6.2f} us/query    ({plain:.2f} -> {instrumented:.2f})")
+    print(f"{'render':>12}: {render_ms:6.2f} ms for {len(body.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
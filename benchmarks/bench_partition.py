@@ -0,0 +1,85 @@
+"""
+Benchmark partitioned fleet planning against a single solve of the whole instance.
+
+Builds a random CVRP instance like bench_cvrp and plans it whole and split
+into districts (k-means and capacity-balanced sweep) solved in parallel in
+the solver process pool, reporting wall-clock time including the matrices,
+speedup, total distance, dropped stops and the cost gap to the whole solve.
+
+With the default greedy descent every solve stops at its local optimum, so
+wall-clock times compare directly; with --metaheuristic guided_local_search
+every solve runs for --time-limit and the gap shows what the same budget
+buys. Districts are solved side by side by ROUTING_WORKERS processes
+(default: one per core).
+
+Usage:
+    python -m benchmarks.bench_partition [--stops 2000] [--vehicles 20] [--clusters 2,4,8]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("ROUTING_PROVIDER", "haversine")
+os.environ.setdefault("ROUTING_MATRIX_CACHE_DIR", "")
+os.environ.setdefault("ROUTING_WORKERS", str(os.cpu_count() or 2))
+
+import benchmarks.common  # noqa: F401  (sets up the import path)
+
+from app.config import ROUTING_WORKERS
+from app.routing.partition import plan_fleet_partitioned
+from app.routing.service import plan_fleet, run_in_pool, shutdown_pool
+
+
+async def run(args):
+    rng = random.Random(3)
+    depots = [(40.9765 + rng.uniform(-0.05, 0.05), 28.8706 + rng.uniform(-0.05, 0.05)) for _ in range(args.depots)]
+    stops = [(40.9765 + rng.uniform(-0.15, 0.15), 28.8706 + rng.uniform(-0.2, 0.2)) for _ in range(args.stops)]
+    demands = [0.0] * args.depots + [round(rng.uniform(0.3, 1.0), 2) for _ in stops]
+    capacity = round(sum(demands) * 1.1 / args.vehicles, 2)
+    problem = (depots + stops, args.depots, demands, [capacity] * args.vehicles, [v % args.depots for v in range(args.vehicles)])
+    options = dict(shift_minutes=24 * 60, time_limit_seconds=args.time_limit, metaheuristic=args.metaheuristic)
+
+    # Start the solver processes before timing anything
+    await asyncio.gather(*(run_in_pool(time.sleep, 0.1) for _ in range(ROUTING_WORKERS)))
+
+    print(
+        f"stops: {args.stops}, vehicles: {args.vehicles}, depots: {args.depots}, capacity: {capacity}, "
+        f"workers: {ROUTING_WORKERS}, cores: {os.cpu_count()}, {args.metaheuristic}"
+    )
+    print(f"{'plan':>12} {'wall s':>8} {'speedup':>8} {'distance km':>12} {'dropped':>8} {'gap':>8}")
+    started = time.perf_counter()
+    whole = await run_in_pool(plan_fleet, *problem, **options)
+    baseline = time.perf_counter() - started
+    print(f"{'whole':>12} {baseline:>8.2f} {1.0:>7.1f}x {whole.total_distance_km:>12.1f} {len(whole.dropped):>8} {'':>8}")
+    for method in ("kmeans", "sweep"):
+        for clusters in args.clusters:
+            started = time.perf_counter()
+            solution = await plan_fleet_partitioned(*problem, clusters=clusters, method=method, **options)
+            seconds = time.perf_counter() - started
+            gap = solution.total_distance_km / whole.total_distance_km - 1
+            print(
+                f"{f'{method} x{clusters}':>12} {seconds:>8.2f} {baseline / seconds:>7.1f}x "
+                f"{solution.total_distance_km:>12.1f} {len(solution.dropped):>8} {gap * 100:>+7.1f}%"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stops", type=int, default=2000)
+    parser.add_argument("--vehicles", type=int, default=20)
+    parser.add_argument("--depots", type=int, default=2)
+    parser.add_argument("--clusters", default="2,4,8")
+    parser.add_argument("--metaheuristic", default="greedy_descent")
+    parser.add_argument("--time-limit", type=float, default=120.0)
+    args = parser.parse_args()
+    args.clusters = [int(clusters) for clusters in args.clusters.split(",")]
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
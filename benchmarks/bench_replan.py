@@ -0,0 +1,94 @@
+"""
+Benchmark incremental re-planning against solving every plan from scratch.
+
+Plans a tour through --stops random containers, then for each change size
+runs --rounds rounds in which that many containers are emptied (leave the
+tour) and as many others fill up (join it). Each round is planned twice:
+
+- incremental: the stored tour is repaired (cheapest insertion) and
+  improved by a short warm-started local search (app.routing.plans)
+- full:        solved from scratch with the full time budget
+
+and the median latency of both and the mean cost gap of the incremental
+tour are reported. Distances come from the offline haversine provider.
+
+Usage:
+    python -m benchmarks.bench_replan [--stops 500] [--changes 1,5,25] [--rounds 5] [--time-limit 2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("ROUTING_PROVIDER", "haversine")
+os.environ.setdefault("ROUTING_MATRIX_CACHE_DIR", "")
+
+import benchmarks.common  # noqa: F401  (sets up the import path)
+
+from app.config import DEPOT_LAT, DEPOT_LON, ROUTING_REPAIR_TIME_LIMIT_SECONDS
+from app.routing.plans import RoutePlanStore, plan_key
+from app.routing.service import shutdown_pool
+
+
+async def run(args):
+    rng = random.Random(42)
+    depot = (DEPOT_LAT, DEPOT_LON)
+    locations = {
+        container_id: (DEPOT_LAT + rng.uniform(-0.05, 0.05), DEPOT_LON + rng.uniform(-0.05, 0.05))
+        for container_id in range(1, args.stops * 2 + 1)
+    }
+    active = set(range(1, args.stops + 1))
+    key = plan_key(depot, "bench", None, None, 0.7, 0.3)
+    incremental = RoutePlanStore(max_change_ratio=1.0, repair_time_limit_seconds=args.repair_time_limit)
+    scratch = RoutePlanStore()
+
+    async def plan(store, reoptimize=False):
+        container_ids = sorted(active)
+        points = [depot] + [locations[container_id] for container_id in container_ids]
+        started = time.perf_counter()
+        stored, mode = await store.plan(key, points, container_ids, args.time_limit, reoptimize=reoptimize)
+        return stored, mode, time.perf_counter() - started
+
+    stored, _, seconds = await plan(incremental)
+    print(f"stops: {args.stops}, first full solve {seconds * 1000:.0f} ms, repair search {args.repair_time_limit * 1000:.0f} ms")
+    for changes in args.changes:
+        latencies = {"incremental": [], "full": []}
+        gaps = []
+        for _ in range(args.rounds):
+            emptied = rng.sample(sorted(active), changes)
+            filled = rng.sample(sorted(set(locations) - active), changes)
+            active.difference_update(emptied)
+            active.update(filled)
+
+            repaired, mode, seconds = await plan(incremental)
+            assert mode == "incremental", mode
+            latencies["incremental"].append(seconds)
+            solved, _, seconds = await plan(scratch, reoptimize=True)
+            latencies["full"].append(seconds)
+            gaps.append(repaired.solution.objective / solved.solution.objective - 1)
+        print(
+            f"  {changes:>3} changes: incremental {statistics.median(latencies['incremental']) * 1000:7.1f} ms, "
+            f"full {statistics.median(latencies['full']) * 1000:7.1f} ms, "
+            f"cost gap {statistics.mean(gaps) * 100:+.2f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stops", type=int, default=500)
+    parser.add_argument("--changes", default="1,5,25")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--time-limit", type=float, default=2.0)
+    parser.add_argument("--repair-time-limit", type=float, default=ROUTING_REPAIR_TIME_LIMIT_SECONDS)
+    args = parser.parse_args()
+    args.changes = [int(changes) for changes in args.changes.split(",")]
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark rendering a stored route plan for the map endpoints.
+
+Builds a plan visiting --stops random containers (in sweep order, no
+solving) and reports render time and body size of GET /routes/{id}/geojson
+options: full GeoJSON, encoded polylines, a simplified route without
+markers, a bounding box covering a quarter of the area, and a repeat
+request answered from the per-solve cache.
+
+Usage:
+    python -m benchmarks.bench_route_map [--stops 1000,5000] [--repeat 5]
+"""
+import argparse
+import math
+import random
+import time
+
+import benchmarks.common  # noqa: F401  (sets up the import path)
+
+import numpy as np
+
+from app.cache import LocalBackend
+from app.config import DEPOT_LAT, DEPOT_LON
+from app.routing.geojson import route_map
+from app.routing.plans import StoredPlan
+from app.routing.solver import RouteSolution
+from app.serialization import dumps
+
+DEPOT = (DEPOT_LAT, DEPOT_LON)
+
+
+def make_plan(stops):
+    rng = random.Random(7)
+    points = [DEPOT] + [(DEPOT[0] + rng.uniform(-0.1, 0.1), DEPOT[1] + rng.uniform(-0.1, 0.1)) for _ in range(stops)]
+    order = sorted(range(1, stops + 1), key=lambda node: math.atan2(points[node][0] - DEPOT[0], points[node][1] - DEPOT[1]))
+    return StoredPlan(
+        plan_id="bench", version=1, points=points, container_ids=list(range(1, stops + 1)),
+        container_codes={container_id: f"Kon{container_id}" for container_id in range(1, stops + 1)},
+        distance_matrix=np.zeros((1, 1)), duration_matrix=np.zeros((1, 1)), alpha=0.7, beta=0.3,
+        solution=RouteSolution([0] + order + [0], 0.0, 0.0, 0, 0.0),
+        metaheuristic="automatic", time_limit_seconds=1.0, repaired=False, updated_at=time.time(), solve_id="bench",
+    )
+
+
+def best_ms(repeat, func):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stops", default="1000,5000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    quarter = (DEPOT[0] - 0.1, DEPOT[1] - 0.1, DEPOT[0], DEPOT[1])
+    variants = [
+        ("geojson", {}),
+        ("polyline", {"polyline": True}),
+        ("simplify 200 m", {"simplify_m": 200.0, "markers": False}),
+        ("bbox quarter", {"bbox": quarter}),
+    ]
+    for stops in (int(value) for value in args.stops.split(",")):
+        plan = make_plan(stops)
+        print(f"stops: {stops}")
+        for name, options in variants:
+            milliseconds, body = best_ms(args.repeat, lambda: dumps(route_map(plan, "Depo", **options)))
+            print(f"  {name:>15}: render {milliseconds:7.1f} ms, {len(body) / 1000:8.1f} kB")
+        cache = LocalBackend(max_entries=16, ttl_seconds=60)
+        cache.set("etag", dumps(route_map(plan, "Depo")))
+        milliseconds, _ = best_ms(args.repeat, lambda: cache.get("etag"))
+        print(f"  {'cached':>15}: lookup {milliseconds:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
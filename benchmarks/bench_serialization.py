@@ -0,0 +1,92 @@
+"""
+Benchmark encoding a page of containers as a JSON response.
+
+Loads the same page of containers from a seeded SQLite database and encodes
+it three ways, reporting load and encode time separately:
+
+- response_model: ORM objects returned from the endpoint; FastAPI validates
+  every row against List[ContainerResponse] and runs jsonable_encoder
+- type adapter:   ORM objects validated with a TypeAdapter(from_attributes)
+  and dumped by pydantic-core (the previous GET /containers path)
+- column rows:    plain column values encoded by app.serialization.dumps
+  (orjson when installed), the current path
+
+Usage:
+    python -m benchmarks.bench_serialization [--containers 10000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from benchmarks.common import make_sessionmaker, seed
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+
+from app.db import get_container_rows, get_containers
+from app.schemas.container import ContainerResponse
+from app.serialization import dumps, orjson
+
+FIELDS = list(ContainerResponse.model_fields)
+
+
+def response_model_encode(containers, field):
+    content = asyncio.run(serialize_response(field=field, response_content=containers))
+    return JSONResponse(content=content).body
+
+
+def best_of(repeat, Session, load, encode):
+    """Best (load, encode) seconds over repeat runs, and the encoded body."""
+    best_load = best_encode = float("inf")
+    for _ in range(repeat):
+        with Session() as db:
+            start = time.perf_counter()
+            rows = load(db)
+            loaded = time.perf_counter()
+            body = encode(rows)
+            encoded = time.perf_counter()
+        best_load = min(best_load, loaded - start)
+        best_encode = min(best_encode, encoded - loaded)
+    return best_load, best_encode, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine, Session = make_sessionmaker()
+    with Session() as db:
+        seed(db, args.containers)
+
+    field = create_response_field(name="response", type_=List[ContainerResponse])
+    adapter = TypeAdapter(List[ContainerResponse])
+    load_objects = lambda db: get_containers(db, limit=args.containers)
+    paths = [
+        ("response_model", load_objects, lambda rows: response_model_encode(rows, field)),
+        ("type adapter", load_objects, lambda rows: adapter.dump_json(adapter.validate_python(rows, from_attributes=True))),
+        ("column rows", lambda db: get_container_rows(db, FIELDS, limit=args.containers), dumps),
+    ]
+
+    print(f"containers: {args.containers}, encoder: {'orjson' if orjson is not None else 'pydantic-core'}")
+    bodies = []
+    baseline = None
+    for name, load, encode in paths:
+        load_seconds, encode_seconds, body = best_of(args.repeat, Session, load, encode)
+        bodies.append(body)
+        total = load_seconds + encode_seconds
+        baseline = baseline or total
+        print(
+            f"{name:>15}: load {load_seconds * 1000:7.1f} ms, encode {encode_seconds * 1000:7.1f} ms, "
+            f"total {total * 1000:7.1f} ms ({baseline / total:.1f}x)"
+        )
+    print(f"identical bodies: {len(set(bodies)) == 1} ({len(bodies[0]) / 1e6:.1f} MB)")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
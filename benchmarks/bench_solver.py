@@ -0,0 +1,91 @@
+"""
+Microbenchmark cost-matrix construction and solver arc evaluation.
+
+For each size, compares:
+
+- matrix build: nested Python loops (the original notebook) vs the vectorized provider
+- first solution: a Python transit callback per arc vs a precomputed
+  matrix registered with RegisterTransitMatrix
+
+Usage:
+    python -m benchmarks.bench_solver [--sizes 200,1000,5000]
+"""
+import argparse
+import math
+import random
+import time
+
+import benchmarks.common  # noqa: F401  (sets up the import path)
+
+import numpy as np
+from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+
+from app.routing.providers import HaversineProvider
+from app.routing.solver import integer_matrix, weighted_cost_matrix
+
+
+def loop_matrices(points, detour_factor=1.3, speed_kmh=25.0):
+    """The original fill: one Python iteration per pair."""
+    size = len(points)
+    distance_matrix = np.zeros((size, size))
+    duration_matrix = np.zeros((size, size))
+    for i in range(size):
+        for j in range(size):
+            lat1, lon1 = map(math.radians, points[i])
+            lat2, lon2 = map(math.radians, points[j])
+            a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+            distance_km = 2 * 6371.0088 * math.asin(math.sqrt(min(a, 1.0))) * detour_factor
+            distance_matrix[i][j] = distance_km
+            duration_matrix[i][j] = distance_km / speed_kmh * 60
+    return distance_matrix, duration_matrix
+
+
+def first_solution_seconds(cost_matrix, use_callback):
+    """Time PATH_CHEAPEST_ARC to the first solution."""
+    start = time.perf_counter()
+    manager = pywrapcp.RoutingIndexManager(len(cost_matrix), 1, 0)
+    routing = pywrapcp.RoutingModel(manager)
+    if use_callback:
+        def cost_callback(from_index, to_index):
+            return int(cost_matrix[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)] * 1000)
+        transit = routing.RegisterTransitCallback(cost_callback)
+    else:
+        transit = routing.RegisterTransitMatrix(integer_matrix(cost_matrix))
+    routing.SetArcCostEvaluatorOfAllVehicles(transit)
+    parameters = pywrapcp.DefaultRoutingSearchParameters()
+    parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    parameters.solution_limit = 1
+    solution = routing.SolveWithParameters(parameters)
+    assert solution is not None
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="200,1000,5000")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    print(f"{'nodes':>6} {'loop build s':>13} {'numpy build s':>14} {'callback solve s':>17} {'matrix solve s':>15} {'speedup':>8}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        points = [(40.9765 + rng.uniform(-0.15, 0.15), 28.8706 + rng.uniform(-0.2, 0.2)) for _ in range(size)]
+
+        start = time.perf_counter()
+        loop_matrices(points)
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        distance, duration = HaversineProvider().matrices(points)
+        cost = weighted_cost_matrix(distance, duration)
+        numpy_seconds = time.perf_counter() - start
+
+        callback_seconds = first_solution_seconds(cost, use_callback=True)
+        matrix_seconds = first_solution_seconds(cost, use_callback=False)
+        print(
+            f"{size:>6} {loop_seconds:>13.3f} {numpy_seconds:>14.4f} {callback_seconds:>17.3f} "
+            f"{matrix_seconds:>15.3f} {callback_seconds / matrix_seconds:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark nearby-container queries against a naive full scan.
+
+Compares, per query:
+
+- naive:   load every container and compute all distances (the client-side approach)
+- grid:    SpatialGrid lookup from the in-process cache
+- geohash: find_nearby_containers over the indexed geohash column
+
+Usage:
+    python -m benchmarks.bench_spatial [--containers 100000] [--queries 1000] [--k 10] [--radius-m 500]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import make_sessionmaker, seed
+
+import numpy as np
+from sqlalchemy import select
+
+import app.db as crud
+from app.models.container import Container
+from app.spatial import SpatialGrid, haversine_m
+
+
+def per_query_ms(func, points):
+    """Run func for every point and return the mean time per call in milliseconds."""
+    start = time.perf_counter()
+    for lat, lon in points:
+        func(lat, lon)
+    return (time.perf_counter() - start) * 1000 / len(points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--containers", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-m", type=float, default=500.0)
+    args = parser.parse_args()
+
+    engine, Session = make_sessionmaker()
+    rng = random.Random(7)
+    points = [(40.9765 + rng.uniform(-0.2, 0.2), 28.8706 + rng.uniform(-0.2, 0.2)) for _ in range(args.queries)]
+
+    with Session() as db:
+        # Spread the fleet over roughly a 45 x 35 km city
+        seed(db, args.containers, spread=4.0)
+        rows = db.execute(select(Container.id, Container.lang, Container.long)).all()
+        ids = np.array([row.id for row in rows])
+        lats = np.array([row.lang for row in rows])
+        lons = np.array([row.long for row in rows])
+
+        def naive(lat, lon):
+            everything = db.execute(select(Container.id, Container.lang, Container.long)).all()
+            scored = sorted(
+                (float(haversine_m(lat, lon, row.lang, row.long)), row.id) for row in everything
+            )
+            return [match for match in scored if match[0] <= args.radius_m][:args.k]
+
+        def naive_numpy(lat, lon):
+            distances = haversine_m(lat, lon, lats, lons)
+            inside = np.flatnonzero(distances <= args.radius_m)
+            return ids[inside[np.argsort(distances[inside])][:args.k]]
+
+        start = time.perf_counter()
+        grid = SpatialGrid(ids, lats, lons)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        crud.SPATIAL_INDEX = "geohash"
+        results = {
+            "naive scan (DB + Python)": per_query_ms(naive, points[:max(1, args.queries // 100)]),
+            "naive scan (in-memory NumPy)": per_query_ms(naive_numpy, points),
+            "grid k-nearest": per_query_ms(lambda lat, lon: grid.nearest(lat, lon, args.k), points),
+            "grid radius": per_query_ms(lambda lat, lon: grid.within(lat, lon, args.radius_m, args.k), points),
+            "geohash column (SQLite)": per_query_ms(
+                lambda lat, lon: crud.find_nearby_containers(db, lat, lon, k=args.k, radius_m=args.radius_m),
+                points[:max(1, args.queries // 10)]
+            ),
+        }
+
+    print(f"containers: {args.containers}, k: {args.k}, radius: {args.radius_m:.0f} m")
+    print(f"grid build: {build_ms:.1f} ms")
+    for name, ms in results.items():
+        print(f"{name:>30}: {ms:.4f} ms/query")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
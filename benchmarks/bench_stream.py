@@ -0,0 +1,85 @@
+"""
+Benchmark fan-out of container changes to many idle stream subscribers.
+
+Registers --subscribers subscriptions on the ChangeBus (spread over a number
+of region / is_full filters), publishes a refresh-sized batch of changes and
+reports the flush time, the memory held per subscriber and how slow
+consumers are collapsed into a resync instead of growing their queues.
+
+Usage:
+    python -m benchmarks.bench_stream [--subscribers 10000] [--changes 10000] [--regions 64]
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+import benchmarks.common  # noqa: F401  (sets up the import path)
+
+from app.events import ChangeBus, RESYNC_MESSAGE
+from app.spatial import geohash_encode
+
+
+async def run(args):
+    rng = random.Random(5)
+    bus = ChangeBus(coalesce_seconds=0.0, queue_size=args.queue_size, version_poll_seconds=3600)
+    bus.max_subscribers = args.subscribers
+    bus._watcher = asyncio.get_running_loop().create_future()  # no database in this benchmark
+
+    regions = sorted({geohash_encode(40.9765 + rng.uniform(-0.1, 0.1), 28.8706 + rng.uniform(-0.1, 0.1))[:5]
+                      for _ in range(args.regions)})
+    filters = [(None, None), (None, True)] + [(region, None) for region in regions]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscriptions = [bus.subscribe(*filters[i % len(filters)]) for i in range(args.subscribers)]
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / args.subscribers
+    tracemalloc.stop()
+
+    changes = []
+    for container_id in range(1, args.changes + 1):
+        lat, lon = 40.9765 + rng.uniform(-0.1, 0.1), 28.8706 + rng.uniform(-0.1, 0.1)
+        ratio = round(rng.uniform(0.1, 1.0), 2)
+        changes.append({
+            "id": container_id, "container_code": f"Kon{container_id}", "geohash": geohash_encode(lat, lon),
+            "occupancy_ratio": ratio, "is_full": ratio >= 0.7,
+        })
+
+    flush_ms = []
+    for _ in range(args.rounds):
+        bus._enqueue(changes)
+        bus._flush_handle.cancel()
+        start = time.perf_counter()
+        await bus.flush()
+        flush_ms.append((time.perf_counter() - start) * 1000)
+
+    # Nobody consumed anything: queues stay bounded and end with a resync once they overflow
+    longest = max(subscription.queue.qsize() for subscription in subscriptions)
+    overflowed = sum(1 for subscription in subscriptions if subscription.overflows)
+    resyncing = sum(
+        1 for subscription in subscriptions
+        if subscription.overflows and subscription.queue._queue[0] == RESYNC_MESSAGE
+    )
+
+    print(f"subscribers: {args.subscribers}, distinct filters: {len(filters)}, changes per batch: {args.changes}")
+    print(f"memory per idle subscriber: {per_subscriber:.0f} bytes")
+    print(f"flush (filter + encode + enqueue): first {flush_ms[0]:.1f} ms, "
+          f"mean {sum(flush_ms) / len(flush_ms):.1f} ms over {args.rounds} batches")
+    print(f"after {args.rounds} unconsumed batches: longest queue {longest}/{args.queue_size}, "
+          f"{overflowed} subscribers overflowed, {resyncing} of them hold a resync")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--changes", type=int, default=10000)
+    parser.add_argument("--regions", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=40)
+    parser.add_argument("--queue-size", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
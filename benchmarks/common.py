@@ -0,0 +1,80 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database so they never touch the
+configured DB_URL. Import this module before anything from ``app`` so the
+engine in ``app.database`` can be created without a real database.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DB_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.container import Container
+from app.models.item import Item  # noqa: F401  (registers the table)
+from app.models.table_version import TableVersion  # noqa: F401
+from app.models.reading import OccupancyReading, OccupancyRollup  # noqa: F401
+from app.spatial import geohash_encode
+
+
+def make_sessionmaker(path=None, url=None):
+    """
+    Create a fresh SQLite database with all tables and return a session factory.
+
+    Args:
+        path: Database file path; a temporary file is used when omitted
+        url: Database URL to use instead of SQLite, e.g. a scratch Postgres
+            database (its tables are dropped and recreated)
+
+    Returns:
+        Tuple of (engine, sessionmaker)
+    """
+    if url is None:
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix=".db", prefix="kmt_bench_")
+            os.close(fd)
+        url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed(session, count, seed_value=42, spread=1.0):
+    """
+    Insert count containers around the Istanbul depot in one transaction.
+
+    spread scales the default 0.1 x 0.1 degree area (about 11 x 8 km).
+    """
+    rng = random.Random(seed_value)
+    rows = []
+    for i in range(count):
+        ratio = round(rng.uniform(0.0, 1.0), 2)
+        lat = 40.9765 + rng.uniform(-0.05, 0.05) * spread
+        lon = 28.8706 + rng.uniform(-0.05, 0.05) * spread
+        rows.append({
+            "container_code": f"Kon{i + 1}",
+            "name": f"Container Kon{i + 1}",
+            "lang": lat,
+            "long": lon,
+            "occupancy_ratio": ratio,
+            "is_full": ratio >= 0.7,
+            "geohash": geohash_encode(lat, lon),
+        })
+    session.execute(insert(Container), rows)
+    session.commit()
+
+
+def timed(func, *args, **kwargs):
+    """Run func once and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
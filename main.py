@@ -1,9 +1,18 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 import uvicorn
 import asyncio
-from app.routers import items, containers
+from app.routers import items, containers, routes
+from app.config import (
+    COMPRESSION_BROTLI_QUALITY, COMPRESSION_ENABLED, COMPRESSION_GZIP_LEVEL, COMPRESSION_MIN_SIZE,
+    FORECAST_SYNC_INTERVAL_SECONDS, METRICS_ENABLED, QUERY_BUDGET_DEFAULT, QUERY_BUDGET_MODE, REFRESH_ENABLED, ROUTING_REOPTIMIZE_INTERVAL_SECONDS
+)
+from app.compression import CompressionMiddleware
+from app.metrics import MetricsMiddleware, render_metrics
 from app.init_db import init_db
-from app.tasks import update_containers_randomly
+from app.tasks import sync_forecaster_periodically, update_containers_randomly, shutdown as shutdown_tasks
+from app.routing.plans import reoptimize_plans_periodically
+from app.routing.service import shutdown_pool
 
 # Create FastAPI app
 app = FastAPI(
@@ -12,16 +21,46 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Compress responses of COMPRESSION_MIN_SIZE bytes or more for clients that accept gzip or brotli
+if COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE,
+        gzip_level=COMPRESSION_GZIP_LEVEL, brotli_quality=COMPRESSION_BROTLI_QUALITY
+    )
+
+# Record per-route latency and database work, and check query budgets (added last, so
+# it runs outermost and its latency includes compression)
+if METRICS_ENABLED or QUERY_BUDGET_MODE != "off":
+    app.add_middleware(MetricsMiddleware, default_budget=QUERY_BUDGET_DEFAULT, budget_mode=QUERY_BUDGET_MODE)
+
 # Include routers
 app.include_router(items.router)
 app.include_router(containers.router)
+app.include_router(routes.router)
 
 # Initialize database tables and start background tasks on startup
 @app.on_event("startup")
 async def startup_event():
     init_db()
-    # Start the background task
-    asyncio.create_task(update_containers_randomly())
+    # Start the background task (disable it when a separate `python -m app.tasks` worker runs it)
+    if REFRESH_ENABLED:
+        app.state.refresh_task = asyncio.create_task(update_containers_randomly())
+    # Fold new occupancy readings into this worker's fill forecaster outside of requests
+    if FORECAST_SYNC_INTERVAL_SECONDS > 0:
+        app.state.forecast_task = asyncio.create_task(sync_forecaster_periodically())
+    # Re-solve incrementally repaired route plans from scratch now and then
+    if ROUTING_REOPTIMIZE_INTERVAL_SECONDS > 0:
+        app.state.reoptimize_task = asyncio.create_task(reoptimize_plans_periodically())
+
+# Stop background tasks on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    for name in ("refresh_task", "forecast_task", "reoptimize_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    shutdown_tasks()
+    shutdown_pool()
 
 # Root route
 @app.get("/")
@@ -32,9 +71,17 @@ async def root():
         "docs": "/docs",
         "endpoints": {
             "items": "/items",
-            "containers": "/containers"
+            "containers": "/containers",
+            "routes": "/routes"
         }
     }
 
+# Prometheus scrape endpoint
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Expose the metrics in app/metrics.py in the Prometheus text format."""
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
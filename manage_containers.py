@@ -0,0 +1,123 @@
+"""
+Bulk container maintenance from the command line.
+
+Imports and exports stream through the same code as POST /containers/import
+and GET /containers/export, so files of any size use constant memory.
+
+Usage:
+    python manage_containers.py import containers.csv [--format csv] [--skip-existing]
+    python manage_containers.py export containers.parquet [--format parquet]
+    python manage_containers.py seed
+"""
+import argparse
+import random
+import sys
+
+from app.config import EXPORT_CHUNK_SIZE, IMPORT_CHUNK_SIZE
+from app.container_io import EXPORT_FIELDS, ImportSummary, read_rows, resolve_format, validated_batches, write_rows
+from app.database import SessionLocal
+from app.db import iter_container_batches, upsert_containers
+from app.schemas.container import ContainerCreate
+
+# Initial locations dictionary
+locations = {
+    "Kon1": (40.9741, 28.8754),
+    "Kon2": (40.9753, 28.8722),
+    "Kon3": (40.9732, 28.8709),
+    "Kon4": (40.9737, 28.8681),
+    "Kon5": (40.9744, 28.8692),
+    "Kon6": (40.9762, 28.8686),
+    "Kon7": (40.9768, 28.8710),
+    "Kon8": (40.9751, 28.8734),
+    "Kon9": (40.9748, 28.8748),
+    "Kon10": (40.9738, 28.8729),
+}
+
+# Additional 10 locations
+additional_locations = {
+    "Kon11": (40.9730, 28.8765),
+    "Kon12": (40.9755, 28.8780),
+    "Kon13": (40.9770, 28.8745),
+    "Kon14": (40.9725, 28.8720),
+    "Kon15": (40.9760, 28.8705),
+    "Kon16": (40.9740, 28.8770),
+    "Kon17": (40.9765, 28.8725),
+    "Kon18": (40.9735, 28.8695),
+    "Kon19": (40.9750, 28.8760),
+    "Kon20": (40.9745, 28.8715),
+}
+
+# Combine both dictionaries
+all_locations = {**locations, **additional_locations}
+
+def import_file(path: str, fmt: str, skip_existing: bool = False, chunk_size: int = IMPORT_CHUNK_SIZE) -> ImportSummary:
+    """Upsert the containers of a file ("-" for stdin), printing progress after every chunk."""
+    summary = ImportSummary()
+    file = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        with SessionLocal() as db:
+            for batch in validated_batches(read_rows(file, fmt), chunk_size, summary):
+                summary.add(upsert_containers(db, batch, update_existing=not skip_existing))
+                print(summary.progress(), file=sys.stderr)
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+    return summary
+
+def export_file(path: str, fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Write every container to a file ("-" for stdout)."""
+    file = sys.stdout.buffer if path == "-" else open(path, "wb")
+    try:
+        with SessionLocal() as db:
+            for data in write_rows(iter_container_batches(db, EXPORT_FIELDS, chunk_size), fmt):
+                file.write(data)
+    finally:
+        if file is not sys.stdout.buffer:
+            file.close()
+
+def seed_containers():
+    """Create the demo containers with random occupancy; existing codes are left alone."""
+    containers = [
+        ContainerCreate(
+            container_code=code,
+            name=f"Container {code}",
+            lang=lang,
+            long=long,
+            occupancy_ratio=round(random.uniform(0.0, 1.0), 2),
+        )
+        for code, (lang, long) in all_locations.items()
+    ]
+    with SessionLocal() as db:
+        counts = upsert_containers(db, containers, update_existing=False)
+    print(f"Seeding completed: {counts['inserted']} containers created, {counts['skipped']} already existed.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="create or update containers from a file")
+    import_parser.add_argument("path", help='CSV, NDJSON or Parquet file, "-" for stdin')
+    import_parser.add_argument("--format", help="csv, ndjson or parquet; guessed from the extension when omitted")
+    import_parser.add_argument("--skip-existing", action="store_true", help="leave existing container codes untouched")
+    import_parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    export_parser = commands.add_parser("export", help="write all containers to a file")
+    export_parser.add_argument("path", help='output file, "-" for stdout')
+    export_parser.add_argument("--format", help="csv, ndjson or parquet; guessed from the extension when omitted")
+    export_parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    commands.add_parser("seed", help="create the demo containers")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        seed_containers()
+        return
+    fmt = resolve_format(args.format or args.path)
+    if fmt is None:
+        parser.error("cannot tell the file format, pass --format csv, ndjson or parquet")
+    if args.command == "import":
+        summary = import_file(args.path, fmt, args.skip_existing, args.chunk_size)
+        for error in summary.errors:
+            print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    else:
+        export_file(args.path, fmt, args.chunk_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+# Configure a throwaway SQLite database and strict query budgets before the app is imported
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='containers-test-'), 'test.db')}"
+os.environ.setdefault("DB_ASYNC", "False")  # DB_ASYNC=true runs the same tests on the async sessions
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+os.environ["REFRESH_ENABLED"] = "False"
+os.environ["FORECAST_SYNC_INTERVAL_SECONDS"] = "0"
+os.environ["ROUTING_REOPTIMIZE_INTERVAL_SECONDS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Entering the client runs the startup event, which creates the tables
+    with TestClient(app) as client:
+        yield client
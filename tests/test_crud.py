@@ -0,0 +1,126 @@
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.db import _is_duplicate_code, get_container
+from app.metrics import QueryBudgetExceeded, count_queries
+from app.models.reading import OccupancyReading, OccupancyRollup
+
+
+def container_payload(**overrides):
+    payload = {
+        "container_code": f"T-{uuid.uuid4().hex[:8]}", "name": "Test", "lang": 41.99, "long": 21.43,
+        "occupancy_ratio": 0.2,
+    }
+    payload.update(overrides)
+    return payload
+
+
+def history_rows(container_id):
+    with SessionLocal() as db:
+        return sum(
+            db.scalar(select(func.count()).select_from(model).where(model.container_id == container_id))
+            for model in (OccupancyReading, OccupancyRollup)
+        )
+
+
+def test_container_crud_within_query_budgets(client):
+    # QUERY_BUDGET_MODE=raise makes the client raise QueryBudgetExceeded on any overrun
+    created = client.post("/containers/", json=container_payload())
+    assert created.status_code == 201
+    container = created.json()
+    assert container["is_full"] is False
+
+    assert client.get(f"/containers/{container['id']}").json() == container
+    assert client.get(f"/containers/code/{container['container_code']}").json() == container
+    assert any(row["id"] == container["id"] for row in client.get("/containers/").json())
+
+    updated = client.put(f"/containers/{container['id']}", json={"occupancy_ratio": 0.9, "lang": 42.0})
+    assert updated.status_code == 200
+    assert updated.json()["is_full"] is True
+
+    renamed = client.put(f"/containers/{container['id']}", json={"container_code": container["container_code"] + "-b"})
+    assert renamed.status_code == 200
+    assert client.get(f"/containers/code/{container['container_code']}").status_code == 404
+
+    assert client.delete(f"/containers/{container['id']}").status_code == 204
+    assert client.get(f"/containers/{container['id']}").status_code == 404
+    assert client.delete(f"/containers/{container['id']}").status_code == 404
+
+
+def test_item_crud_within_query_budgets(client):
+    created = client.post("/items/", json={"name": "Bin liner", "price": 2.5})
+    assert created.status_code == 201
+    item = created.json()
+
+    assert client.get(f"/items/{item['id']}").json() == item
+    assert any(row["id"] == item["id"] for row in client.get("/items/").json())
+    assert client.put(f"/items/{item['id']}", json={"price": 3.0}).json()["price"] == 3.0
+    assert client.delete(f"/items/{item['id']}").status_code == 204
+    assert client.get(f"/items/{item['id']}").status_code == 404
+
+
+def test_duplicate_container_code_is_rejected(client):
+    first = client.post("/containers/", json=container_payload()).json()
+    second = client.post("/containers/", json=container_payload()).json()
+
+    duplicate = client.post("/containers/", json=container_payload(container_code=first["container_code"]))
+    assert duplicate.status_code == 400
+    assert first["container_code"] in duplicate.json()["detail"]
+
+    rename = client.put(f"/containers/{second['id']}", json={"container_code": first["container_code"]})
+    assert rename.status_code == 400
+    assert client.get(f"/containers/{second['id']}").json() == second
+
+
+def test_only_the_container_code_index_counts_as_duplicate():
+    def error(message):
+        return IntegrityError("INSERT INTO containers ...", {}, sqlite3.IntegrityError(message))
+
+    assert _is_duplicate_code(error("UNIQUE constraint failed: containers.container_code"))
+    assert not _is_duplicate_code(error("NOT NULL constraint failed: containers.container_code"))
+    assert not _is_duplicate_code(error("UNIQUE constraint failed: containers.id"))
+
+
+def test_delete_removes_occupancy_history(client):
+    container = client.post("/containers/", json=container_payload()).json()
+    client.put(f"/containers/{container['id']}", json={"occupancy_ratio": 0.5})
+    assert history_rows(container["id"]) > 0
+
+    assert client.delete(f"/containers/{container['id']}").status_code == 204
+    assert history_rows(container["id"]) == 0
+
+
+def test_count_queries(client):
+    container = client.post("/containers/", json=container_payload()).json()
+    with SessionLocal() as db:
+        with count_queries() as stats:
+            get_container(db, container["id"])
+        assert stats.queries == 1
+
+        with pytest.raises(QueryBudgetExceeded):
+            with count_queries(0):
+                get_container(db, container["id"])
+
+
+def test_import_updates_existing_containers_from_partial_rows(client):
+    container = client.post("/containers/", json=container_payload()).json()
+    new_code = f"T-{uuid.uuid4().hex[:8]}"
+    body = (
+        "container_code,occupancy_ratio\n"
+        f"{container['container_code']},0.95\n"
+        f"{new_code},0.5\n"
+    )
+
+    summary = client.post("/containers/import", content=body, headers={"Content-Type": "text/csv"}).json()
+    assert (summary["updated"], summary["inserted"], summary["rejected"]) == (1, 0, 1)
+    assert summary["errors"][0]["line"] == 3
+    assert "name" in summary["errors"][0]["error"]
+
+    updated = client.get(f"/containers/{container['id']}").json()
+    assert updated == {**container, "occupancy_ratio": 0.95, "is_full": True}
+    assert client.get(f"/containers/code/{new_code}").status_code == 404